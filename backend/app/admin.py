@@ -1,10 +1,53 @@
 from django.contrib import admin
 
 from . import models
+from .services import runner_totals_service, stat_service
+
+
+class DataVersionAdmin(admin.ModelAdmin):
+    """Admin of models which are shown in stats, it changes the data version after every change"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        stat_service.bump_data_version()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        stat_service.bump_data_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        stat_service.bump_data_version()
+
+
+@admin.register(models.Post)
+class PostAdmin(DataVersionAdmin):
+    """Posts admin which keeps totals of runners and header counters after changing of posts"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        runnings = [(obj.author_id, obj.date)]
+        if change:
+            # The post could be moved from the previous author or day
+            runnings.append((form.initial['author'], form.initial['date']))
+        runner_totals_service.update_totals(runnings)
+        stat_service.update_counters(0 if change else 1)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        runner_totals_service.update_totals([(obj.author_id, obj.date)])
+        stat_service.update_counters(-1)
+
+    def delete_queryset(self, request, queryset):
+        runnings = list(queryset.values_list('author_id', 'date'))
+        super().delete_queryset(request, queryset)
+        runner_totals_service.update_totals(runnings)
+        stat_service.update_counters(-len(runnings))
+
 
 admin.site.register(models.User)
 admin.site.register(models.Config)
-admin.site.register(models.Profile)
-admin.site.register(models.Post)
+admin.site.register(models.Profile, DataVersionAdmin)
+admin.site.register(models.StatusComment)
 admin.site.register(models.StatLog)
 admin.site.register(models.TempData)
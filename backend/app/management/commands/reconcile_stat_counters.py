@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services import sync_service, stat_service
+
+
+class Command(BaseCommand):
+    """Django command to repair header counters (post count and sums of the last running) if they are drifted"""
+
+    help = 'Recompute header counters from posts and write drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only show drifted counters')
+
+    def handle(self, *args, **options):
+        with sync_service.sync_lock.hold() as acquired:
+            if not acquired:
+                raise CommandError('Sync is running, try again later')
+
+            drift = stat_service.reconcile_counters(options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Counters are correct'))
+            return
+
+        verb = 'would be fixed' if options['dry_run'] else 'fixed'
+        for name, (stored_value, actual_value) in drift.items():
+            self.stdout.write(f'{name}: {stored_value} -> {actual_value}')
+        self.stdout.write(self.style.SUCCESS(f'Counters {verb}: {len(drift)}'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Post
+from app.services import sync_service, runner_totals_service, stat_service
+
+
+class Command(BaseCommand):
+    """Django command to write posts from the sync journal without downloading them from VK"""
+
+    help = 'Replay the sync journal of downloaded wall posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the journal (SYNC_JOURNAL_PATH)')
+        parser.add_argument('--clear', action='store_true', help='Delete all posts before replay (e.g. to reparse)')
+
+    def handle(self, *args, **options):
+        with sync_service.sync_lock.hold() as acquired:
+            if not acquired:
+                raise CommandError('Sync is running, try again later')
+
+            if options['clear']:
+                Post.objects.all().delete()
+                runner_totals_service.rebuild_totals()
+                stat_service.reconcile_counters()
+
+            start = time.perf_counter()
+            block_count = sync_service.replay_journal(options['path'])
+            elapsed = time.perf_counter() - start
+
+        post_count = Post.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed blocks: {block_count}, posts in DB: {post_count}, time: {elapsed:.2f} s'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Post
+from app.services import sync_service
+
+
+class Command(BaseCommand):
+    """Django command to recompute numbers, sums and statuses of all posts"""
+
+    help = 'Recompute runnings of the whole history and write changed posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count posts which would be changed')
+
+    def handle(self, *args, **options):
+        with sync_service.sync_lock.hold() as acquired:
+            if not acquired:
+                raise CommandError('Sync is running, try again later')
+
+            start = time.perf_counter()
+            changed_count = sync_service.revalidate_runnings(options['dry_run'])
+            elapsed = time.perf_counter() - start
+
+        verb = 'would be changed' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Posts {verb}: {changed_count}/{Post.objects.count()}, time: {elapsed:.2f} s'))
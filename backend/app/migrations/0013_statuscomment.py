@@ -0,0 +1,23 @@
+# Generated by Django 3.0.14 on 2026-10-17 18:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_auto_20200309_0944'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusComment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('create_date', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.Post')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_statuscomment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tempdata',
+            name='next_sync_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
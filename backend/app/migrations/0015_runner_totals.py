@@ -0,0 +1,28 @@
+# Generated by Django 3.0.14 on 2026-10-17 19:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_sync_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunnerTotals',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='totals', serialize=False, to='app.Profile')),
+                ('running_count', models.IntegerField()),
+                ('distance_sum', models.IntegerField()),
+                ('first_run_date', models.DateTimeField()),
+                ('last_run_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='runnertotals',
+            index=models.Index(fields=['-distance_sum'], name='app_runnert_distanc_bdbebd_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+from django.db.models import Count, Sum, Min, Max
+
+
+def fill_runner_totals(apps, schema_editor):
+    Post = apps.get_model('app', 'Post')
+    RunnerTotals = apps.get_model('app', 'RunnerTotals')
+
+    rows = Post.objects.filter(number__isnull=False).order_by().values('author_id').annotate(
+        running_count=Count('id'),
+        distance_sum=Sum('distance'),
+        first_run_date=Min('date'),
+        last_run_date=Max('date')
+    )
+    RunnerTotals.objects.bulk_create([RunnerTotals(profile_id=row.pop('author_id'), **row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_runner_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_runner_totals, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-17 19:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_fill_runner_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunnerDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('running_count', models.IntegerField()),
+                ('distance_sum', models.IntegerField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.Profile')),
+            ],
+            options={
+                'unique_together': {('day', 'profile')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_runner_days(apps, schema_editor):
+    Post = apps.get_model('app', 'Post')
+    RunnerDay = apps.get_model('app', 'RunnerDay')
+
+    rows = Post.objects.filter(number__isnull=False).order_by().annotate(day=TruncDate('date'))\
+        .values('day', 'author_id').annotate(running_count=Count('id'), distance_sum=Sum('distance'))
+    RunnerDay.objects.bulk_create([RunnerDay(profile_id=row.pop('author_id'), **row) for row in rows],
+                                  batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_runner_day'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_runner_days, migrations.RunPython.noop)
+    ]
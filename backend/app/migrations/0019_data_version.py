@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_fill_runner_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tempdata',
+            name='data_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.14 on 2026-10-17 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tempdata',
+            name='distance_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tempdata',
+            name='post_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tempdata',
+            name='running_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def fill_stat_counters(apps, schema_editor):
+    Post = apps.get_model('app', 'Post')
+    TempData = apps.get_model('app', 'TempData')
+
+    last_running = Post.objects.filter(number__isnull=False).order_by('-date').first()
+    TempData.objects.update(
+        post_count=Post.objects.count(),
+        running_count=last_running.number if last_running else 0,
+        distance_sum=last_running.sum_distance if last_running else 0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_stat_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_stat_counters, migrations.RunPython.noop)
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_fill_stat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statuscomment',
+            name='lease_date',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_statuscomment_lease_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tempdata',
+            name='last_full_sync_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -170,6 +170,62 @@ class Post(models.Model):
         return f'Post(id: {self.id}, number: {self.number}, text: {self.text[:50]})'
 
 
+class RunnerTotals(models.Model):
+    """Totals of runnings of the runner for the whole time, they are kept up to date by `runner_totals_service`"""
+
+    profile = models.OneToOneField(to=Profile, on_delete=models.CASCADE, primary_key=True, related_name='totals')
+
+    running_count = models.IntegerField()
+
+    distance_sum = models.IntegerField()
+
+    first_run_date = models.DateTimeField()
+
+    last_run_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['-distance_sum'])]
+
+    def __str__(self):
+        return f'RunnerTotals(profile: {self.profile_id}, runnings: {self.running_count}, ' \
+               f'distance: {self.distance_sum})'
+
+
+class RunnerDay(models.Model):
+    """Runnings of the runner for the day (in the current timezone), they are kept up by `runner_totals_service`"""
+
+    day = models.DateField()
+
+    profile = models.ForeignKey(to=Profile, on_delete=models.CASCADE)
+
+    running_count = models.IntegerField()
+
+    distance_sum = models.IntegerField()
+
+    class Meta:
+        unique_together = ['day', 'profile']
+
+    def __str__(self):
+        return f'RunnerDay(day: {self.day}, profile: {self.profile_id}, runnings: {self.running_count}, ' \
+               f'distance: {self.distance_sum})'
+
+
+class StatusComment(models.Model):
+    """Status comment for post which is waiting for publishing in VK"""
+
+    post = models.ForeignKey(to=Post, on_delete=models.CASCADE)
+
+    text = models.TextField()
+
+    create_date = models.DateTimeField(auto_now_add=True)
+
+    lease_date = models.DateTimeField(null=True)
+    """Date until which the comment is claimed by a delivering process"""
+
+    def __str__(self):
+        return f'StatusComment(post: {self.post_id}, text: {self.text[:50]})'
+
+
 class StatLog(models.Model):
     publish_date = models.DateTimeField()
 
@@ -192,5 +248,23 @@ class StatLog(models.Model):
 class TempData(models.Model):
     last_sync_date = models.DateTimeField()
 
+    last_full_sync_date = models.DateTimeField(null=True, blank=True)
+    """Date of the last sync of all posts, `last_sync_date` is also changed when the wall is checked unchanged"""
+
+    next_sync_date = models.DateTimeField(null=True, blank=True)
+    """Date of the next scheduled sync, the sync task skips earlier runs"""
+
+    data_version = models.IntegerField(default=0)
+    """Version of posts data, it is changed after every change of posts so cached stats are dropped"""
+
+    post_count = models.IntegerField(default=0)
+    """Count of posts, it is changed with posts in the same transaction (see `stat_service.update_counters`)"""
+
+    running_count = models.IntegerField(default=0)
+    """Number of the last running"""
+
+    distance_sum = models.IntegerField(default=0)
+    """Sum distance of the last running"""
+
     def __str__(self):
         return self.__class__.__name__
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import NamedTuple, Dict, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+
+from app.models import Post, Profile
+from app.services import sync_service, stat_service, vk_api_service
+from app.services.vk_api_async import AsyncVkApi
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadedBlock(NamedTuple):
+    response: dict
+    """Response of wall.get"""
+
+    vk_profiles: Dict[int, dict]
+    """VK users and groups (with negative ids) which are authors of posts and are absent in DB"""
+
+
+Prefetch = Tuple[Tuple[int, int], asyncio.Future]
+"""Range (offset, download count) of the next block and its downloading"""
+
+
+def _db(func):
+    """Running Django code in the sync thread, DB connection and transactions are bound to it"""
+    return sync_to_async(func, thread_sensitive=True)
+
+
+async def sync_posts_async(api_url: str = None):
+    """
+    Syncing posts like `sync_service.sync_posts`, but the next block is downloaded
+    and authors of its posts are got from VK while the current block is written into DB.
+    The next block is predicted: after writing of a block all posts from its offset to the newest are in DB,
+    the prediction is checked by number of posts in DB
+    """
+    logger.debug('-------- Start async sync --------')
+
+    with vk_api_service.latency_metrics.collect() as sync_latency:
+        api = await _db(AsyncVkApi.from_config)(api_url)
+        prefetch: Optional[Prefetch] = None
+        try:
+            known_profile_ids = await _db(_get_profile_ids)()
+            vk_post_count = (await api.get_wall_posts(0, 1))['count']
+            db_post_count = await _db(Post.objects.count)()
+
+            need_sync = True
+            while need_sync:
+                download_count = sync_service._get_download_count(vk_post_count, db_post_count)
+                offset = sync_service._get_block_offset(vk_post_count, db_post_count, download_count)
+
+                if prefetch is not None and prefetch[0] == (offset, download_count):
+                    block = await prefetch[1]
+                else:
+                    _cancel(prefetch)
+                    block = await _download_block(api, offset, download_count, known_profile_ids)
+
+                # Authors of the block are created with it, so they are not got again for the next block
+                known_profile_ids.update(vk_post['from_id'] for vk_post in block.response['items'])
+
+                prefetch = None
+                if block.response['count'] == vk_post_count and offset > 0:
+                    prefetch = _prefetch_block(api, vk_post_count, vk_post_count - offset, known_profile_ids)
+
+                apply_block_posts = _db(sync_service._apply_block_posts)
+                db_post_count = await apply_block_posts(block.response, vk_post_count, offset, block.vk_profiles)
+                logger.debug(f'>> Downloaded (after sync): {db_post_count}/{vk_post_count}')
+
+                # Number of posts in VK is changed, the block isn't written
+                if block.response['count'] != vk_post_count:
+                    vk_post_count = block.response['count']
+                    continue
+
+                if db_post_count > vk_post_count:
+                    raise RuntimeError(f'Number of posts in DB ({db_post_count}) > number of posts in VK '
+                                       f'({vk_post_count})')
+
+                need_sync = db_post_count < vk_post_count
+
+            await _db(stat_service.update_stat)(full_sync=True)
+        finally:
+            _cancel(prefetch)
+            api.close()
+
+    logger.debug(f'>> VK API latency: {sync_latency}')
+    logger.debug('-------- End async sync --------')
+
+
+def _get_profile_ids() -> Set[int]:
+    return set(Profile.objects.values_list('id', flat=True))
+
+
+def _prefetch_block(api: AsyncVkApi, vk_post_count: int, db_post_count: int,
+                    known_profile_ids: Set[int]) -> Prefetch:
+    """Starting downloading of the block which follows after {db_post_count} posts in DB"""
+    download_count = sync_service._get_download_count(vk_post_count, db_post_count)
+    offset = sync_service._get_block_offset(vk_post_count, db_post_count, download_count)
+
+    download = asyncio.ensure_future(_download_block(api, offset, download_count, set(known_profile_ids)))
+    return (offset, download_count), download
+
+
+async def _download_block(api: AsyncVkApi, offset: int, download_count: int,
+                          known_profile_ids: Set[int]) -> DownloadedBlock:
+    if download_count > vk_api_service.WALL_GET_MAX_COUNT:
+        response = await api.get_wall_posts_by_execute(offset, download_count)
+    else:
+        response = await api.get_wall_posts(offset, download_count)
+
+    # Authors which are absent in DB are got with the block, so writing of the block doesn't wait for them
+    profile_ids = {vk_post['from_id'] for vk_post in response['items']} - known_profile_ids
+    user_ids = [profile_id for profile_id in profile_ids if profile_id >= 0]
+    group_ids = [profile_id * -1 for profile_id in profile_ids if profile_id < 0]
+    vk_users, vk_groups = await asyncio.gather(api.get_users(user_ids), api.get_groups(group_ids))
+
+    return DownloadedBlock(response, sync_service.index_vk_profiles(vk_users, vk_groups))
+
+
+def _cancel(prefetch: Optional[Prefetch]):
+    if prefetch is not None:
+        prefetch[1].cancel()
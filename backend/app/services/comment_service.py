@@ -0,0 +1,91 @@
+import logging
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.models import StatusComment
+from app.services import vk_api_service, singleton_cache
+
+DELIVER_COMMENTS_TASK = 'tasks.tasks.deliver_comments_task'
+
+COMMENT_LEASE_TIME = 10 * 60
+"""Seconds for which comments are claimed for publishing, comments of a killed process are published after it"""
+
+logger = logging.getLogger(__name__)
+
+
+def add_comments(comments: List[Tuple[int, str]]):
+    """Adding status comments (post_id, text) into outbox, they are published after transaction commit"""
+    if not comments or not singleton_cache.get_config().commenting:
+        return
+
+    StatusComment.objects.bulk_create([StatusComment(post_id=post_id, text=text) for post_id, text in comments])
+    transaction.on_commit(_schedule_delivery)
+
+
+def _schedule_delivery():
+    from tasks.celery import app
+    app.send_task(DELIVER_COMMENTS_TASK)
+
+
+def deliver_comments() -> int:
+    """
+    Publishing comments from outbox in VK.
+    Only the last comment is published if there are some comments for one post
+    """
+    delivered_count = 0
+    while True:
+        comments = _claim_next_comments()
+        if not comments:
+            return delivered_count
+
+        if _deliver_comments(comments):
+            delivered_count += 1
+
+
+def _claim_next_comments() -> List[StatusComment]:
+    """
+    Claiming comments of the first post in outbox for {COMMENT_LEASE_TIME} seconds,
+    claimed comments are skipped by other processes until the lease expires
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        free_comments = StatusComment.objects.filter(Q(lease_date__isnull=True) | Q(lease_date__lt=now))
+        first_comment = free_comments.select_for_update(skip_locked=True).order_by('id').first()
+        if first_comment is None:
+            return []
+
+        comments = list(free_comments.select_for_update(skip_locked=True).filter(post_id=first_comment.post_id)
+                        .order_by('id'))
+        StatusComment.objects.filter(id__in=[c.id for c in comments]) \
+            .update(lease_date=now + timedelta(seconds=COMMENT_LEASE_TIME))
+
+    return comments
+
+
+def _deliver_comments(comments: List[StatusComment]) -> bool:
+    """
+    Publishing the last of claimed comments without transaction, so the rate limiter and VK don't hold DB locks.
+    Claimed comments are deleted after publishing, comments aren't published if commenting was disabled
+    """
+    comment_ids = [c.id for c in comments]
+    last_comment = comments[-1]
+
+    if not singleton_cache.get_config().commenting:
+        logger.debug(f' -- Drop {last_comment}, commenting is disabled')
+        StatusComment.objects.filter(id__in=comment_ids).delete()
+        return False
+
+    logger.debug(f' -- Publish {last_comment}, collapsed: {len(comments) - 1}')
+    try:
+        vk_api_service.add_comment_to_post(last_comment.post_id, last_comment.text)
+    except Exception:
+        # Comments are returned into outbox for the next delivery
+        StatusComment.objects.filter(id__in=comment_ids).update(lease_date=None)
+        raise
+
+    StatusComment.objects.filter(id__in=comment_ids).delete()
+    return True
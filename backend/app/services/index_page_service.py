@@ -4,9 +4,8 @@ from typing import List
 from django.conf import settings
 from django.templatetags.static import static
 
-from app.models import TempData
 from app.serializers import FrontendDataSerializer
-from app.services import stat_service, vk_api_service
+from app.services import stat_service, vk_api_service, singleton_cache
 from app.util import encode_json, date_to_js_unix_time
 
 
@@ -14,7 +13,7 @@ def get_data(user):
     serializer = FrontendDataSerializer({
         'user': user if user.is_authenticated else None,
         'stat': stat_service.get_stat(),
-        'last_sync_date': date_to_js_unix_time(TempData.objects.get().last_sync_date),
+        'last_sync_date': date_to_js_unix_time(singleton_cache.get_temp_data().last_sync_date),
         'config': {
             'project_version': settings.VERSION,
             'group_link': vk_api_service.get_group_url()
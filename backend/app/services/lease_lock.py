@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+import redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLock:
+    """
+    Non-blocking lock which is shared between processes through Redis.
+    The lock is leased for {ttl} seconds and the lease is extended by a heartbeat while the owner is alive,
+    so the lock of a killed process expires by itself.
+    If the lease isn't extended in time, the lock is {lost}: another owner could take it, so the owner must stop.
+    The in-process lock is used if Redis is unavailable, it doesn't exclude other processes
+    """
+
+    EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, key: str, ttl: float = 60, redis_url: str = None):
+        self.key = key
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._client = None
+        self._local_lock = threading.Lock()
+        self._token = None
+        self._heartbeat = None
+        self._heartbeat_stopped = threading.Event()
+        self.lost = False
+
+    def acquire(self) -> bool:
+        """Taking the lock without waiting, returns False if it is held by another owner"""
+        if not self._local_lock.acquire(blocking=False):
+            return False
+
+        token = uuid4().hex
+        try:
+            acquired = self._get_client().set(self.key, token, nx=True, px=self._get_ttl_ms())
+        except RedisError as e:
+            logger.error(f'Lock "{self.key}" is only held in this process, other processes are not excluded, '
+                         f'Redis is unavailable: {e}')
+            acquired, token = True, None
+
+        if not acquired:
+            self._local_lock.release()
+            return False
+
+        self._token = token
+        self.lost = False
+        if token is not None:
+            self._start_heartbeat(token)
+
+        return True
+
+    def release(self):
+        self._stop_heartbeat()
+
+        if self._token is not None:
+            try:
+                self._get_client().eval(self.RELEASE_SCRIPT, 1, self.key, self._token)
+            except RedisError as e:
+                logger.warning(f'Lock "{self.key}" is not released, it expires in {self.ttl} s: {e}')
+            self._token = None
+
+        self._local_lock.release()
+
+    def is_locked(self) -> bool:
+        try:
+            return self._local_lock.locked() or bool(self._get_client().exists(self.key))
+        except RedisError:
+            return self._local_lock.locked()
+
+    @contextmanager
+    def hold(self):
+        """Taking the lock for the block, the block gets whether the lock is acquired"""
+        acquired = self.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release()
+
+    def _start_heartbeat(self, token: str):
+        self._heartbeat_stopped.clear()
+        self._heartbeat = threading.Thread(target=self._extend_lease, args=(token,), daemon=True,
+                                           name=f'{self.key}-heartbeat')
+        self._heartbeat.start()
+
+    def _stop_heartbeat(self):
+        if self._heartbeat is None:
+            return
+
+        self._heartbeat_stopped.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+
+    def _extend_lease(self, token: str):
+        extend_time = time.monotonic()
+        while not self._heartbeat_stopped.wait(self.ttl / 3):
+            try:
+                extended = self._get_client().eval(self.EXTEND_SCRIPT, 1, self.key, token, self._get_ttl_ms())
+            except RedisError as e:
+                logger.warning(f'Lease of lock "{self.key}" is not extended: {e}')
+                # The lease could expire in Redis while it is unavailable
+                extended = time.monotonic() - extend_time < self.ttl
+                if extended:
+                    continue
+
+            if not extended:
+                logger.error(f'Lease of lock "{self.key}" is lost')
+                self.lost = True
+                return
+
+            extend_time = time.monotonic()
+
+    def _get_ttl_ms(self) -> int:
+        return int(self.ttl * 1000)
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+
+        return self._client
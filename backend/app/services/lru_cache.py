@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class LruCache:
+    """
+    Thread-safe LRU cache of computed values, the least recently used ones are evicted above {max_size}.
+    The value is computed without the lock, so concurrent misses of one key could compute it twice
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._values: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, calc: Callable[[], Any], is_valid: Callable[[Any], bool] = None) -> Any:
+        """Getting the cached value of {key} or computing it by {calc}, the cached value is used if it {is_valid}"""
+        with self._lock:
+            value = self._values.get(key, _MISSING)
+            if value is not _MISSING and (is_valid is None or is_valid(value)):
+                self._values.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = calc()
+
+        with self._lock:
+            self.misses += 1
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+        return value
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._values)}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __str__(self):
+        stats = self.get_stats()
+        return f'hits: {stats["hits"]}, misses: {stats["misses"]}, size: {stats["size"]}'
@@ -5,6 +5,8 @@ from typing import List, Optional
 SUM_REGEX = r'(((\d+)\s*\+\s*)+)(\d+)\s*=\s*(\d+)'
 TERM_REGEX = r'\d+'
 
+TERM_PATTERN = re.compile(TERM_REGEX)
+
 
 @dataclass
 class MessageParserOut:
@@ -23,6 +25,36 @@ class MessageParserOut:
 
 
 def parse(message: str) -> Optional[MessageParserOut]:
+    """
+    Searching the first sum expression (like `parse_regex`) by one pass over numbers of the message.
+    Every number continues the expression of previous ones if only `+` (or `=` for the result) with spaces
+    is between them, otherwise the expression starts again from it. So the time is linear in the message length
+    """
+    terms = []
+    last_term_end = None
+    for term in TERM_PATTERN.finditer(message):
+        if terms:
+            separator = message[last_term_end:term.start()].strip()
+            if separator == '+':
+                terms.append(term)
+                last_term_end = term.end()
+                continue
+
+            if separator == '=' and len(terms) > 1:
+                return MessageParserOut(
+                    start_sum_number=int(terms[0][0]),
+                    distance_list=[int(x[0]) for x in terms[1:]],
+                    end_sum_number=int(term[0])
+                )
+
+        terms = [term]
+        last_term_end = term.end()
+
+    return None
+
+
+def parse_regex(message: str) -> Optional[MessageParserOut]:
+    """Reference implementation of `parse`, the regex backtracks in quadratic time on long chains of `+`"""
     sum_regex_res = re.search(SUM_REGEX, message)
     if sum_regex_res is None:
         return None
@@ -0,0 +1,63 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class LatencyMetrics:
+    """Thread-safe statistics of call durations by call name"""
+
+    def __init__(self):
+        self._stats: Dict[str, dict] = {}
+        self._collectors: Dict[int, List[LatencyMetrics]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stat = self._stats.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['max'] = max(stat['max'], seconds)
+
+            for collector in self._collectors.get(threading.get_ident(), ()):
+                collector.record(name, seconds)
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextmanager
+    def collect(self, collector: 'LatencyMetrics' = None) -> Iterator['LatencyMetrics']:
+        """
+        Collecting durations which are recorded by the current thread inside the block (e.g. by one sync)
+        into separate metrics. Other threads doing the same work join it by passing the yielded {collector}
+        """
+        collector = collector or LatencyMetrics()
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._collectors.setdefault(thread_id, []).append(collector)
+        try:
+            yield collector
+        finally:
+            with self._lock:
+                collectors = self._collectors[thread_id]
+                collectors.remove(collector)
+                if not collectors:
+                    del self._collectors[thread_id]
+
+    def get_stats(self) -> Dict[str, dict]:
+        """Getting count, total, average and max durations (in seconds) by call name"""
+        with self._lock:
+            return {name: {**stat, 'avg': stat['total'] / stat['count']} for name, stat in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def __str__(self):
+        return ', '.join(f'{name}: {stat["count"]} calls, avg: {stat["avg"] * 1000:.0f} ms, '
+                         f'max: {stat["max"] * 1000:.0f} ms' for name, stat in self.get_stats().items())
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from app.services import message_parser
+from app.services.lru_cache import LruCache
+from app.services.message_parser import MessageParserOut
+
+CACHE_SIZE = 10000
+"""Max number of cached texts, the least recently used ones are evicted"""
+
+
+class ParseCache(LruCache):
+    """
+    LRU cache of parsing results by text hash (`Post.text_hash`).
+    The text is kept with its result and is compared on hit, because the stored hash of hand edited post
+    is the hash of its text in VK. Cached results are shared, they must not be changed
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        super().__init__(max_size)
+
+    def parse(self, text: str, text_hash: str) -> Optional[MessageParserOut]:
+        return self.get(text_hash, lambda: (text, message_parser.parse(text)),
+                        lambda cached: cached[0] == text)[1]
+
+
+parse_cache = ParseCache()
+
+
+def parse(text: str, text_hash: str) -> Optional[MessageParserOut]:
+    return parse_cache.parse(text, text_hash)
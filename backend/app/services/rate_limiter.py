@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+
+import redis
+from redis.exceptions import RedisError
+
+from app.services.redis_backoff import RedisBackoff
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+    It allows {rate} requests per second on average and bursts up to {capacity} requests.
+    Tokens are reserved at once, so waiting callers are served in the order of calling
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Taking a token and waiting until it is available"""
+        wait_seconds = self.reserve()
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+    def reserve(self) -> float:
+        """Taking a token, returns seconds for waiting until it is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate) - 1
+            self._updated_at = now
+            return max(0, -self._tokens / self.rate)
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Token bucket which is shared between processes through Redis.
+    The in-process bucket is used if Redis is unavailable, Redis is retried after a backoff (see RedisBackoff)
+    """
+
+    RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate) - 1
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+    def __init__(self, key: str, rate: float, capacity: float = 1, redis_url: str = None):
+        super().__init__(rate, capacity)
+        self.key = key
+        self.redis_url = redis_url
+        self._script = None
+        self._backoff = RedisBackoff()
+
+    def reserve(self) -> float:
+        if self._backoff.is_available():
+            try:
+                wait_seconds = float(self._get_script()(keys=[self.key],
+                                                        args=[self.rate, self.capacity, time.time()]))
+            except RedisError as e:
+                if self._backoff.fail():
+                    logger.warning(f'Rate limiter "{self.key}" works in process, Redis is unavailable: {e}')
+            else:
+                if self._backoff.succeed():
+                    logger.info(f'Rate limiter "{self.key}" is shared again, Redis is available')
+                return wait_seconds
+
+        return super().reserve()
+
+    def _get_script(self):
+        if self._script is None:
+            client = redis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+            self._script = client.register_script(self.RESERVE_SCRIPT)
+
+        return self._script
@@ -0,0 +1,33 @@
+import time
+
+RETRY_SECONDS = 30
+"""Seconds after a failure of Redis during which it isn't requested again"""
+
+
+class RedisBackoff:
+    """
+    State of Redis for a client with an in-process fallback.
+    After a failure Redis isn't requested for {retry_seconds}, so calls don't wait for connection timeouts,
+    and the outage is reported once
+    """
+
+    def __init__(self, retry_seconds: float = RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._failed_at = None
+
+    def is_available(self) -> bool:
+        """Whether Redis could be requested: it didn't fail or it is time to retry"""
+        failed_at = self._failed_at
+        return failed_at is None or time.monotonic() - failed_at >= self.retry_seconds
+
+    def fail(self) -> bool:
+        """Registering a failure of Redis, returns True if it is the first failure of the outage"""
+        first_failure = self._failed_at is None
+        self._failed_at = time.monotonic()
+        return first_failure
+
+    def succeed(self) -> bool:
+        """Registering a successful request, returns True if it ends the outage"""
+        outage_ended = self._failed_at is not None
+        self._failed_at = None
+        return outage_ended
@@ -0,0 +1,69 @@
+from datetime import datetime, date, time, timedelta
+from typing import Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, QuerySet
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from app.models import Post, RunnerTotals, RunnerDay
+
+UPDATE_CHUNK_SIZE = 500
+"""Number of runners which totals are recomputed by one query"""
+
+
+def update_totals(runnings: Iterable[Tuple[int, datetime]]):
+    """
+    Recomputing totals of runners after changing of their runnings {runnings} (author id and date of posts,
+    including deleted ones). Totals for whole time and days of the changed runnings are recomputed
+    only from runnings of these runners (by index of the author), totals without runnings are deleted
+    """
+    runnings = list(runnings)
+    if not runnings:
+        return
+
+    profile_ids = sorted({author_id for author_id, _ in runnings})
+    days = sorted({timezone.localdate(running_date) for _, running_date in runnings})
+
+    with transaction.atomic():
+        for start in range(0, len(profile_ids), UPDATE_CHUNK_SIZE):
+            chunk = profile_ids[start:start + UPDATE_CHUNK_SIZE]
+            chunk_runnings = Post.runnings.filter(author_id__in=chunk)
+            RunnerTotals.objects.filter(profile_id__in=chunk).delete()
+            RunnerTotals.objects.bulk_create(_aggregate_totals(chunk_runnings))
+
+            day_runnings = chunk_runnings.filter(date__gte=get_day_start(days[0]),
+                                                 date__lt=get_day_start(days[-1] + timedelta(days=1)))
+            RunnerDay.objects.filter(profile_id__in=chunk, day__in=days).delete()
+            RunnerDay.objects.bulk_create(
+                runner_day for runner_day in _aggregate_days(day_runnings) if runner_day.day in days)
+
+
+@transaction.atomic
+def rebuild_totals():
+    RunnerTotals.objects.all().delete()
+    RunnerTotals.objects.bulk_create(_aggregate_totals(Post.runnings.all()))
+    RunnerDay.objects.all().delete()
+    RunnerDay.objects.bulk_create(_aggregate_days(Post.runnings.all()))
+
+
+def get_day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate_totals(runnings: QuerySet) -> List[RunnerTotals]:
+    rows = runnings.order_by().values('author_id').annotate(
+        running_count=Count('id'),
+        distance_sum=Sum('distance'),
+        first_run_date=Min('date'),
+        last_run_date=Max('date')
+    )
+    return [RunnerTotals(profile_id=row.pop('author_id'), **row) for row in rows]
+
+
+def _aggregate_days(runnings: QuerySet) -> List[RunnerDay]:
+    rows = runnings.order_by().annotate(day=TruncDate('date')).values('day', 'author_id').annotate(
+        running_count=Count('id'),
+        distance_sum=Sum('distance')
+    )
+    return [RunnerDay(profile_id=row.pop('author_id'), **row) for row in rows]
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from app.models import Post
+from app.services import parse_cache
+
+LOAD_CHUNK_SIZE = 2000
+"""Number of rows which are fetched from DB at once, so rows of the whole history aren't kept in memory"""
+
+
+@dataclass
+class RecomputedRunnings:
+    """Running fields recomputed by cumulative pass, parallel to columns of `RunningColumns`"""
+
+    numbers: List[Optional[int]]
+
+    sum_distances: List[Optional[int]]
+
+    statuses: List[int]
+
+    last_sum_distances: List[int]
+    """Sum distance of the previous running for every post"""
+
+
+@dataclass
+class RunningColumns:
+    """
+    Posts ordered by date as compact columns: ids, parsed sum expressions and stored running fields.
+    Running fields are recomputed for all posts at once with prefix sums.
+    Hand edited posts are anchors: they keep stored fields and runnings after them are recomputed from them
+    """
+
+    ids: List[int]
+
+    start_sums: List[Optional[int]]
+    """Parsed start sums, None if text isn't parsed"""
+
+    distances: List[Optional[int]]
+    """Parsed distances, None if text isn't parsed"""
+
+    end_sums: List[Optional[int]]
+    """Parsed end sums, None if text isn't parsed"""
+
+    numbers: List[Optional[int]]
+
+    post_distances: List[Optional[int]]
+    """Stored distances, they differ from parsed ones after hand editing"""
+
+    sum_distances: List[Optional[int]]
+
+    statuses: List[int]
+
+    hand_edited: List[bool]
+    """Posts which are edited in admin (`Post.last_update` is set)"""
+
+    @classmethod
+    def load(cls, posts: QuerySet) -> 'RunningColumns':
+        """Loading posts with one query without creating model instances, unchanged texts aren't parsed again"""
+        columns = cls([], [], [], [], [], [], [], [], [])
+        rows = posts.values_list('id', 'text', 'text_hash', 'number', 'distance', 'sum_distance', 'status',
+                                 'last_update').iterator(chunk_size=LOAD_CHUNK_SIZE)
+        for post_id, text, text_hash, number, distance, sum_distance, status, last_update in rows:
+            parser_out = parse_cache.parse(text, text_hash)
+            columns.ids.append(post_id)
+            columns.start_sums.append(parser_out.start_sum_number if parser_out else None)
+            columns.distances.append(parser_out.distance if parser_out else None)
+            columns.end_sums.append(parser_out.end_sum_number if parser_out else None)
+            columns.numbers.append(number)
+            columns.post_distances.append(distance)
+            columns.sum_distances.append(sum_distance)
+            columns.statuses.append(status)
+            columns.hand_edited.append(last_update is not None)
+
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def recompute(self, last_post_number: int, last_sum_distance: int) -> RecomputedRunnings:
+        """Recomputing numbers, sums and statuses after the running with {last_post_number} and {last_sum_distance}"""
+        recomputed = RecomputedRunnings([], [], [], [])
+        start = 0
+        for anchor in [i for i, hand_edited in enumerate(self.hand_edited) if hand_edited]:
+            last_post_number, last_sum_distance = self._recompute_range(start, anchor, last_post_number,
+                                                                        last_sum_distance, recomputed)
+            recomputed.numbers.append(self.numbers[anchor])
+            recomputed.sum_distances.append(self.sum_distances[anchor])
+            recomputed.statuses.append(self.statuses[anchor])
+            recomputed.last_sum_distances.append(last_sum_distance)
+
+            # Runnings after the hand edited running continue it
+            if self.numbers[anchor] is not None:
+                last_post_number, last_sum_distance = self.numbers[anchor], self.sum_distances[anchor]
+            start = anchor + 1
+
+        self._recompute_range(start, len(self.ids), last_post_number, last_sum_distance, recomputed)
+        return recomputed
+
+    def _recompute_range(self, start: int, end: int, last_post_number: int, last_sum_distance: int,
+                         recomputed: RecomputedRunnings) -> Tuple[int, int]:
+        """
+        Appending runnings of posts from {start} to {end} (exclusive) recomputed with prefix sums,
+        returns number and sum distance of the last running
+        """
+        distances = self.distances[start:end]
+        parsed = [distance is not None for distance in distances]
+        number_prefix = list(accumulate(parsed, initial=last_post_number))
+        sum_prefix = list(accumulate((distance or 0 for distance in distances), initial=last_sum_distance))
+
+        for i, is_parsed in enumerate(parsed):
+            if not is_parsed:
+                recomputed.statuses.append(Post.Status.ERROR_PARSE)
+            elif self.start_sums[start + i] != sum_prefix[i]:
+                recomputed.statuses.append(Post.Status.ERROR_START_SUM)
+            elif self.end_sums[start + i] != sum_prefix[i + 1]:
+                recomputed.statuses.append(Post.Status.ERROR_SUM)
+            else:
+                recomputed.statuses.append(Post.Status.SUCCESS)
+
+        recomputed.numbers.extend(number if is_parsed else None
+                                  for number, is_parsed in zip(number_prefix[1:], parsed))
+        recomputed.sum_distances.extend(sum_ if is_parsed else None for sum_, is_parsed in zip(sum_prefix[1:], parsed))
+        recomputed.last_sum_distances.extend(sum_prefix[:-1])
+
+        return number_prefix[-1], sum_prefix[-1]
+
+    def get_changed_indexes(self, recomputed: RecomputedRunnings) -> List[int]:
+        return [i for i in range(len(self.ids))
+                if not self.hand_edited[i]
+                and (self.numbers[i] != recomputed.numbers[i]
+                     or self.post_distances[i] != self.distances[i]
+                     or self.sum_distances[i] != recomputed.sum_distances[i]
+                     or self.statuses[i] != recomputed.statuses[i])]
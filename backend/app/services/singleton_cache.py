@@ -0,0 +1,148 @@
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Type
+
+import redis
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.signals import post_save, post_delete
+from redis.exceptions import RedisError
+
+from app.models import Config, TempData
+from app.services.redis_backoff import RedisBackoff
+
+CACHE_TTL = 60
+"""
+Seconds after which a cached row is reloaded.
+It limits staleness of values which are changed without signals (e.g. rolled back transactions)
+"""
+
+CHANNEL_PREFIX = 'singleton_cache'
+
+logger = logging.getLogger(__name__)
+
+
+class SingletonCache:
+    """
+    Process-local cache of the single row of {model}.
+    The row is dropped on changing in this process through model signals
+    and in other processes through Redis pub/sub. Without Redis the row is loaded on every call,
+    Redis is retried after a backoff (see RedisBackoff).
+    The row is cached only outside of transactions, but the cached row is used inside them too
+    """
+
+    def __init__(self, model: Type[models.Model], redis_url: str = None, ttl: float = CACHE_TTL):
+        self.model = model
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.channel = f'{CHANNEL_PREFIX}:{model._meta.label_lower}'
+        self._instance = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        self._client = None
+        self._listener = None
+        self._listener_pid = None
+        self._backoff = RedisBackoff()
+
+        post_save.connect(self._on_change, sender=model, weak=False)
+        post_delete.connect(self._on_change, sender=model, weak=False)
+
+    def get(self) -> models.Model:
+        """Getting a copy of the row, so callers can change it without affecting the cache"""
+        if not self._listen():
+            return self.model.objects.get()
+
+        with self._lock:
+            instance = self._instance
+            if instance is None or time.monotonic() - self._loaded_at > self.ttl:
+                instance = self.model.objects.get()
+                # The row which is read in a transaction could be changed by it and be rolled back,
+                # so only rows which are read outside of transactions are cached
+                if not connection.in_atomic_block:
+                    self._instance = instance
+                    self._loaded_at = time.monotonic()
+
+            return copy.copy(instance)
+
+    def invalidate(self):
+        """Dropping the row now and after commit of the current transaction in all processes"""
+        self._clear()
+        transaction.on_commit(self._publish)
+
+    def _on_change(self, **kwargs):
+        self.invalidate()
+
+    def _clear(self):
+        with self._lock:
+            self._instance = None
+
+    def _publish(self):
+        self._clear()
+        # Other processes don't cache the row without Redis too
+        if not self._backoff.is_available():
+            return
+
+        try:
+            self._get_client().publish(self.channel, '')
+        except RedisError as e:
+            if self._backoff.fail():
+                logger.warning(f'Cache "{self.channel}" is not invalidated in other processes: {e}')
+
+    def _listen(self) -> bool:
+        """Starting listening of invalidation messages (once per process), returns False if Redis is unavailable"""
+        if self._listener is not None and self._listener.is_alive() and self._listener_pid == os.getpid():
+            return True
+
+        if not self._backoff.is_available():
+            return False
+
+        try:
+            pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.channel)
+        except RedisError as e:
+            if self._backoff.fail():
+                logger.warning(f'Cache "{self.channel}" is disabled, Redis is unavailable: {e}')
+            return False
+
+        if self._backoff.succeed():
+            logger.info(f'Cache "{self.channel}" is enabled again, Redis is available')
+
+        # Messages could be missed while not listening
+        self._clear()
+        self._listener = threading.Thread(target=self._receive, args=(pubsub,), daemon=True, name=self.channel)
+        self._listener_pid = os.getpid()
+        self._listener.start()
+        return True
+
+    def _receive(self, pubsub: redis.client.PubSub):
+        try:
+            while True:
+                if pubsub.get_message(timeout=self.ttl) is not None:
+                    self._clear()
+        except RedisError as e:
+            logger.warning(f'Cache "{self.channel}" stopped listening: {e}')
+            self._clear()
+        finally:
+            pubsub.close()
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None or self._listener_pid != os.getpid():
+            self._client = redis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+
+        return self._client
+
+
+config_cache = SingletonCache(Config, settings.REDIS_URL)
+
+temp_data_cache = SingletonCache(TempData, settings.REDIS_URL)
+
+
+def get_config() -> Config:
+    return config_cache.get()
+
+
+def get_temp_data() -> TempData:
+    return temp_data_cache.get()
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from app.models import StatLog
+from app.serializers import StatSerializer
+from app.services import stat_service
+from app.services.lru_cache import LruCache
+
+CACHE_SIZE = 128
+"""Max number of cached stats, the least recently used ones are evicted"""
+
+stat_cache = LruCache(CACHE_SIZE)
+"""
+Serialized stats by (stat type, start range, end range, data version).
+Stats of the previous data versions aren't requested after changing of posts and are evicted over time
+"""
+
+
+def get_stat_data(stat_type: StatLog.StatType, start_range: Optional[int], end_range: Optional[int]) -> dict:
+    """
+    Getting serialized stat (see `stat_service.calc_stat`) from the cache.
+    The data version is read before calculating, so the stat of data changed meanwhile is cached for the old version
+    """
+    key = (stat_type, start_range, end_range, stat_service.get_data_version())
+    return stat_cache.get(key, lambda: StatSerializer(stat_service.calc_stat(stat_type, start_range, end_range)).data)
@@ -1,16 +1,18 @@
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict
 
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Sum, F, Count
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 
-from app.models import Profile, StatLog, Post, TempData
-from app.services import vk_api_service
-from app.util import find_all, get_count_days, date_to_js_unix_time, js_unix_time_to_date
+from app.models import Profile, StatLog, Post, TempData, RunnerTotals, RunnerDay
+from app.services import vk_api_service, singleton_cache
+from app.services.runner_totals_service import get_day_start
+from app.util import get_count_days, date_to_js_unix_time, js_unix_time_to_date
 from ws import ws_service
 from ws.ws_service import ObjectType
 
@@ -101,7 +103,6 @@ class StatDto:
                        start_value=start_value, end_value=end_value)
 
 
-@transaction.atomic
 def calc_stat(stat_type: StatLog.StatType, start_range: Optional[int], end_range: Optional[int]):
     stat = StatDto()
 
@@ -117,40 +118,194 @@ def calc_stat(stat_type: StatLog.StatType, start_range: Optional[int], end_range
     else:
         raise RuntimeError(f'Unsupported stat type: {stat_type}')
 
-    first_running = _get_one_running()
-    first_int_running = _get_one_running(stat)
-    last_int_running = _get_one_running(stat, direction='-')
-    last_running = last_int_running
-
-    if not first_running or not last_running or not first_int_running or not last_int_running:
+    runners = list(Profile.objects.raw(*_create_runners_query(stat_type, stat)))
+    if not runners or runners[0].last_int_date is None:
         raise Post.DoesNotExist()
 
+    bounds = runners[0]
+    first_date = _to_datetime(bounds.first_date)
+    last_date = _to_datetime(bounds.last_int_date)
+
     if not stat.start_date:
-        stat.start_date = first_int_running.date
+        stat.start_date = _to_datetime(bounds.first_int_date)
 
     if not stat.end_date:
-        stat.end_date = last_int_running.date
+        stat.end_date = last_date
 
-    runners = _get_runners(first_running, last_running)
-    int_runners = _get_runners(first_int_running, last_int_running)
+    def top(rank: str, count: int) -> list:
+        return sorted([r for r in runners if getattr(r, rank) <= count], key=lambda r: getattr(r, rank))
 
-    stat.top_all_runners = runners[:TOP_RUNNERS_COUNT]
-    stat.top_interval_runners = int_runners[:TOP_RUNNERS_COUNT]
-    stat.all_runners_count = len(runners)
-    stat.interval_runners_count = len(int_runners)
-    stat.new_runners, stat.new_runners_count = _get_new_runners(int_runners, stat.start_date)
+    stat.top_all_runners = [RunnerDto(r, r.running_count, r.distance_sum)
+                            for r in top('distance_rank', TOP_RUNNERS_COUNT) if r.running_count > 0]
+    stat.top_interval_runners = [RunnerDto(r, r.int_running_count, r.int_distance_sum)
+                                 for r in top('int_distance_rank', TOP_RUNNERS_COUNT) if r.int_running_count > 0]
+    stat.all_runners_count = bounds.runners_count
+    stat.interval_runners_count = bounds.int_runners_count
+    stat.new_runners = [r for r in top('new_rank', MAX_NEW_RUNNERS_COUNT) if r.is_new]
+    stat.new_runners_count = bounds.new_runners_count
 
-    stat.all_days_count = get_count_days(first_running.date, last_running.date)
+    stat.all_days_count = get_count_days(first_date, last_date)
     stat.interval_days_count = get_count_days(stat.start_date, stat.end_date)
-    stat.all_distance = last_running.sum_distance
-    stat.all_training_count = last_running.number
+    stat.all_distance = bounds.last_sum_distance
+    stat.all_training_count = bounds.last_number
 
-    stat.max_one_man_distance = runners[0]
-    stat.max_one_man_training_count = sorted(runners, key=lambda it: it.running_count, reverse=True)[0]
+    stat.max_one_man_distance = stat.top_all_runners[0]
+    max_count_runner = top('count_rank', 1)[0]
+    stat.max_one_man_training_count = RunnerDto(max_count_runner, max_count_runner.running_count,
+                                                max_count_runner.distance_sum)
 
     return stat
 
 
+def _create_runners_query(stat_type: StatLog.StatType, stat: StatDto) -> Tuple[str, list]:
+    """
+    Creating the statement which calculates the stat at once. It returns profiles of runners which are shown
+    in the stat (top runners, the runner with max runnings and new runners) with their ranks and bounds of the stat.
+    Runners for whole time are got from totals of runners (RunnerTotals) without runnings after the interval.
+    Runners in the interval of date stat are got from runnings by days (RunnerDay) and runnings of partial days
+    at the edges, other intervals are aggregated from runnings between the first and the last running of the interval
+    """
+    qn = connection.ops.quote_name
+    post, profile, totals = [qn(model._meta.db_table) for model in [Post, Profile, RunnerTotals]]
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+
+    conditions, params = ['number IS NOT NULL'], []
+    if stat.start_date:
+        conditions.append('date >= %s')
+        params.append(adapt_datetime(stat.start_date))
+    if stat.end_date:
+        conditions.append('date <= %s')
+        params.append(adapt_datetime(stat.end_date))
+    if stat.start_distance:
+        conditions.append('sum_distance - distance >= %s')
+        params.append(stat.start_distance)
+    if stat.end_distance:
+        conditions.append('sum_distance - distance < %s')
+        params.append(stat.end_distance)
+
+    if stat_type == StatLog.StatType.DATE:
+        interval_values, interval_params = _create_day_values_query(stat.start_date, stat.end_date)
+    else:
+        interval_values = f'''
+            SELECT author_id, 0, 0, 1, distance FROM {post} CROSS JOIN bounds
+            WHERE number IS NOT NULL AND date >= bounds.first_int_date AND date <= bounds.last_int_date'''
+        interval_params = []
+
+    sql = f'''
+        WITH interval_runnings AS (
+            SELECT date, number, sum_distance FROM {post} WHERE {' AND '.join(conditions)}
+        ), bounds AS (
+            SELECT (SELECT MIN(first_run_date) FROM {totals}) AS first_date,
+                   MIN(date) AS first_int_date,
+                   MAX(date) AS last_int_date,
+                   (SELECT number FROM interval_runnings ORDER BY date DESC LIMIT 1) AS last_number,
+                   (SELECT sum_distance FROM interval_runnings ORDER BY date DESC LIMIT 1) AS last_sum_distance
+            FROM interval_runnings
+        ), runner_values AS (
+            SELECT profile_id, running_count, distance_sum, 0 AS int_running_count, 0 AS int_distance_sum
+            FROM {totals}
+            UNION ALL
+            SELECT author_id, -1, -distance, 0, 0 FROM {post} CROSS JOIN bounds
+            WHERE number IS NOT NULL AND date > bounds.last_int_date
+            UNION ALL
+            {interval_values}
+        ), runners AS (
+            SELECT {profile}.*,
+                   SUM(running_count) AS running_count,
+                   SUM(distance_sum) AS distance_sum,
+                   SUM(int_running_count) AS int_running_count,
+                   SUM(int_distance_sum) AS int_distance_sum
+            FROM runner_values JOIN {profile} ON {profile}.id = runner_values.profile_id
+            GROUP BY {profile}.id
+        ), ranked_runners AS (
+            SELECT runners.*,
+                   CASE WHEN int_running_count > 0 AND join_date >= COALESCE(%s, bounds.first_int_date)
+                       THEN 1 ELSE 0 END AS is_new
+            FROM runners CROSS JOIN bounds
+        ), stat_runners AS (
+            SELECT ranked_runners.*,
+                   ROW_NUMBER() OVER (ORDER BY CASE WHEN running_count > 0 THEN 0 ELSE 1 END,
+                                      distance_sum DESC, id) AS distance_rank,
+                   ROW_NUMBER() OVER (ORDER BY CASE WHEN running_count > 0 THEN 0 ELSE 1 END,
+                                      running_count DESC, distance_sum DESC, id) AS count_rank,
+                   ROW_NUMBER() OVER (ORDER BY CASE WHEN int_running_count > 0 THEN 0 ELSE 1 END,
+                                      int_distance_sum DESC, id) AS int_distance_rank,
+                   ROW_NUMBER() OVER (ORDER BY is_new DESC, join_date, int_distance_sum DESC, id) AS new_rank,
+                   SUM(CASE WHEN running_count > 0 THEN 1 ELSE 0 END) OVER () AS runners_count,
+                   SUM(CASE WHEN int_running_count > 0 THEN 1 ELSE 0 END) OVER () AS int_runners_count,
+                   SUM(is_new) OVER () AS new_runners_count
+            FROM ranked_runners
+        )
+        SELECT stat_runners.*, bounds.* FROM stat_runners CROSS JOIN bounds
+        WHERE distance_rank <= %s OR count_rank = 1 OR int_distance_rank <= %s OR new_rank <= %s
+        ORDER BY distance_rank'''
+
+    date_param = adapt_datetime(stat.start_date) if stat_type == StatLog.StatType.DATE and stat.start_date else None
+    params += [*interval_params, date_param, TOP_RUNNERS_COUNT, TOP_RUNNERS_COUNT, MAX_NEW_RUNNERS_COUNT]
+    return sql, params
+
+
+def _create_day_values_query(start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[str, list]:
+    """
+    Creating the part of the stat statement which selects runnings of runners between {start_date} and {end_date}.
+    Whole days are got from runnings by days, only runnings of partial days at the edges are got from posts
+    """
+    qn = connection.ops.quote_name
+    post, runner_day = qn(Post._meta.db_table), qn(RunnerDay._meta.db_table)
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    adapt_date = connection.ops.adapt_datefield_value
+
+    first_day = None
+    if start_date:
+        first_day = timezone.localdate(start_date)
+        if start_date > get_day_start(first_day):
+            first_day += timedelta(days=1)
+
+    last_day = None
+    if end_date:
+        last_day = timezone.localdate(end_date)
+        if end_date < get_day_start(last_day + timedelta(days=1)) - timedelta(seconds=1):
+            last_day -= timedelta(days=1)
+
+    if first_day and last_day and first_day > last_day:
+        # The interval is inside of one day
+        sql = f'SELECT author_id, 0, 0, 1, distance FROM {post} WHERE number IS NOT NULL AND date >= %s AND date <= %s'
+        return sql, [adapt_datetime(start_date), adapt_datetime(end_date)]
+
+    day_conditions, day_params = ['1 = 1'], []
+    edges, edge_params = [], []
+    if first_day:
+        day_conditions.append('day >= %s')
+        day_params.append(adapt_date(first_day))
+        edges.append('date >= %s AND date < %s')
+        edge_params += [adapt_datetime(start_date), adapt_datetime(get_day_start(first_day))]
+    if last_day:
+        day_conditions.append('day <= %s')
+        day_params.append(adapt_date(last_day))
+        edges.append('date >= %s AND date <= %s')
+        edge_params += [adapt_datetime(get_day_start(last_day + timedelta(days=1))), adapt_datetime(end_date)]
+
+    sql = f'''SELECT profile_id, 0, 0, running_count, distance_sum FROM {runner_day}
+            WHERE {' AND '.join(day_conditions)}'''
+    if edges:
+        sql += f'''
+            UNION ALL
+            SELECT author_id, 0, 0, 1, distance FROM {post}
+            WHERE number IS NOT NULL AND ({' OR '.join(f'({edge})' for edge in edges)})'''
+
+    return sql, day_params + edge_params
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """Converting value of not model column of raw query, SQLite returns dates as strings"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+
+    return value
+
+
 def _get_one_running(stat: StatDto = None, direction: str = '') -> Optional[Post]:
     runnings = Post.runnings.order_by(f'{direction}date')\
         .annotate(start_sum_distance=F('sum_distance')-F('distance'))
@@ -168,40 +323,84 @@ def _get_one_running(stat: StatDto = None, direction: str = '') -> Optional[Post
     return runnings.first()
 
 
-def _get_runners(first_running: Post, last_running: Post) -> List[RunnerDto]:
-    runners = Profile.objects\
-        .filter(post__number__isnull=False, post__date__gte=first_running.date, post__date__lte=last_running.date)\
-        .annotate(running_count=Count('post__number')) \
-        .annotate(distance_sum=Sum('post__distance')) \
-        .order_by('-distance_sum')
-
-    return [RunnerDto(r, r.running_count, r.distance_sum) for r in runners]
-
+def get_stat() -> dict:
+    """Getting header counters, they are read from the cached TempData row (see `update_counters`)"""
+    temp_data = singleton_cache.get_temp_data()
+    return {
+        'distance_sum': temp_data.distance_sum,
+        'running_count': temp_data.running_count,
+        'post_count': temp_data.post_count
+    }
 
-def _get_new_runners(runners: List[RunnerDto], start_date: datetime):
-    new_runners = find_all(runners, lambda it: it.profile.join_date >= start_date)
-    new_runners = [r.profile for r in new_runners]
-    new_runners = sorted(new_runners, key=lambda it: it.join_date)
 
-    return new_runners[:MAX_NEW_RUNNERS_COUNT], len(new_runners)
+def update_counters(post_count_delta: int = 0):
+    """
+    Updating header counters in the transaction of changing of posts.
+    Post count is changed by {post_count_delta}, sums are taken from the last running
+    """
+    last_running = _get_one_running(direction='-')
+    TempData.objects.update(
+        post_count=F('post_count') + post_count_delta,
+        running_count=last_running.number if last_running else 0,
+        distance_sum=last_running.sum_distance if last_running else 0
+    )
+    singleton_cache.temp_data_cache.invalidate()
 
 
-def get_stat() -> dict:
-    last_post = _get_one_running(direction='-')
+def calc_counters() -> dict:
+    last_running = _get_one_running(direction='-')
     return {
-        'distance_sum': last_post.sum_distance if last_post else 0,
-        'running_count': last_post.number if last_post else 0,
-        'post_count': Post.objects.count()
+        'post_count': Post.objects.count(),
+        'running_count': last_running.number if last_running else 0,
+        'distance_sum': last_running.sum_distance if last_running else 0
     }
 
 
 @transaction.atomic
-def update_stat():
+def reconcile_counters(dry_run: bool = False) -> Dict[str, Tuple[int, int]]:
+    """Recomputing header counters from posts, returns drifted counters with their stored and actual values"""
+    temp_data = TempData.objects.select_for_update().get()
+    counters = calc_counters()
+    drift = {name: (getattr(temp_data, name), value) for name, value in counters.items()
+             if getattr(temp_data, name) != value}
+
+    if drift and not dry_run:
+        TempData.objects.update(**counters)
+        singleton_cache.temp_data_cache.invalidate()
+
+    return drift
+
+
+@transaction.atomic
+def update_stat(full_sync: bool = False):
+    update_last_sync_date(full_sync)
+    bump_data_version()
+    ws_service.main_group_send(get_stat(), ObjectType.STAT)
+
+
+def update_last_sync_date(full_sync: bool = False):
+    """Updating date of the last sync, date of the last full sync is updated only if {full_sync}"""
     temp_data = TempData.objects.get()
     temp_data.last_sync_date = timezone.now()
-    temp_data.save()
+    update_fields = ['last_sync_date']
+    if full_sync:
+        temp_data.last_full_sync_date = temp_data.last_sync_date
+        update_fields.append('last_full_sync_date')
+
+    # Only the dates are written, counters could be changed meanwhile
+    temp_data.save(update_fields=update_fields)
+    singleton_cache.temp_data_cache.invalidate()
     ws_service.main_group_send(date_to_js_unix_time(temp_data.last_sync_date), ObjectType.LAST_SYNC_DATE)
-    ws_service.main_group_send(get_stat(), ObjectType.STAT)
+
+
+def get_data_version() -> int:
+    return singleton_cache.get_temp_data().data_version
+
+
+def bump_data_version():
+    """Changing version of posts data, so stats which are cached for the previous version aren't used anymore"""
+    TempData.objects.update(data_version=F('data_version') + 1)
+    singleton_cache.temp_data_cache.invalidate()
 
 
 @transaction.atomic
@@ -0,0 +1,59 @@
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from django.conf import settings
+
+from app.util import date_to_js_unix_time, js_unix_time_to_date
+
+logger = logging.getLogger(__name__)
+
+
+class JournalRecord(NamedTuple):
+    """Written block of sync"""
+
+    offset: int
+
+    vk_post_count: int
+
+    response: dict
+    """Response of wall.get"""
+
+    vk_profiles: Dict[int, dict]
+    """VK users and groups (with negative ids) from which profiles of new authors are created"""
+
+    deleted_posts_start_date: Optional[datetime] = None
+    """Posts since the date were checked for deletion, it's absent in records of old journals"""
+
+
+def append(record: JournalRecord, path: str = None):
+    """
+    Appending the record into the journal {path} (by default SYNC_JOURNAL_PATH, if it isn't set the journal is off).
+    The journal is gzip file of JSON lines, every record is appended as a separate gzip member
+    """
+    path = path or settings.SYNC_JOURNAL_PATH
+    if not path:
+        return
+
+    try:
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            data = record._asdict()
+            if record.deleted_posts_start_date is not None:
+                data['deleted_posts_start_date'] = date_to_js_unix_time(record.deleted_posts_start_date)
+            f.write(json.dumps(data, ensure_ascii=False) + '\n')
+    except OSError as e:
+        logger.warning(f'Sync block (offset: {record.offset}) is not written into journal "{path}": {e}')
+
+
+def read(path: str) -> Iterator[JournalRecord]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            data = json.loads(line)
+            vk_profiles = {int(profile_id): vk_profile for profile_id, vk_profile in data['vk_profiles'].items()}
+            deleted_posts_start_date = data.get('deleted_posts_start_date')
+            if deleted_posts_start_date is not None:
+                deleted_posts_start_date = js_unix_time_to_date(deleted_posts_start_date)
+            yield JournalRecord(data['offset'], data['vk_post_count'], data['response'], vk_profiles,
+                                deleted_posts_start_date)
@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from app.models import Post, TempData
+from app.services import singleton_cache, stat_service, vk_api_service
+
+RATE_WINDOW = timedelta(hours=1)
+"""Period of the recent posts and width of the window around the same time of previous days"""
+
+RATE_HISTORY_DAYS = 7
+"""Number of previous days which give the usual rate of posts at the current time of day"""
+
+POSTS_PER_SYNC = 1
+"""Expected number of new posts between syncs"""
+
+logger = logging.getLogger(__name__)
+
+
+def is_sync_due(now: datetime = None) -> bool:
+    next_sync_date = singleton_cache.get_temp_data().next_sync_date
+    return next_sync_date is None or next_sync_date <= (now or timezone.now())
+
+
+def schedule_next_sync(now: datetime = None) -> datetime:
+    now = now or timezone.now()
+    next_sync_date = now + timedelta(seconds=get_sync_interval(now))
+    TempData.objects.update(next_sync_date=next_sync_date)
+    singleton_cache.temp_data_cache.invalidate()
+    logger.debug(f'>> Next sync: {next_sync_date}')
+    return next_sync_date
+
+
+def request_sync():
+    """Making the sync due at the next run of the sync task"""
+    TempData.objects.update(next_sync_date=timezone.now())
+    singleton_cache.temp_data_cache.invalidate()
+
+
+def get_sync_interval(now: datetime = None) -> float:
+    """
+    Getting seconds between syncs which are expected to bring {POSTS_PER_SYNC} new posts
+    within {SYNC_MIN_INTERVAL} and {SYNC_MAX_INTERVAL}.
+    The rate is the max of the rate of recent posts and the usual rate at the current time of day.
+    New posts come by VK Callback API if it is enabled, so the sync only reconciles posts with VK
+    """
+    if settings.VK_CALLBACK_SECRET:
+        return settings.SYNC_MAX_INTERVAL
+
+    rate = get_post_rate(now)
+    if rate == 0:
+        return settings.SYNC_MAX_INTERVAL
+
+    return min(max(POSTS_PER_SYNC / rate, settings.SYNC_MIN_INTERVAL), settings.SYNC_MAX_INTERVAL)
+
+
+def get_post_rate(now: datetime = None) -> float:
+    """Getting number of posts per second by one query"""
+    now = now or timezone.now()
+    usual_filter = Q()
+    for day in range(1, RATE_HISTORY_DAYS + 1):
+        day_now = now - timedelta(days=day)
+        usual_filter |= Q(date__gt=day_now - RATE_WINDOW / 2, date__lte=day_now + RATE_WINDOW / 2)
+
+    counts = Post.objects.filter(date__gt=now - timedelta(days=RATE_HISTORY_DAYS) - RATE_WINDOW).aggregate(
+        recent=Count('id', filter=Q(date__gt=now - RATE_WINDOW, date__lte=now)),
+        usual=Count('id', filter=usual_filter)
+    )
+
+    window_seconds = RATE_WINDOW.total_seconds()
+    return max(counts['recent'] / window_seconds, counts['usual'] / (RATE_HISTORY_DAYS * window_seconds))
+
+
+def need_sync(now: datetime = None) -> bool:
+    """
+    Checking by one wall post whether new posts are published or posts are deleted.
+    Edited posts aren't visible this way, so the full sync is done at least every {SYNC_MAX_INTERVAL} seconds.
+    If the wall isn't changed, posts are up to date, so the check is recorded as the last sync
+    """
+    now = now or timezone.now()
+    last_full_sync_date = singleton_cache.get_temp_data().last_full_sync_date
+    if last_full_sync_date is None or now - last_full_sync_date >= timedelta(seconds=settings.SYNC_MAX_INTERVAL):
+        return True
+
+    response = vk_api_service.get_wall_posts(0, 1)
+    db_stat = Post.objects.aggregate(count=Count('id'), last_id=Max('id'))
+    if response['count'] != db_stat['count']:
+        return True
+
+    # The first post could be pinned, it is older than the last one
+    if response['items'] and response['items'][0]['id'] > (db_stat['last_id'] or 0):
+        return True
+
+    stat_service.update_last_sync_date()
+    return False
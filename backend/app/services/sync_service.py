@@ -1,17 +1,25 @@
 import logging
-import time
+import queue
+import threading
 from datetime import datetime, timedelta
 from hashlib import md5
-from typing import List, Iterator
+from typing import List, Tuple, Dict, Optional
 
-from django.db import transaction
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models import Q
 from django.utils import timezone
 
-from app.models import Post, Profile, Config
+from app.models import Post, Profile
 from app.serializers import PostSerializer
-from app.services import vk_api_service, message_parser, stat_service
-from app.util import find, find_all, remove_non_utf8_chars
+from app.services import vk_api_service, parse_cache, stat_service, comment_service, sync_journal, \
+    runner_totals_service
+from app.services.lease_lock import LeaseLock
+from app.services.metrics import LatencyMetrics
+from app.services.running_columns import RunningColumns
+from app.services.sync_window import SyncWindow
+from app.util import remove_non_utf8_chars
 from ws import ws_service
 from ws.ws_service import EventType, ObjectType
 
@@ -27,69 +35,311 @@ Post count for searching last data.
 Some posts may change or delete
 """
 
-SYNC_BLOCK_INTERVAL = 1
-"""Interval between requests to vk in seconds"""
+BACKFILL_SYNC = True
+"""
+Downloading posts with VK execute requests if many posts are not downloaded yet.
+It is needed for the first sync of a group with many posts
+"""
+
+BACKFILL_POST_COUNT = vk_api_service.WALL_GET_MAX_COUNT * vk_api_service.EXECUTE_MAX_REQUEST_COUNT
+"""Downloading post count for one time in backfill mode"""
+
+BULK_SYNC = True
+"""
+Writing new and changed posts and profiles of sync block with one statement per model.
+Otherwise every post and profile is saved separately
+"""
+
+POST_ANALYZED_FIELDS = ['text', 'text_hash', 'number', 'distance', 'sum_distance', 'status']
+"""Post fields which are changed by analyzing post text"""
+
+ASYNC_SYNC = False
+"""
+Syncing by the asyncio pipeline (see async_sync_service),
+it downloads the next block while the current one is written
+"""
+
+PREFETCH_SYNC = False
+"""Downloading the next block in a thread while the current one is written (see BlockPrefetcher)"""
 
-GETTING_USER_INTERVAL = 0.3
-"""Interval between getting user info in seconds"""
+PREFETCH_QUEUE_SIZE = 1
+"""Max number of downloaded blocks which are waiting for writing"""
 
-PUBLISHING_COMMENT_INTERVAL = 0.3
-"""Interval between comment publishing in seconds"""
+SYNC_LOCK_TTL = 60
+"""Seconds after which the sync lock expires if the syncing process is killed"""
 
 logger = logging.getLogger(__name__)
 
+sync_lock = LeaseLock('sync_posts_lock', SYNC_LOCK_TTL, settings.REDIS_URL)
 
-@transaction.atomic
-def sync_posts():
-    logger.debug('-------- Start sync --------')
 
-    need_sync = True
-    while need_sync:
-        vk_post_count = vk_api_service.get_wall_posts(0, 1)['count']
-        db_post_count = _sync_block_posts(vk_post_count, DOWNLOAD_POST_COUNT)
-        logger.debug(f'>> Downloaded (after sync): {db_post_count}/{vk_post_count}')
+class SyncBatch:
+    """
+    New and changed posts and profiles of sync block, which are written to DB at once.
+    Comments are added into outbox and WS events are sent only after writing,
+    a {silent} batch (e.g. replay of the sync journal) doesn't add comments and doesn't send events
+    """
 
-        if db_post_count > vk_post_count:
-            raise RuntimeError(f'Number of posts in DB ({db_post_count}) > number of posts in VK ({vk_post_count})')
+    def __init__(self, bulk: bool = None, silent: bool = False):
+        self.bulk = BULK_SYNC if bulk is None else bulk
+        self.silent = silent
+        self._clear()
 
-        need_sync = db_post_count < vk_post_count
+    def add_profile(self, profile: Profile):
+        self.new_profiles.append(profile)
+        self._flush_if_not_bulk()
 
-        if need_sync:
-            time.sleep(SYNC_BLOCK_INTERVAL)
+    def add_post(self, post: Post, event_type: EventType, comment_text: str):
+        if event_type == EventType.CREATE:
+            self.new_posts.append(post)
+        else:
+            self.changed_posts[post.id] = post
+
+        if not self.silent:
+            self.comments.append((post.id, comment_text))
+            self.events.append((post, event_type))
+
+        self._flush_if_not_bulk()
+
+    def flush(self):
+        Profile.objects.bulk_create(self.new_profiles)
+        Post.objects.bulk_create(self.new_posts)
+        Post.objects.bulk_update(self.changed_posts.values(), POST_ANALYZED_FIELDS)
+        runner_totals_service.update_totals(
+            (post.author_id, post.date) for post in [*self.new_posts, *self.changed_posts.values()])
+        if self.new_posts or self.changed_posts:
+            stat_service.update_counters(len(self.new_posts))
+
+        comment_service.add_comments(self.comments)
+
+        for post, event_type in self.events:
+            ws_service.main_group_send(PostSerializer(post).data, ObjectType.POST, event_type)
+
+        self._clear()
+
+    def _flush_if_not_bulk(self):
+        if not self.bulk:
+            self.flush()
+
+    def _clear(self):
+        self.new_profiles: List[Profile] = []
+        self.new_posts: List[Post] = []
+        self.changed_posts: Dict[int, Post] = {}
+        self.comments: List[Tuple[int, str]] = []
+        self.events: List[Tuple[Post, EventType]] = []
+
+
+class BlockPrefetcher:
+    """
+    Downloading of blocks in a thread ahead of writing, downloaded blocks wait in the bounded queue.
+    Blocks are predicted: after writing of a block all posts from its offset to the newest are in DB.
+    The prefetcher is missed if the written block differs from the predicted one.
+    Durations of VK API calls are recorded into {latency} of the sync if it's passed
+    """
+
+    def __init__(self, vk_post_count: int, db_post_count: int, latency: LatencyMetrics = None):
+        self.vk_post_count = vk_post_count
+        self.latency = latency
+        self.missed = False
+        self._queue = queue.Queue(PREFETCH_QUEUE_SIZE)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._download, args=(db_post_count,), daemon=True,
+                                        name='sync_block_prefetcher')
+        self._thread.start()
+
+    def get(self, offset: int, download_count: int) -> Optional[dict]:
+        """Getting the downloaded block, returns None if the block isn't predicted"""
+        if self.missed:
+            return None
+
+        block_range, response, error = self._queue.get()
+        if error is not None:
+            raise error
+
+        if block_range != (offset, download_count):
+            logger.debug(f' -- Prefetched block {block_range} is missed, expected: {(offset, download_count)}')
+            self.missed = True
+            return None
+
+        return response
+
+    def stop(self):
+        self._stopped.set()
+        # Releasing the thread if it waits for a free place in the queue
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        self._thread.join()
+
+    def _download(self, db_post_count: int):
+        with vk_api_service.latency_metrics.collect(self.latency):
+            self._download_blocks(db_post_count)
+
+    def _download_blocks(self, db_post_count: int):
+        try:
+            while not self._stopped.is_set():
+                download_count = _get_download_count(self.vk_post_count, db_post_count)
+                offset = _get_block_offset(self.vk_post_count, db_post_count, download_count)
+                response = _download_block_posts(offset, download_count)
+                self._put(((offset, download_count), response, None))
+
+                if offset == 0 or response['count'] != self.vk_post_count:
+                    break
+
+                db_post_count = self.vk_post_count - offset
+
+            # There are no more predicted blocks
+            self._put((None, None, None))
+        except Exception as e:
+            self._put((None, None, e))
+        finally:
+            connection.close()
+
+    def _put(self, item: tuple):
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+def sync_posts_exclusively() -> bool:
+    """
+    Syncing posts if sync isn't running in another process (task, view) yet.
+    Returns False without waiting if it is running, its progress is sent to clients by the running sync
+    """
+    with sync_lock.hold() as acquired:
+        if not acquired:
+            logger.info('>> Sync is already running')
+            return False
+
+        if ASYNC_SYNC:
+            # The pipeline module depends on this one
+            from app.services.async_sync_service import sync_posts_async
+            async_to_sync(sync_posts_async)()
+        else:
+            sync_posts()
 
-    stat_service.update_stat()
+        return True
 
+
+def sync_posts():
+    """
+    Syncing posts by blocks, every block is committed in its own transaction.
+    A crashed sync resumes from the last committed block: offset of the next block is got by number of posts in DB
+    """
+    logger.debug('-------- Start sync --------')
+
+    # Only requests of this sync are logged, the global metrics are totals since start of the process
+    with vk_api_service.latency_metrics.collect() as sync_latency:
+        prefetcher: Optional[BlockPrefetcher] = None
+        try:
+            need_sync = True
+            while need_sync:
+                if prefetcher is None:
+                    vk_post_count = vk_api_service.get_wall_posts(0, 1)['count']
+                    if PREFETCH_SYNC:
+                        prefetcher = BlockPrefetcher(vk_post_count, Post.objects.count(), sync_latency)
+
+                download_count = _get_download_count(vk_post_count, Post.objects.count())
+                db_post_count = _sync_block_posts(vk_post_count, download_count, prefetcher)
+                logger.debug(f'>> Downloaded (after sync): {db_post_count}/{vk_post_count}')
+
+                if db_post_count > vk_post_count:
+                    raise RuntimeError(f'Number of posts in DB ({db_post_count}) > number of posts in VK '
+                                       f'({vk_post_count})')
+
+                need_sync = db_post_count < vk_post_count
+
+                # Number of posts in VK is checked again for the next block
+                if prefetcher is not None and prefetcher.missed:
+                    prefetcher.stop()
+                    prefetcher = None
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
+
+        stat_service.update_stat(full_sync=True)
+
+    logger.debug(f'>> VK API latency: {sync_latency}')
+    logger.debug(f'>> Parse cache: {parse_cache.parse_cache}')
     logger.debug('-------- End sync --------')
 
 
-def _sync_block_posts(vk_post_count: int, download_count: int) -> int:
+def _sync_block_posts(vk_post_count: int, download_count: int, prefetcher: BlockPrefetcher = None) -> int:
     db_post_count = Post.objects.count()
     logger.debug(f'>> Downloaded (before sync): {db_post_count}/{vk_post_count}')
 
+    offset = _get_block_offset(vk_post_count, db_post_count, download_count)
+    response = prefetcher.get(offset, download_count) if prefetcher else None
+    if response is None:
+        response = _download_block_posts(offset, download_count)
+
+    return _apply_block_posts(response, vk_post_count, offset)
+
+
+def _get_download_count(vk_post_count: int, db_post_count: int) -> int:
+    if BACKFILL_SYNC and vk_post_count - db_post_count >= BACKFILL_POST_COUNT:
+        return BACKFILL_POST_COUNT
+
+    return DOWNLOAD_POST_COUNT
+
+
+def _get_block_offset(vk_post_count: int, db_post_count: int, download_count: int) -> int:
+    """Getting offset of the oldest not downloaded block"""
     if vk_post_count - db_post_count > download_count:
-        offset = vk_post_count - db_post_count - download_count
-    else:
-        offset = 0
+        return vk_post_count - db_post_count - download_count
+
+    return 0
+
+
+def _download_block_posts(offset: int, download_count: int) -> dict:
+    if download_count > vk_api_service.WALL_GET_MAX_COUNT:
+        return vk_api_service.get_wall_posts_by_execute(offset, download_count)
+
+    return vk_api_service.get_wall_posts(offset, download_count)
+
 
-    response = vk_api_service.get_wall_posts(offset, download_count)
+@transaction.atomic
+def _apply_block_posts(response: dict, vk_post_count: int, offset: int, vk_profiles: Dict[int, dict] = None,
+                       replay: bool = False, deleted_posts_start_date: datetime = None) -> int:
+    """
+    Writing downloaded block of posts into DB, returns number of posts in DB.
+    VK profiles of authors (users and groups with negative ids) could be got in advance.
+    The block is appended into the sync journal after commit. If {replay}, the block is written from the journal:
+    it isn't appended again, comments and WS events are skipped and VK isn't requested,
+    posts are checked for deletion since {deleted_posts_start_date} of the journal record
+    """
+    # Another process could take the expired sync lock and write the same posts
+    if sync_lock.lost:
+        raise RuntimeError('Sync lock is lost, sync is stopped')
 
     if response['count'] != vk_post_count:
         logger.debug(f' -- Number of posts in VK changed: {vk_post_count} -> {response["count"]}')
-        return db_post_count
+        return Post.objects.count()
 
     vk_posts = list(reversed(response['items']))
 
-    db_profiles = list(Profile.objects.all())
-    last_db_posts = _get_last_posts(LAST_POSTS_COUNT)
-    deleted_post_ids = _remove_deleted_posts(vk_posts, last_db_posts)
+    window = SyncWindow(_get_last_posts(LAST_POSTS_COUNT))
+    batch = SyncBatch(silent=replay)
+    deleted_posts_start_date = deleted_posts_start_date or _get_deleted_posts_start_date()
+    deleted_post_ids = _remove_deleted_posts(vk_posts, window, deleted_posts_start_date)
+
+    # Searching and creating profiles of new posts
+    new_vk_posts = [vk_post for vk_post in vk_posts if vk_post['id'] not in window]
+    db_profiles = Profile.objects.in_bulk({vk_post['from_id'] for vk_post in new_vk_posts})
+    new_vk_profiles = _create_profiles(new_vk_posts, db_profiles, batch, vk_profiles, offline=replay)
 
     for vk_post in vk_posts:
         post_id = vk_post['id']
         post_text = remove_non_utf8_chars(vk_post['text'])
-        post_date = datetime.utcfromtimestamp(vk_post['date']).astimezone(timezone.get_default_timezone())
+        post_date = _get_post_date(vk_post)
         text_hash = md5(post_text.encode()).hexdigest()
-        db_post = find(last_db_posts, lambda it: it.id == post_id)
-        last_post = _get_last_post(last_db_posts, post_id, post_date)
+        db_post = window.get(post_id)
+        last_post = window.get_last_running(post_id, post_date)
         last_sum_distance = last_post.sum_distance if last_post else 0
         last_post_number = last_post.number if last_post else 0
 
@@ -99,96 +349,238 @@ def _sync_block_posts(vk_post_count: int, download_count: int) -> int:
                             or db_post.last_update is not None:
                 continue
 
-            _analyze_post_text(post_text, text_hash, last_sum_distance, last_post_number, db_post, EventType.UPDATE)
+            _analyze_post_text(post_text, text_hash, last_sum_distance, last_post_number, db_post, EventType.UPDATE,
+                               batch)
+            # Post number could be changed, so it needs to reindex it
+            window.put(db_post)
             continue
 
-        # Searching and creating a new profile
-        profile = _find_or_create_profile(vk_post, post_date, db_profiles)
+        profile = db_profiles[vk_post['from_id']]
         new_post = Post(id=post_id, status=Post.Status.SUCCESS, author=profile, date=post_date)
 
-        parser_out = _analyze_post_text(post_text, text_hash, last_sum_distance, last_post_number, new_post,
-                                        EventType.CREATE)
+        _analyze_post_text(post_text, text_hash, last_sum_distance, last_post_number, new_post, EventType.CREATE,
+                           batch)
+
+        # Adding a new post into the window, runnings are inserted in date order
+        window.put(new_post)
 
-        # Adding a new post into last posts and post sorting by time
-        if parser_out:
-            last_db_posts.append(new_post)
-            last_db_posts.sort(key=lambda p: p.date, reverse=True)
+    batch.flush()
 
     # Deleting posts from the client, after sync without exceptions
-    for post_id in deleted_post_ids:
-        ws_service.main_group_send(post_id, ObjectType.POST, EventType.REMOVE)
+    if deleted_post_ids and not replay:
+        ws_service.main_group_send(deleted_post_ids, ObjectType.POST, EventType.REMOVE_LIST)
+
+    # The block is journaled only if it's committed, e.g. it isn't if the sync lock is lost
+    if not replay:
+        record = sync_journal.JournalRecord(offset, vk_post_count, response, new_vk_profiles,
+                                            deleted_posts_start_date)
+        transaction.on_commit(lambda: sync_journal.append(record))
 
     return Post.objects.count()
 
 
+def replay_journal(path: str) -> int:
+    """
+    Writing blocks from the sync journal {path} in order of syncing, returns number of written blocks.
+    VK isn't requested: authors which are absent in DB and in the journal are created as "Unknown" placeholders.
+    Comments and WS events of posts are skipped
+    """
+    logger.debug(f'-------- Start replay of journal: {path} --------')
+
+    vk_profiles = {}
+    block_count = 0
+    for record in sync_journal.read(path):
+        vk_profiles.update(record.vk_profiles)
+        db_post_count = _apply_block_posts(record.response, record.vk_post_count, record.offset, vk_profiles,
+                                           replay=True, deleted_posts_start_date=record.deleted_posts_start_date)
+        logger.debug(f'>> Replayed block (offset: {record.offset}): {db_post_count}/{record.vk_post_count}')
+        block_count += 1
+
+    stat_service.update_stat()
+
+    logger.debug('-------- End replay of journal --------')
+    return block_count
+
+
+def can_apply_wall_post(vk_post: dict) -> bool:
+    """
+    Checking that a single VK post could be written without downloading of the wall.
+    Offsets of sync blocks are got by number of posts in DB, so a post which isn't in DB
+    is written only if all other posts of the wall are in DB (by one wall.get request)
+    """
+    if Post.objects.filter(id=vk_post['id']).exists():
+        return True
+
+    return Post.objects.count() + 1 == vk_api_service.get_wall_posts(0, 1)['count']
+
+
+@transaction.atomic
+def apply_wall_post(vk_post: dict) -> Post:
+    """
+    Writing a single new or edited VK post without downloading of the wall (e.g. from VK Callback API).
+    Runnings after the post are recomputed if it is inserted or changed in the middle
+    """
+    post_id = vk_post['id']
+    post_text = remove_non_utf8_chars(vk_post['text'])
+    post_date = _get_post_date(vk_post)
+    text_hash = md5(post_text.encode()).hexdigest()
+    last_post = Post.runnings.filter(date__lte=post_date).exclude(id=post_id).order_by('-date').first()
+    last_sum_distance = last_post.sum_distance if last_post else 0
+    last_post_number = last_post.number if last_post else 0
+    batch = SyncBatch(bulk=True)
+
+    db_post = Post.objects.select_related('author').filter(id=post_id).first()
+    if db_post:
+        if text_hash == db_post.text_hash and db_post.start_sum == last_sum_distance \
+                or db_post.last_update is not None:
+            return db_post
+
+        post, event_type = db_post, EventType.UPDATE
+    else:
+        db_profiles = Profile.objects.in_bulk([vk_post['from_id']])
+        _create_profiles([vk_post], db_profiles, batch)
+        post = Post(id=post_id, status=Post.Status.SUCCESS, author=db_profiles[vk_post['from_id']], date=post_date)
+        event_type = EventType.CREATE
+
+    _analyze_post_text(post_text, text_hash, last_sum_distance, last_post_number, post, event_type, batch)
+    batch.flush()
+
+    update_next_posts(post)
+    stat_service.bump_data_version()
+    ws_service.main_group_send(stat_service.get_stat(), ObjectType.STAT)
+    return post
+
+
+@transaction.atomic
+def remove_wall_post(post_id: int) -> bool:
+    """Deleting a single post which is deleted in VK, returns False if it isn't in DB"""
+    post = Post.objects.filter(id=post_id).first()
+    if post is None:
+        return False
+
+    post.delete()
+    runner_totals_service.update_totals([(post.author_id, post.date)])
+    stat_service.update_counters(-1)
+    ws_service.main_group_send(post_id, ObjectType.POST, EventType.REMOVE)
+
+    post.number = None
+    update_next_posts(post)
+    stat_service.bump_data_version()
+    ws_service.main_group_send(stat_service.get_stat(), ObjectType.STAT)
+    return True
+
+
+def _get_post_date(vk_post: dict) -> datetime:
+    return datetime.utcfromtimestamp(vk_post['date']).astimezone(timezone.get_default_timezone())
+
+
 def _get_last_posts(post_count: int) -> List[Post]:
     return list(Post.objects.all().order_by('-date')[:post_count])
 
 
-def _remove_deleted_posts(vk_posts: Iterator[dict], last_db_posts: List[Post]) -> List[Post]:
-    """Deleting from DB deleted posts"""
-    # Searching posts for last {number_of_last_days}
-    number_of_last_days = 5
-    start_date = timezone.now() - timedelta(days=number_of_last_days)
-    recent_posts = [post for post in last_db_posts if post.date >= start_date]
+def _get_deleted_posts_start_date() -> datetime:
+    return timezone.now() - timedelta(days=settings.SYNC_DELETED_POSTS_DAYS)
 
-    def not_find_in_vk(post):
-        return find(vk_posts, lambda it: it['id'] == post.id) is None
 
-    deleted_posts = find_all(recent_posts, not_find_in_vk)
+def _remove_deleted_posts(vk_posts: List[dict], window: SyncWindow, start_date: datetime = None) -> List[int]:
+    """
+    Deleting from DB deleted posts.
+    Posts since {start_date} (by default of last {SYNC_DELETED_POSTS_DAYS} days) which are newer than
+    the oldest downloaded post are checked
+    """
+    if not vk_posts:
+        return []
 
-    if not deleted_posts:
+    start_date = start_date or _get_deleted_posts_start_date()
+
+    # Posts with the date of the oldest downloaded post could be outside of the block
+    oldest_post_date = min(_get_post_date(vk_post) for vk_post in vk_posts)
+    recent_posts = Post.objects.filter(date__gte=start_date, date__gt=oldest_post_date)
+    recent_post_runnings = {post_id: (author_id, post_date)
+                            for post_id, author_id, post_date in recent_posts.values_list('id', 'author_id', 'date')}
+    deleted_post_ids = sorted(recent_post_runnings.keys() - {vk_post['id'] for vk_post in vk_posts})
+
+    if not deleted_post_ids:
         return []
 
-    logger.debug(f'>> Delete vk_posts, number: {len(deleted_posts)}')
-    deleted_post_ids = []
-    for post in deleted_posts:
-        logger.debug(f' -- Delete {post}')
-        deleted_post_ids.append(post.id)
-        post.delete()
-        last_db_posts.remove(post)
+    logger.debug(f'>> Delete posts: {deleted_post_ids}')
+    for post_id in deleted_post_ids:
+        post = window.get(post_id)
+        if post is not None:
+            window.remove(post)
+
+    Post.objects.filter(id__in=deleted_post_ids).delete()
+    runner_totals_service.update_totals(recent_post_runnings[post_id] for post_id in deleted_post_ids)
+    stat_service.update_counters(-len(deleted_post_ids))
 
     return deleted_post_ids
 
 
-def _get_last_post(posts, post_id, post_date):
-    return find(posts, lambda it: it.number is not None and it.id != post_id and it.date <= post_date)
+def _create_profiles(vk_posts: List[dict], db_profiles: Dict[int, Profile], batch: SyncBatch,
+                     vk_profiles: Dict[int, dict] = None, offline: bool = False) -> Dict[int, dict]:
+    """
+    Creating profiles of unknown authors, they are got from VK by one request per chunk
+    if they aren't in {vk_profiles} got in advance. If {offline}, VK isn't requested
+    and the rest of authors stay "Unknown" placeholders. Returns VK profiles of created profiles
+    """
+    new_profiles = {}
+    for vk_post in vk_posts:
+        profile_id = vk_post['from_id']
+        if profile_id in db_profiles or profile_id in new_profiles:
+            continue
+
+        new_profiles[profile_id] = Profile(id=profile_id, join_date=_get_post_date(vk_post), first_name='Unknown',
+                                           sex=Profile.Sex.UNKNOWN)
+
+    if not new_profiles:
+        return {}
 
+    vk_profiles = dict(vk_profiles or {})
+    if not offline:
+        vk_profiles.update(get_vk_profiles([profile_id for profile_id in new_profiles
+                                            if profile_id not in vk_profiles]))
 
-def _find_or_create_profile(vk_post: dict, post_date: datetime, db_profiles: List[Profile]) -> Profile:
-    profile_id = vk_post['from_id']
-    db_profile = find(db_profiles, lambda it: it.id == profile_id)
-    if db_profile:
-        return db_profile
+    for profile_id, db_profile in new_profiles.items():
+        if profile_id in vk_profiles:
+            _fill_profile(db_profile, vk_profiles[profile_id])
 
-    db_profile = Profile(id=profile_id, join_date=post_date, first_name='Unknown', sex=Profile.Sex.UNKNOWN)
-    time.sleep(GETTING_USER_INTERVAL)
+        batch.add_profile(db_profile)
+        db_profiles[profile_id] = db_profile
 
-    if profile_id >= 0:
-        vk_user = vk_api_service.get_user(profile_id)
-        if vk_user:
-            db_profile.first_name = vk_user['first_name']
-            db_profile.last_name = vk_user['last_name']
-            db_profile.sex = vk_user['sex']
-            db_profile.photo_50 = vk_user['photo_50']
-            db_profile.photo_100 = vk_user['photo_100']
+    return {profile_id: vk_profiles[profile_id] for profile_id in new_profiles if profile_id in vk_profiles}
+
+
+def _fill_profile(db_profile: Profile, vk_profile: dict):
+    if db_profile.id >= 0:
+        db_profile.first_name = vk_profile['first_name']
+        db_profile.last_name = vk_profile['last_name']
+        db_profile.sex = vk_profile['sex']
+        db_profile.photo_50 = vk_profile['photo_50']
+        db_profile.photo_100 = vk_profile['photo_100']
     else:
-        vk_group = vk_api_service.get_group(profile_id * -1)
-        if vk_group:
-            db_profile.first_name = vk_group['name']
-            db_profile.photo_50 = vk_group['photo_50']
-            db_profile.photo_100 = vk_group['photo_100']
-            db_profile.photo_200 = vk_group['photo_200']
+        db_profile.first_name = vk_profile['name']
+        db_profile.photo_50 = vk_profile['photo_50']
+        db_profile.photo_100 = vk_profile['photo_100']
+        db_profile.photo_200 = vk_profile['photo_200']
+
 
-    db_profile.save()
-    db_profiles.append(db_profile)
+def get_vk_profiles(profile_ids: List[int]) -> Dict[int, dict]:
+    """Getting VK users and groups by profile ids, groups have negative profile ids"""
+    user_ids = [profile_id for profile_id in profile_ids if profile_id >= 0]
+    group_ids = [profile_id * -1 for profile_id in profile_ids if profile_id < 0]
+    return index_vk_profiles(vk_api_service.get_users(user_ids) if user_ids else [],
+                             vk_api_service.get_groups(group_ids) if group_ids else [])
 
-    return db_profile
+
+def index_vk_profiles(vk_users: List[dict], vk_groups: List[dict]) -> Dict[int, dict]:
+    vk_profiles = {vk_user['id']: vk_user for vk_user in vk_users}
+    vk_profiles.update({vk_group['id'] * -1: vk_group for vk_group in vk_groups})
+    return vk_profiles
 
 
 def _analyze_post_text(text: str, text_hash: str, last_sum_distance: int, last_post_number: int, post: Post,
-                       event_type: EventType) -> bool:
-    parser_out = message_parser.parse(text)
+                       event_type: EventType, batch: SyncBatch) -> bool:
+    parser_out = parse_cache.parse(text, text_hash)
 
     post.text = text
     post.text_hash = text_hash
@@ -222,14 +614,11 @@ def _analyze_post_text(text: str, text_hash: str, last_sum_distance: int, last_p
         post.sum_distance = new_sum_distance
         post.status = status
 
-        post.save()
         logger.debug(f' -- {event_type.name} post after analyze: {post}')
 
-        # Adding status comment for post
+        # Adding status comment for post, it will be added into outbox after writing the post
         comment_text = _create_comment_text(post, last_sum_distance, new_sum_distance)
-        _add_status_comment(post.id, comment_text)
-
-        ws_service.main_group_send(PostSerializer(post).data, ObjectType.POST, event_type)
+        batch.add_post(post, event_type, comment_text)
 
     return parser_out is not None
 
@@ -258,16 +647,9 @@ def _create_comment_text(post: Post, start_sum_distance: int, end_sum_distance:
     return comment_text
 
 
-def _add_status_comment(post_id: int, comment_text: str):
-    if not Config.objects.get().commenting:
-        return
-
-    time.sleep(PUBLISHING_COMMENT_INTERVAL)
-    vk_api_service.add_comment_to_post(post_id, comment_text)
-
-
 @transaction.atomic
 def update_next_posts(updated_post: Post):
+    """Recomputing runnings after {updated_post} with prefix sums, changed posts are written with one statement"""
     if updated_post.number is not None:
         start_post = updated_post
     else:
@@ -282,8 +664,62 @@ def update_next_posts(updated_post: Post):
     if start_post is not None:
         next_posts = next_posts.filter(~Q(id=start_post.id) & Q(date__gte=start_post.date))
 
-    for post in next_posts:
-        _analyze_post_text(post.text, post.text_hash, current_sum_distance, current_post_number, post,
-                           EventType.UPDATE)
-        current_sum_distance = post.sum_distance
-        current_post_number = post.number
+    columns = RunningColumns.load(next_posts)
+    recomputed = columns.recompute(current_post_number, current_sum_distance)
+    changed_indexes = columns.get_changed_indexes(recomputed)
+    if not changed_indexes:
+        return
+
+    changed_posts = Post.objects.select_related('author').in_bulk([columns.ids[i] for i in changed_indexes])
+    posts = []
+    comments = []
+    for i in changed_indexes:
+        post = changed_posts[columns.ids[i]]
+        post.number = recomputed.numbers[i]
+        post.distance = columns.distances[i]
+        post.sum_distance = recomputed.sum_distances[i]
+        post.status = recomputed.statuses[i]
+        logger.debug(f' -- UPDATE post after recompute: {post}')
+
+        posts.append(post)
+        comments.append((post.id, _create_comment_text(post, recomputed.last_sum_distances[i], post.sum_distance)))
+
+    Post.objects.bulk_update(posts, ['number', 'distance', 'sum_distance', 'status'])
+    runner_totals_service.update_totals((post.author_id, post.date) for post in posts)
+    stat_service.update_counters()
+    comment_service.add_comments(comments)
+    ws_service.main_group_send(PostSerializer(posts, many=True).data, ObjectType.POST, EventType.UPDATE_LIST)
+
+
+@transaction.atomic
+def revalidate_runnings(dry_run: bool = False) -> int:
+    """
+    Recomputing runnings of the whole history with prefix sums, returns number of changed posts.
+    Posts edited in admin aren't changed, the next runnings are recomputed from them (see `RunningColumns`).
+    Changed posts are written by one prepared statement without status comments and WS events of posts
+    (`bulk_update` builds CASE expressions which are too slow for tens of thousands of posts)
+    """
+    logger.debug('-------- Start revalidation of runnings --------')
+
+    columns = RunningColumns.load(Post.objects.order_by('date', 'id'))
+    recomputed = columns.recompute(0, 0)
+    changed_indexes = columns.get_changed_indexes(recomputed)
+    logger.debug(f'>> Changed posts: {len(changed_indexes)}/{len(columns)}')
+
+    if dry_run or not changed_indexes:
+        return len(changed_indexes)
+
+    quote_name = connection.ops.quote_name
+    fields = ', '.join(f'{quote_name(field)} = %s' for field in ['number', 'distance', 'sum_distance', 'status'])
+    with connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {quote_name(Post._meta.db_table)} SET {fields} WHERE {quote_name("id")} = %s', [
+            (recomputed.numbers[i], columns.distances[i], recomputed.sum_distances[i], int(recomputed.statuses[i]),
+             columns.ids[i]) for i in changed_indexes
+        ])
+
+    runner_totals_service.rebuild_totals()
+    stat_service.update_counters()
+    stat_service.update_stat()
+
+    logger.debug('-------- End revalidation of runnings --------')
+    return len(changed_indexes)
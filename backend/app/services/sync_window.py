@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.models import Post
+
+
+class SyncWindow:
+    """
+    Last posts from DB which are reconciled with VK posts while syncing.
+    Posts are indexed by id, runnings are kept sorted by date
+    for searching of the previous running with bisect
+    """
+
+    def __init__(self, posts: Iterable[Post] = ()):
+        self._posts: Dict[int, Post] = {}
+
+        self._running_dates: List[datetime] = []
+        """Dates of runnings sorted by ascending, parallel to `_runnings`"""
+
+        self._runnings: List[Post] = []
+        """Runnings sorted by date"""
+
+        self._indexed_dates: Dict[int, datetime] = {}
+        """Dates with which runnings were put into `_runnings` (by post id)"""
+
+        # Posts usually come from DB ordered by '-date', so the list is reversed before stable sorting
+        # that posts with equal dates would be found in the same order as in the source
+        posts = list(posts)
+        for post in posts:
+            self._posts[post.id] = post
+
+        runnings = sorted((p for p in reversed(posts) if p.number is not None), key=lambda p: p.date)
+        for running in runnings:
+            self._runnings.append(running)
+            self._running_dates.append(running.date)
+            self._indexed_dates[running.id] = running.date
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def __contains__(self, post_id: int) -> bool:
+        return post_id in self._posts
+
+    def __iter__(self) -> Iterator[Post]:
+        return iter(list(self._posts.values()))
+
+    def get(self, post_id: int) -> Optional[Post]:
+        return self._posts.get(post_id)
+
+    def put(self, post: Post):
+        """Adding a new post or reindexing an existing one after changing its number"""
+        self._unindex_running(post.id)
+        self._posts[post.id] = post
+
+        if post.number is not None:
+            index = bisect_left(self._running_dates, post.date)
+            self._runnings.insert(index, post)
+            self._running_dates.insert(index, post.date)
+            self._indexed_dates[post.id] = post.date
+
+    def remove(self, post: Post):
+        self._unindex_running(post.id)
+        self._posts.pop(post.id, None)
+
+    def get_last_running(self, post_id: int, post_date: datetime) -> Optional[Post]:
+        """Searching the last running before {post_date} (inclusive) except the post with {post_id}"""
+        index = bisect_right(self._running_dates, post_date)
+        while index > 0:
+            index -= 1
+            running = self._runnings[index]
+            if running.id != post_id:
+                return running
+
+    def _unindex_running(self, post_id: int):
+        date = self._indexed_dates.pop(post_id, None)
+        if date is None:
+            return
+
+        index = bisect_left(self._running_dates, date)
+        while self._runnings[index].id != post_id:
+            index += 1
+
+        del self._runnings[index]
+        del self._running_dates[index]
@@ -0,0 +1,87 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from vk_api.exceptions import ApiError
+
+from app.services import singleton_cache, vk_api_service
+
+POOL_SIZE = 4
+"""Max number of simultaneous requests (and kept alive connections) of one client"""
+
+
+class AsyncVkApi:
+    """
+    Asyncio client of VK API for the group from Config.
+    Requests are sent by the pooled HTTP session in threads of the client,
+    every request waits for the shared rate limiter without blocking the event loop
+    """
+
+    def __init__(self, token: str, group_id: int, api_url: str = None, pool_size: int = POOL_SIZE):
+        self.token = token
+        self.owner_id = group_id * -1
+        self.api_url = api_url or settings.VK_API_URL
+        self.api_version = vk_api_service.VK_API_VERSION
+
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix='vk_api_async')
+
+    @classmethod
+    def from_config(cls, api_url: str = None) -> 'AsyncVkApi':
+        config = singleton_cache.get_config()
+        return cls(config.comment_access_token, config.group_id, api_url)
+
+    async def method(self, method: str, values: dict = None):
+        loop = asyncio.get_event_loop()
+        await asyncio.sleep(await loop.run_in_executor(self._executor, vk_api_service.rate_limiter.reserve))
+
+        with vk_api_service.latency_metrics.measure(method):
+            response = await loop.run_in_executor(self._executor, self._post, method, values or {})
+
+        if 'error' in response:
+            raise ApiError(self, method, values, False, response['error'])
+
+        return response['response']
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.http.close()
+
+    async def get_wall_posts(self, offset: int, count: int) -> dict:
+        return await self.method('wall.get', {'owner_id': self.owner_id, 'offset': offset, 'count': count})
+
+    async def get_wall_posts_by_execute(self, offset: int, count: int) -> dict:
+        max_count = vk_api_service.EXECUTE_MAX_REQUEST_COUNT * vk_api_service.WALL_GET_MAX_COUNT
+        if count > max_count:
+            raise ValueError(f'Number of posts ({count}) > max number of posts for execute ({max_count})')
+
+        return await self.method('execute', {'code': vk_api_service.WALL_GET_EXECUTE_CODE, 'owner_id': self.owner_id,
+                                             'offset': offset, 'count': count})
+
+    async def get_users(self, user_ids: Iterable[int]) -> List[dict]:
+        """Getting users by simultaneous requests per {USERS_GET_MAX_COUNT} ids"""
+        return await self._get_by_chunks(user_ids, vk_api_service.USERS_GET_MAX_COUNT, lambda ids: self.method(
+            'users.get', {'user_ids': ids, 'fields': 'sex,photo_50,photo_100'}))
+
+    async def get_groups(self, group_ids: Iterable[int]) -> List[dict]:
+        """Getting groups by simultaneous requests per {GROUPS_GET_MAX_COUNT} ids"""
+        return await self._get_by_chunks(group_ids, vk_api_service.GROUPS_GET_MAX_COUNT, lambda ids: self.method(
+            'groups.getById', {'group_ids': ids}))
+
+    @staticmethod
+    async def _get_by_chunks(ids: Iterable[int], chunk_size: int, request) -> List[dict]:
+        ids = list(ids)
+        chunks = await asyncio.gather(*[request(','.join(map(str, ids[start:start + chunk_size])))
+                                        for start in range(0, len(ids), chunk_size)])
+        return [item for chunk in chunks for item in chunk]
+
+    def _post(self, method: str, values: dict) -> dict:
+        values = {**values, 'v': self.api_version, 'access_token': self.token}
+        response = self.http.post(self.api_url + method, values)
+        response.raise_for_status()
+        return response.json()
@@ -1,7 +1,70 @@
-from app.models import Config
+import threading
+from typing import List, Iterable, Optional
+
+from app.services import singleton_cache
+from app.services.metrics import LatencyMetrics
+from app.services.rate_limiter import RedisTokenBucket
 from django.conf import settings
 from vk_api.vk_api import VkApiMethod, VkApi
 
+VK_API_VERSION = '5.92'
+"""Version of VK API (the default version of vk_api library)"""
+
+USERS_GET_MAX_COUNT = 1000
+"""Max number of user ids for one users.get request"""
+
+GROUPS_GET_MAX_COUNT = 500
+"""Max number of group ids for one groups.getById request"""
+
+WALL_GET_MAX_COUNT = 100
+"""Max number of posts for one wall.get request"""
+
+EXECUTE_MAX_REQUEST_COUNT = 25
+"""Max number of API requests inside one execute request"""
+
+WALL_GET_EXECUTE_CODE = """
+var offset = parseInt(Args.offset);
+var count = parseInt(Args.count);
+var response = API.wall.get({"owner_id": Args.owner_id, "offset": offset, "count": 100});
+var items = response.items;
+var i = 100;
+while (i < count) {
+    var chunk_count = count - i;
+    if (chunk_count > 100) {
+        chunk_count = 100;
+    }
+    items = items + API.wall.get({"owner_id": Args.owner_id, "offset": offset + i, "count": chunk_count}).items;
+    i = i + 100;
+}
+return {"count": response.count, "items": items};
+"""
+"""VKScript code which gets posts by some wall.get requests"""
+
+
+rate_limiter = RedisTokenBucket('vk_api_rate_limiter', settings.VK_API_REQUESTS_PER_SECOND,
+                                settings.VK_API_REQUESTS_PER_SECOND, settings.REDIS_URL)
+"""Rate limiter of VK API requests which is shared between web and worker processes"""
+
+latency_metrics = LatencyMetrics()
+"""Durations of VK API requests by method (without waiting for the rate limiter)"""
+
+
+class RateLimitedVkApi(VkApi):
+    """VkApi which waits for the shared rate limiter before every request instead of its own delay"""
+
+    RPS_DELAY = 0
+
+    def method(self, method, values=None, raw=False):
+        rate_limiter.acquire()
+        with latency_metrics.measure(method):
+            return super().method(method, values, raw)
+
+
+_vk_session: Optional[RateLimitedVkApi] = None
+"""VK session of the process, it keeps connections to VK API alive between requests"""
+
+_vk_session_lock = threading.Lock()
+
 
 def get_authorize_url() -> str:
     oauth_url = 'https://oauth.vk.com'
@@ -11,43 +74,85 @@ def get_authorize_url() -> str:
         'redirect_uri': f'{oauth_url}/blank.html',
         'scope': 'wall,offline',
         'response_type': 'token',
-        'v': VkApi().api_version
+        'v': VK_API_VERSION
     }
     params_str = '&'.join([f'{key}={value}' for key, value in params.items()])
     return f'{oauth_url}/authorize?{params_str}'
 
 
 def _get_api() -> VkApiMethod:
-    config = Config.objects.get()
-    vk_session = VkApi(token=config.comment_access_token)
-    return vk_session.get_api()
+    return _get_vk_session().get_api()
+
+
+def _get_vk_session() -> RateLimitedVkApi:
+    """Getting the shared VK session, it is rebuilt only if the access token is changed"""
+    global _vk_session
+    token = singleton_cache.get_config().comment_access_token
+    with _vk_session_lock:
+        if _vk_session is None or _vk_session.token['access_token'] != token:
+            _vk_session = RateLimitedVkApi(token=token, api_version=VK_API_VERSION)
+
+        return _vk_session
 
 
 def get_group_url() -> str:
-    config = Config.objects.get()
+    config = singleton_cache.get_config()
     return f'{settings.VK_LINK}/club{config.group_id}'
 
 
 def get_post_url(post_id) -> str:
-    config = Config.objects.get()
+    config = singleton_cache.get_config()
     return f'{get_group_url()}?w=wall{config.negative_group_id}_{post_id}'
 
 
 def get_wall_posts(offset: int, count: int) -> dict:
-    config = Config.objects.get()
+    config = singleton_cache.get_config()
     return _get_api().wall.get(owner_id=config.negative_group_id, offset=offset, count=count)
 
 
+def get_wall_posts_by_execute(offset: int, count: int) -> dict:
+    """Getting up to {EXECUTE_MAX_REQUEST_COUNT} * {WALL_GET_MAX_COUNT} posts by one execute request"""
+    max_count = EXECUTE_MAX_REQUEST_COUNT * WALL_GET_MAX_COUNT
+    if count > max_count:
+        raise ValueError(f'Number of posts ({count}) > max number of posts for execute ({max_count})')
+
+    config = singleton_cache.get_config()
+    return _get_api().execute(code=WALL_GET_EXECUTE_CODE, owner_id=config.negative_group_id, offset=offset,
+                              count=count)
+
+
 def get_user(user_id: int) -> dict:
     return _get_api().users.get(user_ids=user_id, fields=['sex', 'photo_50', 'photo_100'])[0]
 
 
+def get_users(user_ids: Iterable[int]) -> List[dict]:
+    """Getting users by one request per {USERS_GET_MAX_COUNT} ids"""
+    api = _get_api()
+    return _get_by_chunks(user_ids, USERS_GET_MAX_COUNT,
+                          lambda ids: api.users.get(user_ids=ids, fields=['sex', 'photo_50', 'photo_100']))
+
+
 def get_group(group_id: int) -> dict:
     return _get_api().groups.getById(group_id=group_id)[0]
 
 
+def get_groups(group_ids: Iterable[int]) -> List[dict]:
+    """Getting groups by one request per {GROUPS_GET_MAX_COUNT} ids"""
+    api = _get_api()
+    return _get_by_chunks(group_ids, GROUPS_GET_MAX_COUNT, lambda ids: api.groups.getById(group_ids=ids))
+
+
+def _get_by_chunks(ids: Iterable[int], chunk_size: int, request) -> List[dict]:
+    ids = list(ids)
+    result = []
+    for start in range(0, len(ids), chunk_size):
+        result.extend(request(ids[start:start + chunk_size]))
+
+    return result
+
+
 def create_post(message: str) -> dict:
-    config = Config.objects.get()
+    config = singleton_cache.get_config()
     return _get_api().wall.post(
         owner_id=config.negative_group_id,
         message=message,
@@ -57,7 +162,7 @@ def create_post(message: str) -> dict:
 
 
 def add_comment_to_post(post_id: int, message: str) -> dict:
-    config = Config.objects.get()
+    config = singleton_cache.get_config()
     return _get_api().wall.create_comment(
         post_id=post_id,
         owner_id=config.negative_group_id,
@@ -0,0 +1,72 @@
+import hmac
+import logging
+
+from django.conf import settings
+
+from app.services import singleton_cache, sync_scheduler, sync_service
+
+CALLBACK_OK = 'ok'
+"""Response which confirms receiving of an event, otherwise VK sends it again"""
+
+POST_EVENT_TYPES = ('wall_post_new', 'wall_post_edit')
+
+DELETE_EVENT_TYPES = ('wall_post_delete',)
+
+POST_FIELDS = ('id', 'from_id', 'date', 'text')
+"""Fields of the post object which are required for writing of the post"""
+
+logger = logging.getLogger(__name__)
+
+
+def is_valid_event(event) -> bool:
+    """Checking that the event is sent by VK for the group from Config"""
+    if not settings.VK_CALLBACK_SECRET or not isinstance(event, dict):
+        return False
+
+    secret = str(event.get('secret', ''))
+    return hmac.compare_digest(secret, settings.VK_CALLBACK_SECRET) \
+        and event.get('group_id') == singleton_cache.get_config().group_id
+
+
+def handle_event(event: dict) -> str:
+    """
+    Applying a wall event of VK Callback API, returns the response text for VK.
+    If sync is running or DB is behind VK the event isn't applied, the next sync is requested instead.
+    Malformed events are confirmed and skipped, otherwise VK sends them again
+    """
+    event_type = event.get('type')
+    if event_type == 'confirmation':
+        return settings.VK_CALLBACK_CONFIRMATION_CODE
+
+    if event_type not in POST_EVENT_TYPES + DELETE_EVENT_TYPES:
+        return CALLBACK_OK
+
+    vk_post = event.get('object')
+    required_fields = ('id',) if event_type in DELETE_EVENT_TYPES else POST_FIELDS
+    if not isinstance(vk_post, dict) or any(field not in vk_post for field in required_fields):
+        logger.warning(f'>> Callback event "{event_type}" is skipped, post is malformed: {vk_post}')
+        return CALLBACK_OK
+
+    if vk_post.get('post_type', 'post') != 'post':
+        return CALLBACK_OK
+
+    if not singleton_cache.get_config().sync_posts:
+        logger.info(f'>> Callback event "{event_type}" is skipped, sync is disabled')
+        return CALLBACK_OK
+
+    with sync_service.sync_lock.hold() as acquired:
+        if not acquired:
+            logger.info(f'>> Callback event "{event_type}" is postponed, sync is running')
+            sync_scheduler.request_sync()
+            return CALLBACK_OK
+
+        logger.debug(f'>> Callback event "{event_type}": post {vk_post["id"]}')
+        if event_type in DELETE_EVENT_TYPES:
+            sync_service.remove_wall_post(vk_post['id'])
+        elif sync_service.can_apply_wall_post(vk_post):
+            sync_service.apply_wall_post(vk_post)
+        else:
+            logger.info(f'>> Callback event "{event_type}" is postponed, posts in DB are behind VK')
+            sync_scheduler.request_sync()
+
+    return CALLBACK_OK
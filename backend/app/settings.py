@@ -239,6 +239,25 @@ VK_LINK = 'https://vk.com'
 
 VK_APP_ID = 5344865
 
+VK_API_URL = 'https://api.vk.com/method/'
+
+# Max number of VK API requests per second for all processes
+VK_API_REQUESTS_PER_SECOND = 3
+
+# Sync checks that posts of last {value} days are not deleted in VK
+SYNC_DELETED_POSTS_DAYS = int(os.getenv('SYNC_DELETED_POSTS_DAYS', '5'))
+
+# Bounds of the interval between syncs in seconds, it is adapted to the rate of new posts
+SYNC_MIN_INTERVAL = int(os.getenv('SYNC_MIN_INTERVAL', '60'))
+SYNC_MAX_INTERVAL = int(os.getenv('SYNC_MAX_INTERVAL', '1800'))
+
+# VK Callback API: new posts come by events, if it is enabled the wall is synced every {SYNC_MAX_INTERVAL} seconds
+VK_CALLBACK_SECRET = os.getenv('VK_CALLBACK_SECRET')
+VK_CALLBACK_CONFIRMATION_CODE = os.getenv('VK_CALLBACK_CONFIRMATION_CODE', '')
+
+# Path of the gzip journal of synced blocks of wall posts, the journal is off if it isn't set
+SYNC_JOURNAL_PATH = os.getenv('SYNC_JOURNAL_PATH')
+
 JS_DATE_FORMAT = '%Y-%m-%d'
 
 POST_DATE_FORMAT = '%d.%m.%y'
@@ -6,7 +6,7 @@ from django.utils import timezone
 
 from app import models
 from app.models import Profile, Post
-from app.services import sync_service, message_parser
+from app.services import sync_service, message_parser, runner_totals_service, stat_service
 
 
 def create_admin():
@@ -143,7 +143,10 @@ def create_runnings():
             profile = create_or_get_profile(profile_id, first_name, last_name, date)
             running = create_running(number, profile, distance, sum_distance, date)
             runnings.append(running)
-        return runnings
+
+    runner_totals_service.rebuild_totals()
+    stat_service.reconcile_counters()
+    return runnings
 
 
 def create_date(year, month, day, hour=0, minute=0, second=0):
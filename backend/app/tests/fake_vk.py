@@ -0,0 +1,157 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List
+from urllib.parse import parse_qsl
+
+from app.services import vk_api_service
+
+
+def create_vk_posts(count: int, profile_count: int = 10, start_date: datetime = datetime(2020, 1, 1)) -> List[dict]:
+    """Creating VK posts with correct running sums ordered like in VK response (newest first)"""
+    sum_distance = 0
+    posts = []
+    for i in range(1, count + 1):
+        distance = i % 10 + 1
+        posts.append({
+            'id': i,
+            'from_id': i % profile_count + 1,
+            'text': f'{sum_distance} + {distance} = {sum_distance + distance}',
+            'date': round((start_date + timedelta(minutes=i)).timestamp())
+        })
+        sum_distance += distance
+
+    posts.reverse()
+    return posts
+
+
+class FakeVk:
+    """
+    Offline stand-in of VK API for tests.
+    It replaces VkApi.method: patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method)
+    """
+
+    def __init__(self, posts: Iterable[dict] = (), users: Iterable[dict] = (), groups: Iterable[dict] = ()):
+        self.posts: List[dict] = list(posts)
+        """Wall posts, newest first"""
+
+        self.users: Dict[int, dict] = {user['id']: user for user in users}
+        self.groups: Dict[int, dict] = {group['id']: group for group in groups}
+        self.comments: List[dict] = []
+
+        self.requests: List[str] = []
+        """Names of requested methods"""
+
+        self.callback_events: List[dict] = []
+        """Events of VK Callback API about changes of the wall, without group_id and secret"""
+
+    def method(self, method: str, values: dict = None, raw: bool = False):
+        self.requests.append(method)
+        handler = getattr(self, '_' + method.replace('.', '_'), None)
+        if handler is None:
+            raise NotImplementedError(f'Method "{method}" is not supported by FakeVk')
+
+        return handler(values or {})
+
+    def publish_post(self, post: dict):
+        self.posts.insert(0, post)
+        self.callback_events.append({'type': 'wall_post_new', 'object': {**post, 'post_type': 'post'}})
+
+    def edit_post(self, post_id: int, text: str):
+        post = next(post for post in self.posts if post['id'] == post_id)
+        post['text'] = text
+        self.callback_events.append({'type': 'wall_post_edit', 'object': {**post, 'post_type': 'post'}})
+
+    def delete_post(self, post_id: int):
+        self.posts = [post for post in self.posts if post['id'] != post_id]
+        self.callback_events.append({'type': 'wall_post_delete', 'object': {'id': post_id}})
+
+    def _wall_get(self, values: dict) -> dict:
+        offset = int(values.get('offset', 0))
+        count = int(values.get('count', 20))
+        return {'count': len(self.posts), 'items': self.posts[offset:offset + count]}
+
+    def _users_get(self, values: dict) -> List[dict]:
+        return [self.users.get(user_id, self._create_user(user_id)) for user_id in self._get_ids(values['user_ids'])]
+
+    def _groups_getById(self, values: dict) -> List[dict]:
+        group_ids = values.get('group_ids', values.get('group_id'))
+        return [self.groups.get(group_id, self._create_group(group_id)) for group_id in self._get_ids(group_ids)]
+
+    def _wall_createComment(self, values: dict) -> dict:
+        self.comments.append(values)
+        return {'comment_id': len(self.comments)}
+
+    def _wall_post(self, values: dict) -> dict:
+        return {'post_id': len(self.posts) + 1}
+
+    def _execute(self, values: dict) -> dict:
+        if values['code'] != vk_api_service.WALL_GET_EXECUTE_CODE:
+            raise NotImplementedError('Only wall.get code is supported by FakeVk.execute')
+
+        offset = int(values['offset'])
+        count = int(values['count'])
+        response = self._wall_get({'offset': offset, 'count': min(count, 100)})
+        for i in range(100, count, 100):
+            response['items'] += self._wall_get({'offset': offset + i, 'count': min(count - i, 100)})['items']
+
+        return response
+
+    @staticmethod
+    def _get_ids(ids) -> List[int]:
+        return [int(it) for it in str(ids).split(',')]
+
+    @staticmethod
+    def _create_user(user_id: int) -> dict:
+        return {'id': user_id, 'first_name': f'User {user_id}', 'last_name': '', 'sex': 0, 'photo_50': '',
+                'photo_100': ''}
+
+    @staticmethod
+    def _create_group(group_id: int) -> dict:
+        return {'id': group_id, 'name': f'Group {group_id}', 'photo_50': '', 'photo_100': '', 'photo_200': ''}
+
+
+class FakeVkServer:
+    """
+    Local HTTP server which serves {fake_vk} like VK API:
+    with FakeVkServer(fake_vk) as server: AsyncVkApi(token, group_id, server.api_url)
+    """
+
+    def __init__(self, fake_vk: FakeVk):
+        self.fake_vk = fake_vk
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._create_handler())
+        self.api_url = f'http://127.0.0.1:{self._server.server_port}/method/'
+
+    def __enter__(self) -> 'FakeVkServer':
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _create_handler(self):
+        fake_vk = self.fake_vk
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+                values = {key: value for key, value in parse_qsl(body) if key not in ('v', 'access_token')}
+                try:
+                    data = {'response': fake_vk.method(method, values)}
+                except NotImplementedError as e:
+                    data = {'error': {'error_code': 3, 'error_msg': str(e), 'request_params': []}}
+
+                content = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -2,7 +2,8 @@ from django.test import TestCase, Client
 from django.urls import reverse
 from rest_framework import status
 
-from app.models import Post
+from app.models import Post, RunnerTotals
+from app.services import runner_totals_service
 from app.tests import create_config, create_profile, create_stat_log, create_temp_data, create_post, create_admin
 
 
@@ -62,3 +63,13 @@ class AdminSiteTests(TestCase):
 
         self.assertEquals(res.status_code, status.HTTP_200_OK)
         self.assertContains(res, str(temp_data))
+
+    def test_post_delete_updates_totals(self):
+        """Test that totals of the runner are recomputed after deleting of post"""
+        profile = create_profile()
+        post = create_post(Post.Status.SUCCESS, profile, '0 + 5 = 5', number=1)
+        runner_totals_service.update_totals([(profile.id, post.date)])
+
+        res = self.client.post(reverse('admin:app_post_delete', args=[post.id]), {'post': 'yes'})
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertFalse(RunnerTotals.objects.filter(profile=profile).exists())
@@ -8,7 +8,7 @@ from rest_framework.test import APIClient
 
 from app.models import StatLog, Post
 from app.serializers import ConfigSerializer, StatSerializer, PostSerializer
-from app.services import vk_api_service, stat_service
+from app.services import vk_api_service, stat_service, stat_cache
 from app.tests import create_config, create_runnings, create_temp_data, create_admin
 
 POSTS_URL = reverse('post-list')
@@ -25,6 +25,7 @@ def post_detail_url(post_id):
 class PublicApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        stat_cache.stat_cache.clear()
 
     def test_post_list(self):
         """Test retrieving a list of posts"""
@@ -121,6 +122,17 @@ class PrivateApiTests(TestCase):
         post.refresh_from_db()
         self.assertEqual(post.distance, 777)
 
+    def test_post_sync_is_running(self):
+        """Test that sync returns 202 if sync is already running"""
+        with patch('app.services.sync_service.sync_posts_exclusively') as sync_posts_exclusively:
+            sync_posts_exclusively.return_value = True
+            res = self.client.put(POST_SYNC_URL)
+            self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+            sync_posts_exclusively.return_value = False
+            res = self.client.put(POST_SYNC_URL)
+            self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
     def test_post_delete(self):
         """Test that post will be deleted"""
         create_runnings()
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from vk_api.exceptions import ApiError
+
+from app.models import Post, Profile
+from app.services import async_sync_service
+from app.services.rate_limiter import TokenBucket
+from app.services.vk_api_async import AsyncVkApi
+from app.tests import create_config
+from app.tests.fake_vk import FakeVk, FakeVkServer, create_vk_posts
+
+
+@patch('app.services.vk_api_service.rate_limiter', TokenBucket(rate=1000, capacity=1000))
+class AsyncSyncServiceTests(TestCase):
+
+    def setUp(self):
+        create_config()
+
+    def test_vk_api(self):
+        """Test that async client requests VK API by HTTP"""
+        fake_vk = FakeVk(create_vk_posts(450))
+        with FakeVkServer(fake_vk) as server:
+            api = AsyncVkApi('token', 1, server.api_url)
+            posts = async_to_sync(api.get_wall_posts_by_execute)(100, 300)
+            users = async_to_sync(api.get_users)(range(1, 1502))
+            with self.assertRaises(ApiError):
+                async_to_sync(api.method)('wall.unknown')
+            api.close()
+
+        self.assertEqual(posts['count'], 450)
+        self.assertEqual(posts['items'], fake_vk.posts[100:400])
+        self.assertEqual([user['id'] for user in users], list(range(1, 1502)))
+        self.assertEqual(fake_vk.requests, ['execute', 'users.get', 'users.get', 'wall.unknown'])
+
+    @patch('app.services.sync_service.BACKFILL_POST_COUNT', 200)
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_posts_async(self, mgs):
+        """Test that posts are synced with prefetching of next blocks against local VK server"""
+        fake_vk = FakeVk(create_vk_posts(450, profile_count=5))
+        with FakeVkServer(fake_vk) as server:
+            async_to_sync(async_sync_service.sync_posts_async)(server.api_url)
+
+        self.assertEqual(Post.objects.count(), 450)
+        self.assertEqual(Post.objects.filter(status=Post.Status.SUCCESS).count(), 450)
+        self.assertEqual(Post.objects.get(id=450).number, 450)
+        self.assertEqual(Profile.objects.filter(first_name__startswith='User').count(), 5)
+        # Probe, 2 backfill blocks, the last block and authors of the first block
+        self.assertEqual(sorted(fake_vk.requests), ['execute', 'execute', 'users.get', 'wall.get', 'wall.get'])
+
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_posts_async_without_changes(self, mgs):
+        fake_vk = FakeVk(create_vk_posts(10))
+        with FakeVkServer(fake_vk) as server:
+            async_to_sync(async_sync_service.sync_posts_async)(server.api_url)
+            async_to_sync(async_sync_service.sync_posts_async)(server.api_url)
+
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(fake_vk.requests.count('users.get'), 1)
@@ -2,7 +2,7 @@ import os
 import sys
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import call_command, CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -25,3 +25,36 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_replay_sync_journal(self):
+        with patch('app.services.sync_service.replay_journal') as rj:
+            rj.return_value = 2
+            call_command('replay_sync_journal', 'journal.jsonl.gz')
+            rj.assert_called_once_with('journal.jsonl.gz')
+
+    def test_replay_sync_journal_while_sync(self):
+        """Test that the journal isn't replayed while sync is running"""
+        with patch('app.services.sync_service.replay_journal') as rj, \
+                patch('app.services.sync_service.sync_lock.acquire', return_value=False):
+            with self.assertRaises(CommandError):
+                call_command('replay_sync_journal', 'journal.jsonl.gz')
+            self.assertEqual(rj.call_count, 0)
+
+    def test_revalidate_runnings(self):
+        with patch('app.services.sync_service.revalidate_runnings') as rr:
+            rr.return_value = 2
+            call_command('revalidate_runnings', '--dry-run')
+            rr.assert_called_once_with(True)
+
+    def test_reconcile_stat_counters(self):
+        with patch('app.services.stat_service.reconcile_counters') as rc:
+            rc.return_value = {'post_count': (5, 21)}
+            call_command('reconcile_stat_counters', '--dry-run')
+            rc.assert_called_once_with(True)
+
+    def test_reconcile_stat_counters_while_sync(self):
+        with patch('app.services.stat_service.reconcile_counters') as rc, \
+                patch('app.services.sync_service.sync_lock.acquire', return_value=False):
+            with self.assertRaises(CommandError):
+                call_command('reconcile_stat_counters')
+            self.assertEqual(rc.call_count, 0)
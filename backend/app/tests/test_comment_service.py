@@ -0,0 +1,118 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import Config, Post, Profile, StatusComment
+from app.services import comment_service
+from app.tests import create_config, create_post
+
+
+class CommentServiceTests(TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+        profile = Profile.objects.create(join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+        self.post1 = create_post(Post.Status.SUCCESS, profile, '0+5=5', 1)
+        self.post2 = create_post(Post.Status.SUCCESS, profile, '5+5=10', 2)
+
+    def enable_commenting(self):
+        config = Config.objects.get()
+        config.commenting = True
+        config.save()
+
+    def test_not_add_comments(self):
+        """Test that status comments are not added if commenting is disabled"""
+        comment_service.add_comments([(self.post1.id, 'Status comment')])
+        self.assertEqual(StatusComment.objects.count(), 0)
+
+    def test_add_comments(self):
+        """Test that status comments are added into outbox and are not published at once"""
+        self.enable_commenting()
+        with patch('app.services.vk_api_service.add_comment_to_post') as acp:
+            comment_service.add_comments([(self.post1.id, 'Comment 1'), (self.post2.id, 'Comment 2')])
+            self.assertEqual(acp.call_count, 0)
+
+        self.assertEqual(list(StatusComment.objects.order_by('id').values_list('post_id', 'text')),
+                         [(self.post1.id, 'Comment 1'), (self.post2.id, 'Comment 2')])
+
+    def test_deliver_comments(self):
+        """Test that only the last comment for post is published"""
+        self.enable_commenting()
+        comment_service.add_comments([
+            (self.post1.id, 'Comment 1'),
+            (self.post2.id, 'Comment 2'),
+            (self.post1.id, 'Comment 3')
+        ])
+
+        with patch('app.services.vk_api_service.add_comment_to_post') as acp:
+            result = comment_service.deliver_comments()
+            self.assertEqual(result, 2)
+            self.assertEqual([c.args for c in acp.call_args_list],
+                             [(self.post1.id, 'Comment 3'), (self.post2.id, 'Comment 2')])
+
+        self.assertEqual(StatusComment.objects.count(), 0)
+
+    def test_deliver_comments_error(self):
+        """Test that comment stays in outbox if publishing fails"""
+        self.enable_commenting()
+        comment_service.add_comments([(self.post1.id, 'Comment 1')])
+
+        with patch('app.services.vk_api_service.add_comment_to_post') as acp:
+            acp.side_effect = RuntimeError('Ooops!')
+            with self.assertRaises(RuntimeError):
+                comment_service.deliver_comments()
+
+        self.assertEqual(StatusComment.objects.count(), 1)
+        self.assertIsNone(StatusComment.objects.get().lease_date)
+
+    def test_deliver_comments_without_transaction(self):
+        """Test that comments are published in VK when no transaction is opened by delivery"""
+        self.enable_commenting()
+        comment_service.add_comments([(self.post1.id, 'Comment 1')])
+        # Test case is run in its own transaction
+        atomic_depth = len(connection.savepoint_ids)
+
+        def add_comment_to_post(post_id, text):
+            self.assertEqual(len(connection.savepoint_ids), atomic_depth)
+            self.assertIsNotNone(StatusComment.objects.get().lease_date)
+
+        with patch('app.services.vk_api_service.add_comment_to_post', side_effect=add_comment_to_post) as acp:
+            self.assertEqual(comment_service.deliver_comments(), 1)
+            self.assertEqual(acp.call_count, 1)
+
+        self.assertEqual(StatusComment.objects.count(), 0)
+
+    def test_deliver_claimed_comments(self):
+        """Test that comments claimed by another process are published only after the lease expires"""
+        self.enable_commenting()
+        comment_service.add_comments([(self.post1.id, 'Comment 1')])
+        StatusComment.objects.update(lease_date=timezone.now() + timedelta(minutes=1))
+
+        with patch('app.services.vk_api_service.add_comment_to_post') as acp:
+            self.assertEqual(comment_service.deliver_comments(), 0)
+            StatusComment.objects.update(lease_date=timezone.now() - timedelta(minutes=1))
+            self.assertEqual(comment_service.deliver_comments(), 1)
+            self.assertEqual(acp.call_count, 1)
+
+    def test_deliver_comments_commenting_disabled(self):
+        """Test that comments in outbox are not published if commenting was disabled after adding"""
+        self.enable_commenting()
+        comment_service.add_comments([(self.post1.id, 'Comment 1'), (self.post2.id, 'Comment 2')])
+        config = Config.objects.get()
+        config.commenting = False
+        config.save()
+
+        with patch('app.services.vk_api_service.add_comment_to_post') as acp:
+            self.assertEqual(comment_service.deliver_comments(), 0)
+            self.assertEqual(acp.call_count, 0)
+
+        self.assertEqual(StatusComment.objects.count(), 0)
+
+    def test_comments_are_deleted_with_post(self):
+        self.enable_commenting()
+        comment_service.add_comments([(self.post1.id, 'Comment 1')])
+        self.post1.delete()
+        self.assertEqual(StatusComment.objects.count(), 0)
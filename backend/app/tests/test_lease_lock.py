@@ -0,0 +1,88 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.test import TestCase
+
+from app.services.lease_lock import LeaseLock
+
+
+class LeaseLockTests(TestCase):
+
+    def create_lock(self, key, ttl=60, redis_url=settings.REDIS_URL):
+        return LeaseLock(key, ttl, redis_url)
+
+    def test_acquire_is_shared(self):
+        """Test that lock with one key can be held by one owner only"""
+        key = f'test_lease_lock_{uuid.uuid4()}'
+        lock1 = self.create_lock(key)
+        lock2 = self.create_lock(key)
+
+        self.assertTrue(lock1.acquire())
+        self.assertFalse(lock2.acquire())
+        self.assertTrue(lock2.is_locked())
+
+        lock1.release()
+        self.assertFalse(lock2.is_locked())
+        self.assertTrue(lock2.acquire())
+        lock2.release()
+
+    def test_lease_is_extended(self):
+        """Test that heartbeat extends lease of alive owner and lease of released lock isn't extended"""
+        key = f'test_lease_lock_{uuid.uuid4()}'
+        lock = self.create_lock(key, ttl=0.3)
+
+        self.assertTrue(lock.acquire())
+        time.sleep(0.6)
+        self.assertFalse(self.create_lock(key).acquire())
+        lock.release()
+
+    def test_lease_expires(self):
+        """Test that lock of dead owner expires"""
+        key = f'test_lease_lock_{uuid.uuid4()}'
+        lock = self.create_lock(key, ttl=0.3)
+
+        self.assertTrue(lock.acquire())
+        lock._stop_heartbeat()
+        time.sleep(0.4)
+        self.assertTrue(self.create_lock(key).acquire())
+
+    def test_lease_is_lost(self):
+        """Test that lock is marked as lost if its lease is taken by another owner"""
+        key = f'test_lease_lock_{uuid.uuid4()}'
+        lock = self.create_lock(key, ttl=0.3)
+
+        self.assertTrue(lock.acquire())
+        self.assertFalse(lock.lost)
+        lock._get_client().set(key, 'another owner')
+        with self.assertLogs('app.services.lease_lock', level='ERROR'):
+            time.sleep(0.3)
+        self.assertTrue(lock.lost)
+        lock.release()
+
+        lock._get_client().delete(key)
+        self.assertTrue(lock.acquire())
+        self.assertFalse(lock.lost)
+        lock.release()
+
+    def test_hold(self):
+        key = f'test_lease_lock_{uuid.uuid4()}'
+        lock = self.create_lock(key)
+
+        with lock.hold() as acquired:
+            self.assertTrue(acquired)
+            with lock.hold() as acquired_again:
+                self.assertFalse(acquired_again)
+            self.assertTrue(lock.is_locked())
+
+        self.assertFalse(lock.is_locked())
+
+    def test_acquire_without_redis(self):
+        """Test that in-process lock is used if Redis is unavailable"""
+        lock = self.create_lock('test_lease_lock', redis_url='redis://localhost:1')
+        with self.assertLogs('app.services.lease_lock', level='ERROR'):
+            self.assertTrue(lock.acquire())
+            self.assertFalse(lock.acquire())
+            lock.release()
+            self.assertTrue(lock.acquire())
+            lock.release()
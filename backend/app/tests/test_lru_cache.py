@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+
+from app.services.lru_cache import LruCache
+
+
+class LruCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = LruCache(max_size=2)
+
+    def test_get(self):
+        self.assertEqual(self.cache.get('a', lambda: 1), 1)
+        self.assertEqual(self.cache.get('a', lambda: 2), 1)
+        self.assertEqual(self.cache.get('b', lambda: 2), 2)
+
+        self.assertEqual(self.cache.get_stats(), {'hits': 1, 'misses': 2, 'size': 2})
+        self.assertEqual(str(self.cache), 'hits: 1, misses: 2, size: 2')
+
+    def test_get_none(self):
+        """Test that None is cached as a value"""
+        self.assertIsNone(self.cache.get('a', lambda: None))
+        self.assertIsNone(self.cache.get('a', lambda: 1))
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+
+    def test_get_invalid(self):
+        """Test that invalid cached value is computed again"""
+        self.assertEqual(self.cache.get('a', lambda: 1), 1)
+        self.assertEqual(self.cache.get('a', lambda: 2, lambda value: value == 2), 2)
+        self.assertEqual(self.cache.get('a', lambda: 3, lambda value: value == 2), 2)
+        self.assertEqual(self.cache.get_stats(), {'hits': 1, 'misses': 2, 'size': 1})
+
+    def test_eviction(self):
+        """Test that the least recently used value is evicted"""
+        for key in [1, 2, 1, 3, 1, 2]:
+            self.cache.get(key, dict)
+
+        self.assertEqual(self.cache.get_stats(), {'hits': 2, 'misses': 4, 'size': 2})
+
+    def test_clear(self):
+        self.cache.get(1, dict)
+        self.cache.clear()
+        self.assertEqual(self.cache.get_stats(), {'hits': 0, 'misses': 0, 'size': 0})
@@ -1,6 +1,8 @@
+import random
+import time
 from typing import List
 
-from app.services.message_parser import parse
+from app.services.message_parser import parse, parse_regex
 from django.test import TestCase
 
 
@@ -89,3 +91,34 @@ class MessageParserTests(TestCase):
     def test_big_distances(self):
         """Test that big distances will be normal processing"""
         self.assert_result('999999900 + 100 = 1000000000', 999_999_900, [100], 100, 1_000_000_000)
+
+
+class MessageParserEquivalenceTests(TestCase):
+    """Tests that `parse` gives the same results as the reference `parse_regex`"""
+
+    FUZZ_ALPHABET = ['0', '1', '7', '12', '٣', ' ', '  ', '\n', '\u3000', '+', '=', '.', '-', 'км', '#', '😉']
+
+    def assert_equivalent(self, message: str):
+        self.assertEqual(parse(message), parse_regex(message), repr(message))
+
+    def test_examples(self):
+        for message in ['1+2=3', '1 + 2 + 3 = 6 км', '1 = 2 + 3 = 5', '1 + 2 + = 3', '1 + + 2 = 3', '1 + 2 =',
+                        '+ 1 + 2 = 3 + 4 = 7', '1.5 + 2 = 3.5', '٣ + ٤ = ٧', '1\u3000+\n2\t=\r3', '12+34+x=5',
+                        '1 + 2 3 + 4 = 7', '', '=+', '0 + 0 = 0 + 0 = 0']:
+            self.assert_equivalent(message)
+
+    def test_fuzz(self):
+        rnd = random.Random(2015)
+        for _ in range(20000):
+            self.assert_equivalent(''.join(rnd.choices(self.FUZZ_ALPHABET, k=rnd.randint(0, 20))))
+
+    def test_long_chain(self):
+        """Test that a long chain of additions without result is parsed in linear time"""
+        message = '1 + ' * 100_000 + '= 1'
+        start = time.perf_counter()
+        self.assertIsNone(parse(message))
+        self.assertLess(time.perf_counter() - start, 1)
+
+        result = parse('1 + ' * 100_000 + '2 = 3')
+        self.assertEqual(result.start_sum_number, 1)
+        self.assertEqual(result.distance_list, [1] * 99_999 + [2])
@@ -0,0 +1,63 @@
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from app.services.metrics import LatencyMetrics
+
+
+class LatencyMetricsTests(TestCase):
+
+    def test_record(self):
+        metrics = LatencyMetrics()
+        metrics.record('wall.get', 0.3)
+        metrics.record('wall.get', 0.1)
+        metrics.record('users.get', 0.2)
+
+        stats = metrics.get_stats()
+        self.assertEqual(stats['wall.get']['count'], 2)
+        self.assertAlmostEqual(stats['wall.get']['avg'], 0.2)
+        self.assertAlmostEqual(stats['wall.get']['max'], 0.3)
+        self.assertEqual(str(metrics), 'wall.get: 2 calls, avg: 200 ms, max: 300 ms, '
+                                       'users.get: 1 calls, avg: 200 ms, max: 200 ms')
+
+        metrics.reset()
+        self.assertEqual(metrics.get_stats(), {})
+
+    def test_measure(self):
+        metrics = LatencyMetrics()
+        with patch('time.perf_counter', side_effect=[1.0, 1.5]):
+            with metrics.measure('wall.get'):
+                pass
+
+        self.assertEqual(metrics.get_stats()['wall.get']['total'], 0.5)
+
+    def test_collect(self):
+        """Test that collected metrics have only durations which are recorded inside the block"""
+        metrics = LatencyMetrics()
+        metrics.record('wall.get', 0.3)
+        with metrics.collect() as collected:
+            metrics.record('wall.get', 0.1)
+        metrics.record('wall.get', 0.2)
+
+        self.assertEqual(metrics.get_stats()['wall.get']['count'], 3)
+        self.assertEqual(collected.get_stats(), {'wall.get': {'count': 1, 'total': 0.1, 'max': 0.1, 'avg': 0.1}})
+
+    def test_collect_other_thread(self):
+        """Test that durations of other threads are collected only if the threads join the collector"""
+        metrics = LatencyMetrics()
+
+        def record(collector=None):
+            with metrics.collect(collector):
+                metrics.record('users.get', 0.2)
+
+        with metrics.collect() as collected:
+            metrics.record('wall.get', 0.1)
+            for args in ((), (collected,)):
+                thread = threading.Thread(target=record, args=args)
+                thread.start()
+                thread.join()
+
+        self.assertEqual(metrics.get_stats()['users.get']['count'], 2)
+        self.assertEqual(collected.get_stats()['wall.get']['count'], 1)
+        self.assertEqual(collected.get_stats()['users.get']['count'], 1)
@@ -0,0 +1,35 @@
+from hashlib import md5
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from app.services import message_parser
+from app.services.parse_cache import ParseCache
+
+
+def get_hash(text):
+    return md5(text.encode()).hexdigest()
+
+
+class ParseCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = ParseCache(max_size=2)
+
+    def test_parse(self):
+        with patch('app.services.message_parser.parse', wraps=message_parser.parse) as parse:
+            self.assertEqual(self.cache.parse('1 + 2 = 3', get_hash('1 + 2 = 3')).distance, 2)
+            self.assertEqual(self.cache.parse('1 + 2 = 3', get_hash('1 + 2 = 3')).distance, 2)
+            self.assertIsNone(self.cache.parse('text', get_hash('text')))
+            self.assertIsNone(self.cache.parse('text', get_hash('text')))
+            self.assertEqual(parse.call_count, 2)
+
+        self.assertEqual(self.cache.get_stats(), {'hits': 2, 'misses': 2, 'size': 2})
+        self.assertEqual(str(self.cache), 'hits: 2, misses: 2, size: 2')
+
+    def test_hand_edited_text(self):
+        """Test that the hash of the text in VK isn't used for the hand edited text"""
+        text_hash = get_hash('1 + 2 = 3')
+        self.assertEqual(self.cache.parse('1 + 2 = 3', text_hash).distance, 2)
+        self.assertEqual(self.cache.parse('1 + 5 = 6', text_hash).distance, 5)
+        self.assertEqual(self.cache.get_stats()['hits'], 0)
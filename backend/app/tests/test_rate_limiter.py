@@ -0,0 +1,77 @@
+import time
+import uuid
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase
+from redis.exceptions import RedisError
+
+from app.services.rate_limiter import TokenBucket, RedisTokenBucket
+from app.services.redis_backoff import RETRY_SECONDS
+
+
+class TokenBucketTests(TestCase):
+
+    @patch('time.sleep')
+    def test_acquire(self, ts):
+        """Test that bucket waits only when there are no tokens"""
+        now = [100.0]
+        with patch('time.monotonic', side_effect=lambda: now[0]):
+            bucket = TokenBucket(rate=2, capacity=2)
+            bucket.acquire()
+            bucket.acquire()
+            self.assertEqual(ts.call_count, 0)
+
+            bucket.acquire()
+            self.assertEqual(ts.call_count, 1)
+            self.assertAlmostEqual(ts.call_args.args[0], 0.5)
+
+            """Test that waiting callers are served in order"""
+            bucket.acquire()
+            self.assertAlmostEqual(ts.call_args.args[0], 1)
+
+            """Test that tokens are restored over time"""
+            now[0] += 10
+            bucket.acquire()
+            self.assertEqual(ts.call_count, 2)
+
+
+class RedisTokenBucketTests(TestCase):
+
+    def create_bucket(self, key, redis_url=settings.REDIS_URL):
+        return RedisTokenBucket(key, rate=2, capacity=2, redis_url=redis_url)
+
+    def test_reserve_is_shared(self):
+        """Test that buckets with one key share tokens"""
+        key = f'test_rate_limiter_{uuid.uuid4()}'
+        bucket1 = self.create_bucket(key)
+        bucket2 = self.create_bucket(key)
+
+        self.assertEqual(bucket1.reserve(), 0)
+        self.assertEqual(bucket2.reserve(), 0)
+        self.assertAlmostEqual(bucket1.reserve(), 0.5, places=1)
+        self.assertAlmostEqual(bucket2.reserve(), 1, places=1)
+
+    def test_reserve_without_redis(self):
+        """Test that in-process bucket is used if Redis is unavailable"""
+        bucket = self.create_bucket('test_rate_limiter', redis_url='redis://localhost:1')
+        with self.assertLogs('app.services.rate_limiter', level='WARNING'):
+            self.assertEqual(bucket.reserve(), 0)
+            self.assertEqual(bucket.reserve(), 0)
+            self.assertGreater(bucket.reserve(), 0)
+
+    def test_reserve_backoff(self):
+        """Test that Redis isn't requested again for a while after failure and the outage is logged once"""
+        bucket = self.create_bucket(f'test_rate_limiter_{uuid.uuid4()}')
+        script = bucket._get_script()
+        with patch.object(bucket, '_get_script', side_effect=[RedisError('Ooops!'), script]) as get_script:
+            with self.assertLogs('app.services.rate_limiter', level='WARNING') as logs:
+                bucket.reserve()
+                bucket.reserve()
+            self.assertEqual(get_script.call_count, 1)
+            self.assertEqual(len(logs.records), 1)
+
+            with patch('time.monotonic', return_value=time.monotonic() + RETRY_SECONDS), \
+                    self.assertLogs('app.services.rate_limiter', level='INFO'):
+                self.assertEqual(bucket.reserve(), 0)
+            self.assertEqual(get_script.call_count, 2)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.db.models import Count, Sum, Min, Max
+from django.db.models.functions import TruncDate
+from django.test import TestCase
+
+from app.models import Post, RunnerTotals, RunnerDay
+from app.services import runner_totals_service, sync_service, stat_service
+from app.tests import create_config, create_runnings, create_date
+from app.tests.fake_vk import FakeVk, create_vk_posts
+
+
+def aggregate_totals():
+    """Totals of runners computed by grouping of all runnings"""
+    rows = Post.runnings.order_by('author_id').values('author_id').annotate(
+        Count('id'), Sum('distance'), Min('date'), Max('date'))
+    return [tuple(row.values()) for row in rows]
+
+
+def aggregate_days():
+    """Runnings of runners by days computed by grouping of all runnings"""
+    rows = Post.runnings.annotate(day=TruncDate('date')).order_by('day', 'author_id').values('day', 'author_id')\
+        .annotate(running_count=Count('id'), distance_sum=Sum('distance'))
+    return [(row['day'], row['author_id'], row['running_count'], row['distance_sum']) for row in rows]
+
+
+def get_totals():
+    return list(RunnerTotals.objects.order_by('profile_id')
+                .values_list('profile_id', 'running_count', 'distance_sum', 'first_run_date', 'last_run_date'))
+
+
+def get_days():
+    return list(RunnerDay.objects.order_by('day', 'profile_id')
+                .values_list('day', 'profile_id', 'running_count', 'distance_sum'))
+
+
+class RunnerTotalsServiceTests(TestCase):
+
+    def setUp(self):
+        create_config()
+
+    def test_rebuild_totals(self):
+        create_runnings()
+        RunnerTotals.objects.all().delete()
+        RunnerDay.objects.all().delete()
+
+        runner_totals_service.rebuild_totals()
+        self.assertEqual(get_totals(), aggregate_totals())
+        self.assertEqual(get_days(), aggregate_days())
+        self.assertEqual(len(get_days()), 20)
+
+    def test_update_totals(self):
+        """Test that only totals of given runners are recomputed and totals without runnings are deleted"""
+        create_runnings()
+        first_post, last_post = Post.runnings.filter(author_id=2437792).order_by('date')
+        other_totals = RunnerTotals.objects.get(profile_id=39752943)
+        RunnerTotals.objects.filter(profile_id=39752943).update(distance_sum=0)
+        RunnerDay.objects.filter(profile_id=39752943).update(distance_sum=0)
+        days = get_days()
+
+        first_post.delete()
+        with patch('app.services.runner_totals_service.UPDATE_CHUNK_SIZE', 1):
+            runner_totals_service.update_totals([(2437792, first_post.date), (2437792, first_post.date),
+                                                 (1, first_post.date)])
+
+        totals = RunnerTotals.objects.get(profile_id=2437792)
+        self.assertEqual((totals.running_count, totals.distance_sum), (1, 5))
+        self.assertEqual(RunnerTotals.objects.get(profile_id=39752943).distance_sum, 0)
+        days.remove((first_post.date.date(), 2437792, 1, 4))
+        self.assertEqual(get_days(), days)
+
+        last_post.delete()
+        runner_totals_service.update_totals([(2437792, last_post.date), (39752943, create_date(2015, 9, 1, 12))])
+        self.assertFalse(RunnerTotals.objects.filter(profile_id=2437792).exists())
+        self.assertFalse(RunnerDay.objects.filter(profile_id=2437792).exists())
+        self.assertEqual(RunnerTotals.objects.get(profile_id=39752943).distance_sum, other_totals.distance_sum)
+        # Only the given day of the runner is recomputed
+        other_days = RunnerDay.objects.filter(profile_id=39752943).order_by('day')
+        self.assertEqual(list(other_days.values_list('day', 'distance_sum')),
+                         [(create_date(2015, 9, 1).date(), 4), (create_date(2015, 9, 3).date(), 0)])
+
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('app.services.vk_api_service.rate_limiter')
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_posts(self, mgs, rl):
+        """Test that totals and header counters are kept by sync of new, edited and deleted posts"""
+        config = create_config()
+        config.sync_posts = True
+        config.save()
+        fake_vk = FakeVk(create_vk_posts(30, profile_count=7, start_date=datetime.now() - timedelta(hours=1)))
+        with patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method):
+            sync_service.sync_posts()
+            self.assertEqual(get_totals(), aggregate_totals())
+
+            fake_vk.edit_post(10, 'text')
+            fake_vk.delete_post(21)
+            fake_vk.delete_post(22)
+            sync_service.sync_posts()
+
+        self.assertEqual(Post.objects.count(), 28)
+        self.assertEqual(get_totals(), aggregate_totals())
+        self.assertEqual(get_days(), aggregate_days())
+        self.assertEqual(stat_service.reconcile_counters(), {})
@@ -0,0 +1,79 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import Post, Profile
+from app.services.running_columns import RunningColumns
+from app.tests import create_post
+
+
+class RunningColumnsTests(TestCase):
+
+    def setUp(self):
+        self.profile = Profile.objects.create(join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+
+    def test_load(self):
+        create_post(Post.Status.SUCCESS, self.profile, '0+5+3=8', 1)
+        create_post(Post.Status.ERROR_PARSE, self.profile, 'text')
+
+        columns = RunningColumns.load(Post.objects.order_by('date'))
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(columns.start_sums, [0, None])
+        self.assertEqual(columns.distances, [8, None])
+        self.assertEqual(columns.end_sums, [8, None])
+        self.assertEqual(columns.numbers, [1, None])
+
+    def test_recompute(self):
+        """Test that numbers, sums and statuses are computed like in sequential analyzing"""
+        columns = RunningColumns(
+            ids=[1, 2, 3, 4, 5],
+            start_sums=[10, 15, None, 20, 26],
+            distances=[5, 5, None, 6, 4],
+            end_sums=[15, 21, None, 26, 30],
+            numbers=[None] * 5,
+            post_distances=[None] * 5,
+            sum_distances=[None] * 5,
+            statuses=[None] * 5,
+            hand_edited=[False] * 5
+        )
+
+        recomputed = columns.recompute(last_post_number=2, last_sum_distance=10)
+        self.assertEqual(recomputed.numbers, [3, 4, None, 5, 6])
+        self.assertEqual(recomputed.sum_distances, [15, 20, None, 26, 30])
+        self.assertEqual(recomputed.last_sum_distances, [10, 15, 20, 20, 26])
+        self.assertEqual(recomputed.statuses, [
+            Post.Status.SUCCESS, Post.Status.ERROR_SUM, Post.Status.ERROR_PARSE, Post.Status.SUCCESS,
+            Post.Status.SUCCESS
+        ])
+
+    def test_get_changed_indexes(self):
+        create_post(Post.Status.SUCCESS, self.profile, '0+5=5', 1)
+        create_post(Post.Status.SUCCESS, self.profile, '5+3=8', 2)
+        post = create_post(Post.Status.SUCCESS, self.profile, '8+2=10', 3)
+        post.distance = 7
+        post.save()
+
+        columns = RunningColumns.load(Post.objects.order_by('date'))
+        self.assertEqual(columns.get_changed_indexes(columns.recompute(0, 0)), [2])
+        self.assertEqual(columns.get_changed_indexes(columns.recompute(1, 0)), [0, 1, 2])
+
+    def test_recompute_hand_edited(self):
+        """Test that hand edited posts keep their fields and next runnings continue them"""
+        columns = RunningColumns(
+            ids=[1, 2, 3, 4],
+            start_sums=[0, 5, None, 30],
+            distances=[5, 5, None, 4],
+            end_sums=[5, 10, None, 34],
+            numbers=[1, 7, None, None],
+            post_distances=[5, 20, None, None],
+            sum_distances=[5, 30, None, None],
+            statuses=[Post.Status.SUCCESS, Post.Status.SUCCESS, None, None],
+            hand_edited=[False, True, False, False]
+        )
+
+        recomputed = columns.recompute(last_post_number=0, last_sum_distance=0)
+        self.assertEqual(recomputed.numbers, [1, 7, None, 8])
+        self.assertEqual(recomputed.sum_distances, [5, 30, None, 34])
+        self.assertEqual(recomputed.last_sum_distances, [0, 5, 30, 30])
+        self.assertEqual(recomputed.statuses, [Post.Status.SUCCESS, Post.Status.SUCCESS, Post.Status.ERROR_PARSE,
+                                               Post.Status.SUCCESS])
+        self.assertEqual(columns.get_changed_indexes(recomputed), [2, 3])
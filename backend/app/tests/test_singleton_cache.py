@@ -0,0 +1,79 @@
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.db import transaction
+from django.test import TransactionTestCase
+from redis.exceptions import RedisError
+
+from app.models import Config
+from app.services.redis_backoff import RETRY_SECONDS
+from app.services.singleton_cache import SingletonCache
+from app.tests import create_config
+
+
+class SingletonCacheTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        create_config()
+        self.cache = SingletonCache(Config, settings.REDIS_URL)
+
+    def test_get(self):
+        """Test that row is loaded once and callers get copies of it"""
+        with self.assertNumQueries(1):
+            config = self.cache.get()
+            config.group_id = 1
+            self.assertEqual(self.cache.get().group_id, 88923650)
+
+    def test_invalidate_on_save(self):
+        config = self.cache.get()
+        config.group_id = 1
+        config.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get().group_id, 1)
+            self.assertEqual(self.cache.get().group_id, 1)
+
+    def test_get_in_transaction(self):
+        """Test that row which is read in transaction isn't cached, but cached row is used"""
+        with transaction.atomic():
+            with self.assertNumQueries(2):
+                self.cache.get()
+                self.cache.get()
+
+        self.cache.get()
+        with transaction.atomic(), self.assertNumQueries(0):
+            self.cache.get()
+
+    def test_invalidate_in_other_process(self):
+        """Test that row is dropped in other processes through pub/sub"""
+        other_cache = SingletonCache(Config, settings.REDIS_URL)
+        other_cache.get()
+
+        self.cache.invalidate()
+        time.sleep(0.2)
+
+        with self.assertNumQueries(1):
+            other_cache.get()
+
+    def test_get_without_redis(self):
+        """Test that row is loaded on every call if Redis is unavailable"""
+        cache = SingletonCache(Config, 'redis://localhost:1')
+        with self.assertLogs('app.services.singleton_cache', level='WARNING'), self.assertNumQueries(2):
+            cache.get()
+            cache.get()
+
+    def test_get_backoff(self):
+        """Test that Redis isn't requested again for a while after failure and the outage is logged once"""
+        with patch.object(self.cache, '_get_client', side_effect=RedisError('Ooops!')) as get_client, \
+                self.assertLogs('app.services.singleton_cache', level='WARNING') as logs:
+            self.cache.get()
+            self.cache.get()
+            self.assertEqual(get_client.call_count, 1)
+            self.assertEqual(len(logs.records), 1)
+
+        with patch('time.monotonic', return_value=time.monotonic() + RETRY_SECONDS), \
+                self.assertLogs('app.services.singleton_cache', level='INFO'), self.assertNumQueries(1):
+            self.cache.get()
+            self.cache.get()
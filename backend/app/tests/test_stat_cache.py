@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app.models import StatLog, Post, TempData
+from app.services import stat_cache, stat_service
+from app.tests import create_config, create_runnings, create_admin
+
+STAT_URL = reverse('stat-list')
+
+
+@patch('ws.ws_service.main_group_send')
+class StatDataTests(TestCase):
+
+    def setUp(self):
+        create_config()
+        create_runnings()
+        stat_cache.stat_cache.clear()
+        self.client = APIClient()
+
+    def get_stat(self, **params):
+        res = self.client.get(STAT_URL, {'type': 'date', **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_cached_stat(self, mgs):
+        """Test that stat is calculated once for the same range and data version"""
+        with patch('app.services.stat_service.calc_stat', wraps=stat_service.calc_stat) as calc_stat:
+            stat = self.get_stat()
+            self.assertEqual(self.get_stat(), stat)
+            self.get_stat(end_range=1441324800000)
+            self.assertEqual(calc_stat.call_count, 2)
+
+        self.assertEqual(stat_cache.stat_cache.get_stats(), {'hits': 1, 'misses': 2, 'size': 2})
+
+    def test_update_stat(self, mgs):
+        """Test that stat is recalculated after changing of data version by update of stat"""
+        self.assertEqual(self.get_stat()['all_distance'], 112)
+
+        Post.objects.filter(id=Post.runnings.order_by('-date').first().id).update(sum_distance=200)
+        self.assertEqual(self.get_stat()['all_distance'], 112)
+
+        stat_service.update_stat()
+        self.assertEqual(TempData.objects.get().data_version, 1)
+        self.assertEqual(self.get_stat()['all_distance'], 200)
+
+    def test_stat_key(self, mgs):
+        stat = stat_cache.get_stat_data(StatLog.StatType.DISTANCE, None, 50)
+        self.assertEqual(stat['end_distance'], 50)
+        self.assertEqual(stat_cache.get_stat_data(StatLog.StatType.DISTANCE, None, 100)['end_distance'], 100)
+
+    def test_admin_edit(self, mgs):
+        """Test that admin edits change data version"""
+        client = Client()
+        client.force_login(create_admin())
+        post = Post.runnings.first()
+
+        res = client.post(reverse('admin:app_post_delete', args=[post.id]), {'post': 'yes'})
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(TempData.objects.get().data_version, 1)
@@ -2,6 +2,7 @@ import os
 from datetime import timedelta
 from unittest.mock import patch
 
+from django.db.models import Count, Sum
 from django.test import TestCase
 from django.utils import timezone
 
@@ -12,6 +13,15 @@ from app.tests import TESTS_DIR, create_config, create_runnings, create_date
 from app.util import date_to_js_unix_time
 
 
+def get_runners(start_date, end_date):
+    """Runners between dates computed by grouping of runnings"""
+    runners = Profile.objects\
+        .filter(post__number__isnull=False, post__date__gte=start_date, post__date__lte=end_date)\
+        .annotate(running_count=Count('post__number'), distance_sum=Sum('post__distance'))\
+        .order_by('-distance_sum', 'id')
+    return [RunnerDto(r, r.running_count, r.distance_sum) for r in runners]
+
+
 class StatServiceTests(TestCase):
 
     def test_calc_stat_without_data(self):
@@ -202,6 +212,55 @@ class StatServiceTests(TestCase):
         self.assertAlmostEqual(stat.distance_per_training, 5.92, 2)
         self.assertAlmostEqual(stat.training_count_per_day, 4.33, 2)
 
+    def test_calc_stat_by_one_query(self):
+        """Test that stat is calculated by one statement for any stat type"""
+        create_runnings()
+        with self.assertNumQueries(1):
+            stat_service.calc_stat(StatLog.StatType.DATE, None, None)
+        with self.assertNumQueries(1):
+            stat_service.calc_stat(StatLog.StatType.DATE, date_to_js_unix_time(create_date(2015, 9, 2, 12)), None)
+        with self.assertNumQueries(1):
+            stat_service.calc_stat(StatLog.StatType.DISTANCE, 10, 50)
+
+    def test_calc_stat_all_runners(self):
+        """Test that runners for whole time till the end of the stat are the same as runners got from runnings"""
+        create_runnings()
+        first_running = Post.runnings.order_by('date').first()
+        for last_running in Post.runnings.order_by('date')[::3]:
+            end_distance = last_running.sum_distance - last_running.distance + 1
+            stat = stat_service.calc_stat(StatLog.StatType.DISTANCE, None, end_distance)
+            runners = get_runners(first_running.date, last_running.date)
+
+            with self.subTest(last_running=last_running):
+                self.assertEqual(stat.end_date, last_running.date)
+                self.assertEqual(stat.top_all_runners, runners[:stat_service.TOP_RUNNERS_COUNT])
+                self.assertEqual(stat.all_runners_count, len(runners))
+                self.assertEqual(stat.max_one_man_training_count,
+                                 sorted(runners, key=lambda it: it.running_count, reverse=True)[0])
+
+    def test_calc_stat_interval_runners(self):
+        """Test that runners of date stat from runnings by days are the same as runners got from runnings"""
+        create_runnings()
+        start_dates = [create_date(2015, 8, 31), create_date(2015, 9, 1), create_date(2015, 9, 2, 2, 56, 41),
+                       create_date(2015, 9, 2, 12), create_date(2015, 9, 3), create_date(2015, 9, 4, 7, 12, 15)]
+        end_dates = [create_date(2015, 9, 1), create_date(2015, 9, 2), create_date(2015, 9, 3),
+                     create_date(2015, 9, 5)]
+        for start_date in start_dates:
+            for end_date in end_dates:
+                runners = get_runners(start_date, end_date + timedelta(hours=23, minutes=59, seconds=59))
+                if not runners:
+                    continue
+
+                stat = stat_service.calc_stat(StatLog.StatType.DATE, date_to_js_unix_time(start_date),
+                                              date_to_js_unix_time(end_date))
+                with self.subTest(start_date=start_date, end_date=end_date):
+                    self.assertEqual(stat.top_interval_runners, runners[:stat_service.TOP_RUNNERS_COUNT])
+                    self.assertEqual(stat.interval_runners_count, len(runners))
+                    new_runners = sorted([r.profile for r in runners if r.profile.join_date >= start_date],
+                                         key=lambda it: it.join_date)
+                    self.assertEqual(stat.new_runners, new_runners)
+                    self.assertEqual(stat.new_runners_count, len(new_runners))
+
     def test_create_stat_log(self):
         """Test that create_stat_log return correct values"""
         create_runnings()
@@ -239,6 +298,34 @@ class StatServiceTests(TestCase):
             'post_count': 21
         })
 
+    def test_get_stat_from_counters(self):
+        """Test that header counters are read from TempData without counting of posts"""
+        create_runnings()
+        with self.assertNumQueries(1) as queries:
+            stat_service.get_stat()
+        self.assertNotIn('COUNT', queries.captured_queries[0]['sql'])
+
+    def test_update_counters(self):
+        create_runnings()
+        last_running = Post.runnings.order_by('-date').first()
+        last_running.delete()
+
+        stat_service.update_counters(-1)
+        self.assertEqual(stat_service.get_stat(), {'distance_sum': 108, 'running_count': 19, 'post_count': 20})
+        self.assertEqual(stat_service.reconcile_counters(), {})
+
+    def test_reconcile_counters(self):
+        """Test that drifted counters are returned and fixed"""
+        create_runnings()
+        TempData.objects.update(post_count=5, distance_sum=1)
+
+        drift = {'post_count': (5, 21), 'distance_sum': (1, 112)}
+        self.assertEqual(stat_service.reconcile_counters(dry_run=True), drift)
+        self.assertEqual(TempData.objects.get().post_count, 5)
+        self.assertEqual(stat_service.reconcile_counters(), drift)
+        self.assertEqual(stat_service.get_stat(), {'distance_sum': 112, 'running_count': 20, 'post_count': 21})
+        self.assertEqual(stat_service.reconcile_counters(), {})
+
     def test_update_stat(self):
         """Test that update stat correct update last_sync_date"""
         temp_data = TempData.objects.get()
@@ -251,6 +338,11 @@ class StatServiceTests(TestCase):
 
         self.assertGreaterEqual(temp_data.last_sync_date, before_date)
         self.assertLessEqual(temp_data.last_sync_date, after_date)
+        self.assertIsNone(temp_data.last_full_sync_date)
+
+        stat_service.update_stat(full_sync=True)
+        temp_data.refresh_from_db()
+        self.assertEqual(temp_data.last_full_sync_date, temp_data.last_sync_date)
 
     @patch('app.services.vk_api_service.create_post', return_value={'post_id': 123})
     @patch('app.services.stat_service._create_post_text', return_value='Post text')
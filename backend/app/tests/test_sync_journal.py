@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from app.services import sync_journal
+from app.services.sync_journal import JournalRecord
+from app.tests.fake_vk import create_vk_posts
+
+
+class SyncJournalTests(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'journal.jsonl.gz')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_append_and_read(self):
+        vk_posts = create_vk_posts(5)
+        records = [
+            JournalRecord(3, 5, {'count': 5, 'items': vk_posts[3:]}, {1: {'id': 1, 'first_name': 'Иван'}}),
+            JournalRecord(0, 5, {'count': 5, 'items': vk_posts[:3]}, {-2: {'id': 2, 'name': 'Group'}})
+        ]
+        for record in records:
+            sync_journal.append(record, self.path)
+
+        self.assertEqual(list(sync_journal.read(self.path)), records)
+
+    def test_append_is_off(self):
+        with self.settings(SYNC_JOURNAL_PATH=None):
+            sync_journal.append(JournalRecord(0, 0, {'count': 0, 'items': []}, {}))
+        self.assertFalse(os.path.exists(self.path))
+
+        with self.settings(SYNC_JOURNAL_PATH=self.path):
+            sync_journal.append(JournalRecord(0, 0, {'count': 0, 'items': []}, {}))
+        self.assertEqual(len(list(sync_journal.read(self.path))), 1)
+
+    def test_append_error(self):
+        """Test that sync isn't broken if the journal can't be written"""
+        path = os.path.join(self.dir.name, 'absent', 'journal.jsonl.gz')
+        with self.assertLogs('app.services.sync_journal', 'WARNING'):
+            sync_journal.append(JournalRecord(0, 0, {'count': 0, 'items': []}, {}), path)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import Post, Profile, TempData
+from app.services import singleton_cache, sync_scheduler
+from app.tests import create_config, create_post, create_vk_post
+
+
+@override_settings(SYNC_MIN_INTERVAL=60, SYNC_MAX_INTERVAL=1800)
+class SyncSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+        self.profile = Profile.objects.create(join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+        self.now = timezone.now()
+
+    def create_posts(self, count, date, start_id=1):
+        for i in range(count):
+            create_post(Post.Status.SUCCESS, self.profile, 'text', post_id=start_id + i, date=date)
+
+    def test_get_sync_interval_without_posts(self):
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now), 1800)
+
+    def test_get_sync_interval_by_recent_posts(self):
+        self.create_posts(6, self.now - timedelta(minutes=10))
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now), 600)
+
+    def test_get_sync_interval_by_usual_posts(self):
+        """Test that posts published at the same time of previous days shorten the interval"""
+        self.create_posts(28, self.now - timedelta(days=3, minutes=20))
+        self.create_posts(10, self.now - timedelta(days=3, hours=2), start_id=100)
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now), 900)
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now + timedelta(minutes=20)), 1800)
+
+        self.create_posts(14, self.now - timedelta(days=1), start_id=200)
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now), 600)
+
+    def test_get_sync_interval_bounds(self):
+        self.create_posts(100, self.now - timedelta(minutes=1))
+        self.assertEqual(sync_scheduler.get_sync_interval(self.now), 60)
+
+    def test_get_post_rate_query_count(self):
+        with self.assertNumQueries(1):
+            sync_scheduler.get_post_rate(self.now)
+
+    def test_schedule_next_sync(self):
+        self.assertTrue(sync_scheduler.is_sync_due(self.now))
+
+        next_sync_date = sync_scheduler.schedule_next_sync(self.now)
+        self.assertEqual(next_sync_date, self.now + timedelta(seconds=1800))
+        self.assertEqual(TempData.objects.get().next_sync_date, next_sync_date)
+        self.assertFalse(sync_scheduler.is_sync_due(self.now + timedelta(seconds=1799)))
+        self.assertTrue(sync_scheduler.is_sync_due(next_sync_date))
+
+    def test_need_sync(self):
+        last_sync_date = self.now - timedelta(minutes=1)
+        TempData.objects.update(last_sync_date=last_sync_date, last_full_sync_date=last_sync_date)
+        self.create_posts(2, self.now - timedelta(days=1))
+        pinned_post = create_vk_post(1, self.profile.id, 'text')
+
+        with patch('app.services.vk_api_service.get_wall_posts') as gwp:
+            gwp.return_value = {'count': 2, 'items': [create_vk_post(2, self.profile.id, 'text')]}
+            self.assertFalse(sync_scheduler.need_sync(self.now))
+            gwp.assert_called_once_with(0, 1)
+
+            # The check is recorded as the last sync, but not as the last full sync
+            temp_data = TempData.objects.get()
+            self.assertGreater(temp_data.last_sync_date, last_sync_date)
+            self.assertEqual(temp_data.last_full_sync_date, last_sync_date)
+
+            gwp.return_value = {'count': 2, 'items': [pinned_post]}
+            self.assertFalse(sync_scheduler.need_sync(self.now))
+
+            gwp.return_value = {'count': 3, 'items': [create_vk_post(3, self.profile.id, 'text')]}
+            self.assertTrue(sync_scheduler.need_sync(self.now))
+
+            gwp.return_value = {'count': 2, 'items': [create_vk_post(3, self.profile.id, 'text')]}
+            self.assertTrue(sync_scheduler.need_sync(self.now))
+
+            gwp.return_value = {'count': 1, 'items': [pinned_post]}
+            self.assertTrue(sync_scheduler.need_sync(self.now))
+
+    def test_need_sync_after_max_interval(self):
+        """Test that edited posts are synced at least every max interval without asking VK"""
+        TempData.objects.update(last_sync_date=self.now, last_full_sync_date=self.now - timedelta(seconds=1800))
+        with patch('app.services.vk_api_service.get_wall_posts') as gwp:
+            self.assertTrue(sync_scheduler.need_sync(self.now))
+            self.assertEqual(gwp.call_count, 0)
+
+            TempData.objects.update(last_full_sync_date=None)
+            singleton_cache.temp_data_cache.invalidate()
+            self.assertTrue(sync_scheduler.need_sync(self.now))
+            self.assertEqual(gwp.call_count, 0)
+
+    def test_get_sync_interval_with_callback_api(self):
+        self.create_posts(100, self.now - timedelta(minutes=1))
+        with self.settings(VK_CALLBACK_SECRET='secret'):
+            self.assertEqual(sync_scheduler.get_sync_interval(self.now), 1800)
+
+    def test_request_sync(self):
+        sync_scheduler.schedule_next_sync(self.now)
+        sync_scheduler.request_sync()
+        self.assertTrue(sync_scheduler.is_sync_due())
@@ -1,13 +1,20 @@
+import os
+import tempfile
 from datetime import timedelta
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 
-from django.test import TestCase
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 
-from app.models import Config, Post, Profile
-from app.services import sync_service
+from app.models import Post, Profile
+from app.services import sync_service, message_parser, sync_journal
+from app.services.sync_service import SyncBatch
+from app.services.sync_window import SyncWindow
 from app.tests import create_config, create_comment_text, create_post, create_vk_post
-from ws.ws_service import EventType
+from app.tests.fake_vk import FakeVk, create_vk_posts
+from ws.ws_service import EventType, ObjectType
 
 
 class SyncServiceTests(TestCase):
@@ -37,6 +44,157 @@ class SyncServiceTests(TestCase):
                 pass
             self.assertEqual(Post.objects.count(), 0)
 
+    def test_sync_posts_resume(self):
+        """Test that committed blocks are kept after a failed block and sync resumes after the last of them"""
+        items = [
+            self.create_vk_post(2, '5+3=8'),
+            self.create_vk_post(1, '0+5=5'),
+        ]
+        broken_items = [self.create_vk_post('a', '5+3=8'), items[1]]
+        with patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 1), \
+                patch('app.services.vk_api_service.get_wall_posts') as get_wall_posts, \
+                patch('ws.ws_service.main_group_send'):
+            get_wall_posts.side_effect = [
+                {'count': len(items), 'items': items[:1]},
+                {'count': len(items), 'items': items[1:]},
+                {'count': len(items), 'items': items[:1]},
+                {'count': len(items), 'items': broken_items}
+            ]
+            with self.assertRaises(ValueError):
+                sync_service.sync_posts()
+
+            self.assertEqual(list(Post.objects.values_list('id', flat=True)), [1])
+
+            get_wall_posts.side_effect = [
+                {'count': len(items), 'items': items[:1]},
+                {'count': len(items), 'items': items}
+            ]
+            sync_service.sync_posts()
+
+            self.assertEqual(get_wall_posts.call_args_list[-1][0], (0, 1))
+            self.assertEqual(Post.objects.get(id=2).sum_distance, 8)
+
+    def test_sync_posts_exclusively(self):
+        """Test that sync isn't run if it is already running"""
+        with patch('app.services.sync_service.sync_posts') as sync_posts:
+            self.assertTrue(sync_service.sync_posts_exclusively())
+            self.assertEqual(sync_posts.call_count, 1)
+
+            with sync_service.sync_lock.hold():
+                self.assertFalse(sync_service.sync_posts_exclusively())
+            self.assertEqual(sync_posts.call_count, 1)
+            self.assertFalse(sync_service.sync_lock.is_locked())
+
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    def test_sync_posts_lock_lost(self):
+        """Test that sync stops before writing of a block if its lock is lost"""
+        items = [self.create_vk_post(1, '0+5=5')]
+        with patch('app.services.vk_api_service.get_wall_posts', return_value={'count': 1, 'items': items}), \
+                patch.object(sync_service.sync_lock, 'lost', True):
+            with self.assertRaises(RuntimeError):
+                sync_service.sync_posts()
+
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_sync_posts_exclusively_async(self):
+        """Test that the async pipeline is run if it is enabled"""
+        with patch('app.services.sync_service.ASYNC_SYNC', True), \
+                patch('app.services.async_sync_service.sync_posts_async', new_callable=AsyncMock) as sync_posts_async:
+            self.assertTrue(sync_service.sync_posts_exclusively())
+            self.assertEqual(sync_posts_async.await_count, 1)
+
+    @patch('app.services.sync_service.PREFETCH_SYNC', True)
+    @patch('app.services.sync_service.BACKFILL_POST_COUNT', 200)
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('app.services.vk_api_service.rate_limiter')
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_posts_prefetch(self, mgs, rl):
+        """Test that blocks are downloaded by the prefetcher and every block is downloaded once"""
+        fake_vk = FakeVk(create_vk_posts(450))
+        with patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method):
+            sync_service.sync_posts()
+
+        self.assertEqual(Post.objects.count(), 450)
+        self.assertEqual(Post.objects.filter(status=Post.Status.SUCCESS).count(), 450)
+        # Probe, 2 backfill blocks and the last block
+        wall_requests = [method for method in fake_vk.requests if method != 'users.get']
+        self.assertEqual(wall_requests, ['wall.get', 'execute', 'execute', 'wall.get'])
+
+    @patch('app.services.comment_service.add_comments')
+    @patch('ws.ws_service.main_group_send')
+    def test_replay_journal_offline(self, mgs, ac):
+        """Test that replay doesn't request VK for authors absent in the journal and doesn't notify"""
+        record = sync_journal.JournalRecord(0, 2, {'count': 2, 'items': [
+            create_vk_post(2, 100, '0+5=5', 1600000100),
+            create_vk_post(1, self.profile.id, 'text', 1600000000)
+        ]}, {})
+        with tempfile.TemporaryDirectory() as dir_name, \
+                patch('app.services.vk_api_service.get_users') as get_users:
+            path = os.path.join(dir_name, 'journal.jsonl.gz')
+            sync_journal.append(record, path)
+            self.assertEqual(sync_service.replay_journal(path), 1)
+
+            self.assertEqual(get_users.call_count, 0)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Profile.objects.get(id=100).first_name, 'Unknown')
+        self.assertFalse(any(c.args[0] for c in ac.call_args_list))
+        self.assertEqual([c.args[1] for c in mgs.call_args_list], [ObjectType.LAST_SYNC_DATE, ObjectType.STAT])
+
+    @patch('ws.ws_service.main_group_send')
+    def test_replay_journal_deleted_posts_start_date(self, mgs):
+        """Test that posts are checked for deletion since the date of the sync, not since the date of replay"""
+        now = timezone.now()
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=2, date=now - timedelta(days=20))
+        vk_post = self.create_vk_post(1, 'text', round((now - timedelta(days=30)).timestamp()))
+        response = {'count': 1, 'items': [vk_post]}
+        records = [
+            # Records of old journals don't have the date, posts of last days are checked
+            sync_journal.JournalRecord(0, 1, response, {}),
+            sync_journal.JournalRecord(0, 1, response, {}, now - timedelta(days=25))
+        ]
+        with tempfile.TemporaryDirectory() as dir_name:
+            path = os.path.join(dir_name, 'journal.jsonl.gz')
+            sync_journal.append(records[0], path)
+            self.assertEqual(sync_service.replay_journal(path), 1)
+            self.assertTrue(Post.objects.filter(id=2).exists())
+
+            sync_journal.append(records[1], path)
+            self.assertEqual(sync_service.replay_journal(path), 2)
+            self.assertFalse(Post.objects.filter(id=2).exists())
+
+    @patch('app.services.sync_service.PREFETCH_SYNC', True)
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 1)
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_posts_prefetch_missed(self, mgs):
+        """Test that sync continues without prefetched block if it isn't predicted"""
+        items = [
+            self.create_vk_post(3, '5+3=8'),
+            self.create_vk_post(2, '0+5=5'),
+            self.create_vk_post(1, 'text')
+        ]
+
+        def get_wall_posts(offset, count):
+            # Posts 1 and 2 are got in the first block, so the prefetched second block is missed
+            if offset == 2:
+                return {'count': len(items), 'items': items[1:]}
+            return {'count': len(items), 'items': items[offset:offset + count]}
+
+        with patch('app.services.vk_api_service.get_wall_posts', side_effect=get_wall_posts):
+            sync_service.sync_posts()
+
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Post.objects.get(id=3).sum_distance, 8)
+
+    def test_block_prefetcher_error(self):
+        """Test that errors of downloading are raised in the writing thread"""
+        with patch('app.services.vk_api_service.get_wall_posts') as get_wall_posts:
+            get_wall_posts.side_effect = RuntimeError('Ooops!')
+            prefetcher = sync_service.BlockPrefetcher(10, 0)
+            with self.assertRaises(RuntimeError):
+                prefetcher.get(0, 100)
+            prefetcher.stop()
+
     def test_sync_posts_many_blocks(self):
         sync_service.DOWNLOAD_POST_COUNT = 1
         items = [
@@ -60,6 +218,24 @@ class SyncServiceTests(TestCase):
             sync_service.sync_posts()
             self.assertEqual(gi.call_count, 2)
 
+    @patch('app.services.vk_api_service.rate_limiter')
+    @patch('ws.ws_service.main_group_send')
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('app.services.sync_service.BACKFILL_POST_COUNT', 300)
+    def test_sync_posts_backfill(self, mgs, rl):
+        """Test that many posts are downloaded with execute requests"""
+        fake_vk = FakeVk(create_vk_posts(650))
+        with patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method):
+            sync_service.sync_posts()
+
+        self.assertEqual(fake_vk.requests.count('execute'), 2)
+        self.assertEqual(rl.acquire.call_count, len(fake_vk.requests))
+        self.assertEqual(Post.objects.count(), 650)
+        self.assertEqual(Post.objects.filter(status=Post.Status.SUCCESS).count(), 650)
+        last_post = Post.objects.order_by('-date').first()
+        self.assertEqual(last_post.number, 650)
+        self.assertEqual(last_post.sum_distance, message_parser.parse(fake_vk.posts[0]['text']).end_sum_number)
+
     def test_sync_posts_error_post_number(self):
         """Test that number of post in DB > number of post in VK"""
         self.create_post(Post.Status.ERROR_PARSE, 'text',
@@ -71,16 +247,13 @@ class SyncServiceTests(TestCase):
 
     @patch('app.services.vk_api_service.get_wall_posts')
     @patch('app.services.stat_service.update_stat')
-    @patch('time.sleep')
-    def test_sync_posts_need_sync(self, ts, us, gwp):
+    def test_sync_posts_need_sync(self, us, gwp):
         """Test that _sync_block_posts calls 2 times"""
         gwp.return_value = {'count': 1}
-        ts.return_value = True
         with patch('app.services.sync_service._sync_block_posts') as sbp:
             sbp.side_effect = [0, 1]
             sync_service.sync_posts()
             self.assertEqual(gwp.call_count, 2)
-            self.assertEqual(ts.call_count, 1)
             self.assertEqual(us.call_count, 1)
             self.assertEqual(sbp.call_count, 2)
 
@@ -134,68 +307,121 @@ class SyncServiceTests(TestCase):
             self.assertEqual(apt.call_count, 0)
 
     def test_remove_deleted_posts(self):
-        result = sync_service._remove_deleted_posts([], [])
+        result = sync_service._remove_deleted_posts([], SyncWindow())
         self.assertEqual(result, [])
 
-        vk_posts = [{'id': 123}]
+        vk_posts = [{'id': 123, 'date': (timezone.now() - timedelta(days=1)).timestamp()}]
 
         post1 = self.create_post(Post.Status.SUCCESS, 'text', post_id=123)
         post2 = self.create_post(Post.Status.SUCCESS, 'text', post_id=124)
         post3 = self.create_post(Post.Status.SUCCESS, 'text', post_id=125,
                                  date=timezone.now() - timedelta(days=5, milliseconds=1))
 
-        posts = [post1, post2, post3]
-        result = sync_service._remove_deleted_posts(vk_posts, posts)
+        window = SyncWindow([post1, post2, post3])
+        result = sync_service._remove_deleted_posts(vk_posts, window)
 
         self.assertEqual(len(result), 1)
         self.assertEqual(result, [124])
-        self.assertEqual(len(posts), 2)
-        self.assertEqual(posts, [post1, post3])
+        self.assertEqual(len(window), 2)
+        self.assertEqual(list(window), [post1, post3])
+        self.assertFalse(Post.objects.filter(id=124).exists())
+
+    def test_remove_deleted_posts_window(self):
+        """Test that posts older than downloaded posts are not deleted and the look-back window is configurable"""
+        now = timezone.now()
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=1, date=now - timedelta(days=8))
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=2, date=now - timedelta(days=6))
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=3, date=now - timedelta(days=4))
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=4, date=now - timedelta(days=3))
+        vk_posts = [{'id': 4, 'date': (now - timedelta(days=3)).timestamp()},
+                    {'id': 2, 'date': (now - timedelta(days=6)).timestamp()}]
+
+        # Searching of recent posts, then deleting with collecting of status comments
+        # and recomputing of totals and days of the author in a savepoint, then updating of header counters
+        with self.settings(SYNC_DELETED_POSTS_DAYS=5), self.assertNumQueries(12):
+            self.assertEqual(sync_service._remove_deleted_posts(vk_posts, SyncWindow()), [3])
+
+        with self.settings(SYNC_DELETED_POSTS_DAYS=10):
+            self.assertEqual(sync_service._remove_deleted_posts(vk_posts[:1], SyncWindow()), [])
+            self.assertEqual(sync_service._remove_deleted_posts(vk_posts[1:], SyncWindow()), [4])
+
+        self.assertEqual(list(Post.objects.order_by('id').values_list('id', flat=True)), [1, 2])
+
+    def test_remove_deleted_posts_with_date_of_block(self):
+        """Test that posts with the date of the oldest downloaded post are not deleted"""
+        post = self.create_post(Post.Status.SUCCESS, 'text', post_id=1, timestamp=1600000000)
+        self.create_post(Post.Status.SUCCESS, 'text', post_id=2, timestamp=1600000000)
+        vk_posts = [create_vk_post(2, self.profile.id, 'text', 1600000000)]
+
+        with patch('django.utils.timezone.now', return_value=post.date):
+            self.assertEqual(sync_service._remove_deleted_posts(vk_posts, SyncWindow()), [])
 
     def test_find_profile(self):
         """Test that profile exists in DB"""
-        vk_post = {'from_id': self.profile.id}
-        db_profiles = list(Profile.objects.all())
-        result = sync_service._find_or_create_profile(vk_post, timezone.now(), db_profiles)
-        self.assertEqual(result, self.profile)
-
-    def test_create_profile(self):
-        """Test that profile will receive from vk and will save to DB"""
-        vk_post = {'from_id': 100}
-        db_profiles = []
-        post_date = timezone.now()
-        with patch('app.services.vk_api_service.get_user') as gi:
-            gi.return_value = {'id': 100, 'first_name': 'Ivan', 'last_name': 'Drago', 'sex': 2, 'photo_50': '50.jpg',
-                               'photo_100': '100.jpg'}
-
-            result = sync_service._find_or_create_profile(vk_post, post_date, db_profiles)
-            self.assertEqual(gi.call_count, 1)
-            self.assertEqual(gi.call_args.args[0], 100)
-            self.assertEqual(result.id, 100)
-            self.assertEqual(result.join_date, post_date)
-            self.assertEqual(result.first_name, 'Ivan')
-            self.assertEqual(result.last_name, 'Drago')
-            self.assertEqual(result.photo_50, '50.jpg')
-            self.assertEqual(result.photo_100, '100.jpg')
+        vk_posts = [{'id': 1, 'from_id': self.profile.id, 'date': 1}]
+        db_profiles = {self.profile.id: self.profile}
+        batch = SyncBatch()
+        with patch('app.services.vk_api_service.get_users') as gu:
+            sync_service._create_profiles(vk_posts, db_profiles, batch)
+            self.assertEqual(gu.call_count, 0)
+        self.assertEqual(db_profiles, {self.profile.id: self.profile})
+        self.assertEqual(batch.new_profiles, [])
+
+    def test_create_profiles(self):
+        """Test that profiles will receive from vk by one request and will save to DB"""
+        vk_posts = [
+            create_vk_post(1, 100, 'text', 1000),
+            create_vk_post(2, 101, 'text', 2000),
+            create_vk_post(3, 100, 'text', 3000),
+            create_vk_post(4, 102, 'text', 4000)
+        ]
+        db_profiles = {}
+        batch = SyncBatch()
+        with patch('app.services.vk_api_service.get_users') as gu:
+            gu.return_value = [
+                {'id': 100, 'first_name': 'Ivan', 'last_name': 'Drago', 'sex': 2, 'photo_50': '50.jpg',
+                 'photo_100': '100.jpg'},
+                {'id': 101, 'first_name': 'Rocky', 'last_name': 'Balboa', 'sex': 2, 'photo_50': '',
+                 'photo_100': ''}
+            ]
+
+            sync_service._create_profiles(vk_posts, db_profiles, batch)
+            self.assertEqual(gu.call_count, 1)
+            self.assertEqual(gu.call_args.args[0], [100, 101, 102])
+
+        self.assertEqual(list(db_profiles.keys()), [100, 101, 102])
+        self.assertEqual(batch.new_profiles, list(db_profiles.values()))
+
+        result = db_profiles[100]
+        self.assertEqual(result.id, 100)
+        self.assertEqual(result.join_date, sync_service._get_post_date(vk_posts[0]))
+        self.assertEqual(result.first_name, 'Ivan')
+        self.assertEqual(result.last_name, 'Drago')
+        self.assertEqual(result.photo_50, '50.jpg')
+        self.assertEqual(result.photo_100, '100.jpg')
+
+        self.assertEqual(db_profiles[101].first_name, 'Rocky')
+        self.assertEqual(db_profiles[102].first_name, 'Unknown')
 
     def test_create_group(self):
         """Test that group will receive and save to DB"""
-        vk_post = {'from_id': -100}
-        db_profiles = []
-        post_date = timezone.now()
-        with patch('app.services.vk_api_service.get_group') as gi:
-            gi.return_value = {'name': 'Wild Race', 'photo_50': '50.jpg', 'photo_100': '100.jpg',
-                               'photo_200': '200.jpg'}
-
-            result = sync_service._find_or_create_profile(vk_post, post_date, db_profiles)
-            self.assertEqual(gi.call_count, 1)
-            self.assertEqual(gi.call_args.args[0], 100)
-            self.assertEqual(result.id, -100)
-            self.assertEqual(result.join_date, post_date)
-            self.assertEqual(result.first_name, 'Wild Race')
-            self.assertEqual(result.photo_50, '50.jpg')
-            self.assertEqual(result.photo_100, '100.jpg')
-            self.assertEqual(result.photo_200, '200.jpg')
+        vk_posts = [create_vk_post(1, -100, 'text', 1000)]
+        db_profiles = {}
+        with patch('app.services.vk_api_service.get_groups') as gg:
+            gg.return_value = [{'id': 100, 'name': 'Wild Race', 'photo_50': '50.jpg', 'photo_100': '100.jpg',
+                                'photo_200': '200.jpg'}]
+
+            sync_service._create_profiles(vk_posts, db_profiles, SyncBatch())
+            self.assertEqual(gg.call_count, 1)
+            self.assertEqual(gg.call_args.args[0], [100])
+
+        result = db_profiles[-100]
+        self.assertEqual(result.id, -100)
+        self.assertEqual(result.join_date, sync_service._get_post_date(vk_posts[0]))
+        self.assertEqual(result.first_name, 'Wild Race')
+        self.assertEqual(result.photo_50, '50.jpg')
+        self.assertEqual(result.photo_100, '100.jpg')
+        self.assertEqual(result.photo_200, '200.jpg')
 
     def analyze_post_text(self, text, new_post_number, new_sum_distance, status):
         text_hash = 'hash'
@@ -204,7 +430,7 @@ class SyncServiceTests(TestCase):
         post = Post(author=self.profile, date=timezone.now())
         with patch('app.services.sync_service._create_comment_text') as gi:
             sync_service._analyze_post_text(text, 'hash', last_sum_distance, last_post_number, post,
-                                            EventType.CREATE)
+                                            EventType.CREATE, SyncBatch())
             self.assertEqual(post.text, text)
             self.assertEqual(post.text_hash, text_hash)
             self.assertEqual(post.status, status)
@@ -243,6 +469,59 @@ class SyncServiceTests(TestCase):
             status=Post.Status.ERROR_PARSE
         )
 
+    @patch('app.services.comment_service.add_comments')
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_batch(self, mgs, ac):
+        """Test that batch writes posts and profiles at once, and then sends comments and events"""
+        batch = SyncBatch(bulk=True)
+        profile = Profile(id=100, join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+        batch.add_profile(profile)
+        changed_post = self.create_post(Post.Status.SUCCESS, '0+5=5', 1)
+        changed_post.status = Post.Status.ERROR_SUM
+        batch.add_post(changed_post, EventType.UPDATE, 'Changed')
+        for post_id in [1001, 1002]:
+            post = Post(id=post_id, author=profile, date=timezone.now(), status=Post.Status.SUCCESS, text='text')
+            batch.add_post(post, EventType.CREATE, f'Comment {post_id}')
+
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(ac.call_count, 0)
+        self.assertEqual(mgs.call_count, 0)
+
+        # Writing of profiles and posts, then recomputing of totals and days of authors in a savepoint
+        # and updating of header counters
+        with self.assertNumQueries(13):
+            batch.flush()
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Profile.objects.filter(id=100).count(), 1)
+        self.assertEqual(Post.objects.get(id=changed_post.id).status, Post.Status.ERROR_SUM)
+        self.assertEqual(ac.call_count, 1)
+        self.assertEqual(ac.call_args.args[0], [(changed_post.id, 'Changed'), (1001, 'Comment 1001'),
+                                                (1002, 'Comment 1002')])
+        self.assertEqual(mgs.call_count, 3)
+        self.assertEqual(batch.new_posts, [])
+
+    @patch('app.services.comment_service.add_comments')
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_batch_not_bulk(self, mgs, ac):
+        """Test that not bulk batch writes every post at once"""
+        batch = SyncBatch(bulk=False)
+        post = Post(id=1, author=self.profile, date=timezone.now(), status=Post.Status.SUCCESS, text='text')
+        batch.add_post(post, EventType.CREATE, 'Comment')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(ac.call_count, 1)
+        self.assertEqual(mgs.call_count, 1)
+
+    @patch('app.services.comment_service.add_comments')
+    @patch('ws.ws_service.main_group_send')
+    def test_sync_batch_silent(self, mgs, ac):
+        """Test that silent batch writes posts without comments and events"""
+        batch = SyncBatch(bulk=False, silent=True)
+        post = Post(id=1, author=self.profile, date=timezone.now(), status=Post.Status.SUCCESS, text='text')
+        batch.add_post(post, EventType.CREATE, 'Comment')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(ac.call_args.args[0], [])
+        self.assertEqual(mgs.call_count, 0)
+
     def test_create_comment_text(self):
         """Test that comment text is correct"""
         self.assertEqual(
@@ -266,22 +545,6 @@ class SyncServiceTests(TestCase):
             '@id347 (Иван), #22 пробежка: Ошибка: Не предусмотренный статус, напишите администратору'
         )
 
-    def test_not_add_status_comment(self):
-        """Test that status comment don't leave"""
-        with patch('app.services.vk_api_service.add_comment_to_post') as gi:
-            sync_service._add_status_comment(1, 'Status comment')
-            self.assertEqual(gi.call_count, 0)
-
-    def test_add_status_comment(self):
-        """Test that status comment leave"""
-        config = Config.objects.get()
-        config.commenting = True
-        config.save()
-
-        with patch('app.services.vk_api_service.add_comment_to_post') as gi:
-            sync_service._add_status_comment(1, 'Status comment')
-            self.assertEqual(gi.call_count, 1)
-
     def test_update_next_posts_transactional(self):
         """Test that update_next_post runs in transaction"""
         updated_post = self.create_post(Post.Status.SUCCESS, '0+5=5', 1)
@@ -318,6 +581,88 @@ class SyncServiceTests(TestCase):
         self.assertEqual(changed_post_new.number, 2)
         self.assertEqual(changed_post_new.sum_distance, 16)
 
+    def test_update_next_posts_batched(self):
+        """Test that changed next posts are written with one statement and sent with one event"""
+        self.create_post(Post.Status.SUCCESS, '0+10=10', 1)
+        updated_post = self.create_post(Post.Status.SUCCESS, '10+5=15', 2)
+        for number in range(3, 13):
+            self.create_post(Post.Status.SUCCESS, f'{number * 5}+5={number * 5 + 5}', number)
+
+        updated_post.sum_distance = 20
+        # Savepoint, loading of columns, loading of changed posts, update, recomputing of totals and days
+        # of the author in a savepoint, updating of header counters, releasing of savepoint
+        with patch('app.services.comment_service.add_comments') as add_comments, \
+                patch('ws.ws_service.main_group_send') as main_group_send, \
+                self.assertNumQueries(15):
+            sync_service.update_next_posts(updated_post)
+
+        self.assertEqual(len(add_comments.call_args[0][0]), 10)
+        self.assertEqual(main_group_send.call_count, 1)
+        self.assertEqual(main_group_send.call_args[0][2], EventType.UPDATE_LIST)
+        self.assertEqual([p['sum_distance'] for p in main_group_send.call_args[0][0]], list(range(25, 75, 5)))
+        self.assertEqual(Post.objects.filter(status=Post.Status.ERROR_START_SUM).count(), 10)
+
+    @patch('ws.ws_service.main_group_send')
+    def test_update_next_posts_parse_cache(self, mgs):
+        """Test that unchanged texts aren't parsed again by recomputing of next posts"""
+        self.create_post(Post.Status.SUCCESS, '0+10=10', 1)
+        updated_post = self.create_post(Post.Status.SUCCESS, '10+5=15', 2)
+        for number in range(3, 8):
+            self.create_post(Post.Status.SUCCESS, f'{number * 5}+5={number * 5 + 5}', number)
+
+        sync_service.update_next_posts(updated_post)
+        updated_post.sum_distance = 20
+        with patch('app.services.message_parser.parse') as parse:
+            sync_service.update_next_posts(updated_post)
+            self.assertEqual(parse.call_count, 0)
+
+        self.assertEqual(Post.objects.filter(status=Post.Status.ERROR_START_SUM).count(), 5)
+
+    @patch('ws.ws_service.main_group_send')
+    def test_revalidate_runnings(self, mgs):
+        """Test that runnings of the whole history are recomputed and only changed posts are written"""
+        self.create_post(Post.Status.SUCCESS, '0+10=10', 1)
+        broken_post = self.create_post(Post.Status.SUCCESS, '10+5=15', 2)
+        for number in range(3, 8):
+            self.create_post(Post.Status.SUCCESS, f'{number * 5}+5={number * 5 + 5}', number)
+        self.create_post(Post.Status.SUCCESS, 'text', 8)
+        Post.objects.filter(id=broken_post.id).update(distance=7, sum_distance=17)
+        Post.objects.filter(number=5).update(text='99+5=104')
+        posts = list(Post.objects.order_by('date').values_list('number', 'sum_distance', 'status'))
+
+        self.assertEqual(sync_service.revalidate_runnings(dry_run=True), 3)
+        self.assertEqual(list(Post.objects.order_by('date').values_list('number', 'sum_distance', 'status')), posts)
+
+        with patch('app.services.comment_service.add_comments') as add_comments:
+            self.assertEqual(sync_service.revalidate_runnings(), 3)
+            self.assertEqual(add_comments.call_count, 0)
+
+        self.assertEqual(Post.objects.get(id=broken_post.id).distance, 5)
+        self.assertEqual(list(Post.objects.order_by('date').values_list('number', 'sum_distance', 'status')), [
+            (1, 10, Post.Status.SUCCESS), (2, 15, Post.Status.SUCCESS), (3, 20, Post.Status.SUCCESS),
+            (4, 25, Post.Status.SUCCESS), (5, 30, Post.Status.ERROR_START_SUM), (6, 35, Post.Status.SUCCESS),
+            (7, 40, Post.Status.SUCCESS), (None, None, Post.Status.ERROR_PARSE)
+        ])
+        self.assertEqual(sync_service.revalidate_runnings(), 0)
+
+    @patch('ws.ws_service.main_group_send')
+    def test_revalidate_runnings_hand_edited(self, mgs):
+        """Test that posts edited in admin are kept and next runnings are recomputed from them"""
+        self.create_post(Post.Status.SUCCESS, '0+10=10', 1)
+        edited_post = self.create_post(Post.Status.SUCCESS, '10+5=15', 2)
+        self.create_post(Post.Status.SUCCESS, '20+5=25', 3)
+        Post.objects.filter(id=edited_post.id).update(distance=10, sum_distance=20, status=Post.Status.SUCCESS,
+                                                      last_update=timezone.now())
+        Post.objects.filter(number=3).update(number=5, sum_distance=0)
+        edited_fields = ['number', 'distance', 'sum_distance', 'status', 'last_update']
+        edited = Post.objects.filter(id=edited_post.id).values_list(*edited_fields).get()
+
+        self.assertEqual(sync_service.revalidate_runnings(), 1)
+        self.assertEqual(Post.objects.filter(id=edited_post.id).values_list(*edited_fields).get(), edited)
+        self.assertEqual(list(Post.objects.order_by('date').values_list('number', 'sum_distance', 'status')), [
+            (1, 10, Post.Status.SUCCESS), (2, 20, Post.Status.SUCCESS), (3, 25, Post.Status.SUCCESS)
+        ])
+
     def test_update_next_posts_2(self):
         """Test that next posts will be updated"""
         self.create_post(Post.Status.SUCCESS, '0+10=10', 1)
@@ -339,3 +684,63 @@ class SyncServiceTests(TestCase):
         changed_post2_new = Post.objects.get(id=changed_post2.id)
         self.assertEqual(changed_post2_new.status, Post.Status.ERROR_START_SUM)
         self.assertEqual(changed_post2_new.sum_distance, 59)
+
+
+class SyncJournalingTests(TransactionTestCase):
+    """Blocks are journaled after commit, so tests need real transactions"""
+    serialized_rollback = True
+
+    def setUp(self):
+        self.config = create_config()
+        self.profile = Profile.objects.create(join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+
+    @patch('app.services.sync_service.BACKFILL_POST_COUNT', 200)
+    @patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 100)
+    @patch('app.services.vk_api_service.rate_limiter')
+    @patch('ws.ws_service.main_group_send')
+    def test_replay_journal(self, mgs, rl):
+        """Test that posts are written from the journal of sync without requests to VK"""
+        fake_vk = FakeVk(create_vk_posts(450, profile_count=20))
+        fields = ['id', 'author_id', 'text', 'number', 'distance', 'sum_distance', 'status']
+        with tempfile.TemporaryDirectory() as dir_name, \
+                patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method):
+            path = os.path.join(dir_name, 'journal.jsonl.gz')
+            with self.settings(SYNC_JOURNAL_PATH=path):
+                sync_service.sync_posts()
+                posts = list(Post.objects.order_by('id').values_list(*fields))
+                profiles = list(Profile.objects.order_by('id').values_list('id', 'first_name'))
+
+                Post.objects.all().delete()
+                Profile.objects.exclude(id=self.profile.id).delete()
+                fake_vk.requests.clear()
+                mgs.reset_mock()
+                self.assertEqual(sync_service.replay_journal(path), 3)
+
+            self.assertEqual(len(list(sync_journal.read(path))), 3)
+
+        self.assertEqual(fake_vk.requests, [])
+        self.assertEqual(list(Post.objects.order_by('id').values_list(*fields)), posts)
+        self.assertEqual(list(Profile.objects.order_by('id').values_list('id', 'first_name')), profiles)
+        # Only the stat is sent after replay
+        self.assertEqual([c.args[1] for c in mgs.call_args_list], [ObjectType.LAST_SYNC_DATE, ObjectType.STAT])
+
+    @patch('ws.ws_service.main_group_send')
+    def test_journal_after_commit(self, mgs):
+        """Test that the block isn't journaled if the transaction is rolled back"""
+        response = {'count': 1, 'items': [create_vk_post(1, self.profile.id, 'text')]}
+        with tempfile.TemporaryDirectory() as dir_name:
+            path = os.path.join(dir_name, 'journal.jsonl.gz')
+            with self.settings(SYNC_JOURNAL_PATH=path):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    sync_service._apply_block_posts(response, 1, 0)
+                    raise RuntimeError('Sync lock is lost')
+                self.assertFalse(os.path.exists(path))
+
+                before_date = timezone.now() - timedelta(days=settings.SYNC_DELETED_POSTS_DAYS)
+                self.assertEqual(sync_service._apply_block_posts(response, 1, 0), 1)
+
+            records = list(sync_journal.read(path))
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].response, response)
+        self.assertAlmostEqual(records[0].deleted_posts_start_date, before_date, delta=timedelta(seconds=1))
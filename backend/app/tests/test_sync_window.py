@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models import Post, Profile
+from app.services.sync_window import SyncWindow
+
+
+class SyncWindowTests(TestCase):
+
+    def setUp(self):
+        self.profile = Profile(id=1, join_date=timezone.now(), first_name='Ivan', sex=Profile.Sex.MALE)
+        self.now = timezone.now()
+
+    def create_post(self, post_id, minutes, number=None):
+        return Post(id=post_id, author=self.profile, status=Post.Status.SUCCESS, number=number,
+                    date=self.now + timedelta(minutes=minutes))
+
+    def test_get(self):
+        post = self.create_post(1, 0, 1)
+        window = SyncWindow([post])
+        self.assertEqual(window.get(1), post)
+        self.assertIsNone(window.get(2))
+        self.assertIn(1, window)
+        self.assertNotIn(2, window)
+
+    def test_get_last_running(self):
+        posts = [
+            self.create_post(4, 30, 3),
+            self.create_post(3, 20),
+            self.create_post(2, 10, 2),
+            self.create_post(1, 0, 1)
+        ]
+        window = SyncWindow(posts)
+
+        self.assertEqual(window.get_last_running(5, self.now + timedelta(minutes=40)), posts[0])
+        self.assertEqual(window.get_last_running(5, self.now + timedelta(minutes=25)), posts[2])
+        self.assertEqual(window.get_last_running(4, posts[0].date), posts[2])
+        self.assertEqual(window.get_last_running(2, posts[2].date), posts[3])
+        self.assertIsNone(window.get_last_running(1, posts[3].date))
+        self.assertIsNone(window.get_last_running(5, self.now - timedelta(minutes=1)))
+
+    def test_get_last_running_with_equal_dates(self):
+        """Test that the first post from the source is found if dates are equal"""
+        posts = [self.create_post(2, 0, 2), self.create_post(1, 0, 1)]
+        window = SyncWindow(posts)
+        self.assertEqual(window.get_last_running(3, self.now), posts[0])
+
+        new_post = self.create_post(3, 0, 3)
+        window.put(new_post)
+        self.assertEqual(window.get_last_running(4, self.now), posts[0])
+
+    def test_put(self):
+        window = SyncWindow([self.create_post(1, 0, 1)])
+        new_post = self.create_post(2, 10, 2)
+        window.put(new_post)
+        self.assertEqual(len(window), 2)
+        self.assertEqual(window.get_last_running(3, self.now + timedelta(minutes=20)), new_post)
+
+        """Test that post is reindexed after changing number"""
+        new_post.number = None
+        window.put(new_post)
+        self.assertEqual(len(window), 2)
+        self.assertEqual(window.get_last_running(3, self.now + timedelta(minutes=20)).id, 1)
+
+        new_post.number = 2
+        window.put(new_post)
+        self.assertEqual(window.get_last_running(3, self.now + timedelta(minutes=20)), new_post)
+
+    def test_remove(self):
+        posts = [self.create_post(2, 10, 2), self.create_post(1, 0, 1)]
+        window = SyncWindow(posts)
+        window.remove(posts[0])
+        self.assertEqual(len(window), 1)
+        self.assertIsNone(window.get(2))
+        self.assertEqual(window.get_last_running(3, self.now + timedelta(minutes=20)), posts[1])
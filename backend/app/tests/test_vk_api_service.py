@@ -4,12 +4,13 @@ from django.test import TestCase
 
 from app.services import vk_api_service
 from app.tests import create_config
+from app.tests.fake_vk import FakeVk, create_vk_posts
 
 
 class VkApiTests(TestCase):
 
     def setUp(self):
-        create_config()
+        self.config = create_config()
 
     def test_authorize_url(self):
         """Test authorize url"""
@@ -31,6 +32,55 @@ class VkApiTests(TestCase):
         self.assertIn('count', result)
         self.assertIn('items', result)
 
+    @patch('app.services.vk_api_service.rate_limiter')
+    def test_requests_are_rate_limited(self, rl):
+        """Test that every request waits for the rate limiter"""
+        with patch('vk_api.vk_api.VkApi.method') as m:
+            m.return_value = {'post_id': 1}
+            vk_api_service.create_post('Post')
+            vk_api_service.add_comment_to_post(1, 'Comment')
+            self.assertEqual(rl.acquire.call_count, 2)
+
+    @patch('app.services.vk_api_service.rate_limiter')
+    def test_vk_session_is_reused(self, rl):
+        """Test that VK session is shared between requests and rebuilt after changing of access token"""
+        vk_session = vk_api_service._get_vk_session()
+        self.assertIs(vk_api_service._get_vk_session(), vk_session)
+
+        self.config.comment_access_token = 'new_token'
+        self.config.save()
+        new_vk_session = vk_api_service._get_vk_session()
+        self.assertIsNot(new_vk_session, vk_session)
+        self.assertEqual(new_vk_session.token['access_token'], 'new_token')
+
+    @patch('app.services.vk_api_service.rate_limiter')
+    def test_latency_metrics(self, rl):
+        """Test that durations of requests are recorded by method"""
+        vk_api_service.latency_metrics.reset()
+        with patch('vk_api.vk_api.VkApi.method') as m:
+            m.return_value = {'post_id': 1}
+            vk_api_service.create_post('Post')
+            vk_api_service.create_post('Post')
+            vk_api_service.add_comment_to_post(1, 'Comment')
+
+        stats = vk_api_service.latency_metrics.get_stats()
+        self.assertEqual(stats['wall.post']['count'], 2)
+        self.assertEqual(stats['wall.createComment']['count'], 1)
+
+    def test_get_wall_posts_by_execute(self):
+        """Test that execute returns posts of some wall.get requests"""
+        fake_vk = FakeVk(create_vk_posts(450))
+        with patch('vk_api.vk_api.VkApi.method', side_effect=fake_vk.method):
+            result = vk_api_service.get_wall_posts_by_execute(30, 350)
+
+        self.assertEqual(fake_vk.requests, ['execute'])
+        self.assertEqual(result['count'], 450)
+        self.assertEqual(result['items'], fake_vk.posts[30:380])
+
+    def test_get_wall_posts_by_execute_max_count(self):
+        with self.assertRaises(ValueError):
+            vk_api_service.get_wall_posts_by_execute(0, 2501)
+
     def test_get_user(self):
         """Test that users.get return a value"""
         user_id = 354515836
@@ -41,6 +91,29 @@ class VkApiTests(TestCase):
         self.assertIn('photo_50', result)
         self.assertIn('photo_100', result)
 
+    @patch('app.services.vk_api_service.rate_limiter')
+    def test_get_users_by_chunks(self, rl):
+        """Test that users.get is requested once per chunk"""
+        with patch('vk_api.vk_api.VkApi.method') as m:
+            m.side_effect = lambda method, values, raw: [{'id': int(it)} for it in values['user_ids'].split(',')]
+            result = vk_api_service.get_users(range(vk_api_service.USERS_GET_MAX_COUNT + 1))
+
+            self.assertEqual(m.call_count, 2)
+            self.assertEqual(rl.acquire.call_count, 2)
+            self.assertEqual(len(result), vk_api_service.USERS_GET_MAX_COUNT + 1)
+            self.assertEqual(m.call_args.args[0], 'users.get')
+
+    def test_get_groups(self):
+        """Test that groups.getById is requested once for some groups"""
+        with patch('vk_api.vk_api.VkApi.method') as m:
+            m.return_value = [{'id': 1}, {'id': 2}]
+            result = vk_api_service.get_groups([1, 2])
+
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(m.call_args.args[0], 'groups.getById')
+            self.assertEqual(m.call_args.args[1]['group_ids'], '1,2')
+            self.assertEqual(result, [{'id': 1}, {'id': 2}])
+
     def test_get_group(self):
         """Test that groups.get return a value"""
         group_id = 88923650
@@ -0,0 +1,191 @@
+import json
+import os
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from app.models import Post, Profile, TempData
+from app.services import sync_service
+from app.tests import create_config
+from app.tests.fake_vk import FakeVk, create_vk_posts
+
+CALLBACK_URL = reverse('vk-callback')
+
+CALLBACK_SECRET = 'secret'
+
+EVENTS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'vk_callback_events.json')
+
+
+@override_settings(VK_CALLBACK_SECRET=CALLBACK_SECRET, VK_CALLBACK_CONFIRMATION_CODE='a1b2c3')
+@patch('ws.ws_service.main_group_send')
+class VkCallbackTests(TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+        self.config.sync_posts = True
+        self.config.save()
+        self.client = APIClient()
+        self.fake_vk = FakeVk()
+
+    def send_event(self, event_type, obj, group_id=None, secret=CALLBACK_SECRET):
+        event = {'type': event_type, 'object': obj, 'group_id': group_id or self.config.group_id, 'secret': secret}
+        return self.send(event)
+
+    def send(self, event):
+        with patch('vk_api.vk_api.VkApi.method', side_effect=self.fake_vk.method):
+            return self.client.post(CALLBACK_URL, json.dumps(event), content_type='application/json')
+
+    def replay(self, events):
+        for event in events:
+            res = self.send({**event, 'group_id': self.config.group_id, 'secret': CALLBACK_SECRET})
+            self.assertEqual(res.content, b'ok')
+
+    def publish(self, vk_post):
+        """Publishing the post on the wall and sending its event, like VK does"""
+        self.fake_vk.publish_post(vk_post)
+        self.replay(self.fake_vk.callback_events[-1:])
+
+    def get_runnings(self):
+        return list(Post.objects.order_by('date').values_list('id', 'number', 'distance', 'sum_distance', 'status'))
+
+    def test_confirmation(self, mgs):
+        res = self.send_event('confirmation', None)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, b'a1b2c3')
+
+    def test_invalid_event(self, mgs):
+        self.assertEqual(self.send_event('confirmation', None, secret='wrong').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.send_event('confirmation', None, group_id=1).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.post(CALLBACK_URL, '{', content_type='application/json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(CALLBACK_URL).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        with self.settings(VK_CALLBACK_SECRET=None):
+            self.assertEqual(self.send_event('confirmation', None, secret='').status_code,
+                             status.HTTP_403_FORBIDDEN)
+
+    def test_new_post(self, mgs):
+        vk_posts = create_vk_posts(3)
+        for vk_post in reversed(vk_posts):
+            self.publish(vk_post)
+
+        self.assertEqual(self.get_runnings(), [(1, 1, 2, 2, Post.Status.SUCCESS), (2, 2, 3, 5, Post.Status.SUCCESS),
+                                               (3, 3, 4, 9, Post.Status.SUCCESS)])
+        self.assertEqual(Profile.objects.get(id=2).first_name, 'User 2')
+        # Number of posts on the wall is checked before writing of every new post
+        self.assertEqual(self.fake_vk.requests, ['wall.get', 'users.get'] * 3)
+
+    def test_new_post_db_is_behind(self, mgs):
+        """Test that new post isn't written if DB hasn't all posts of the wall, so sync offsets aren't shifted"""
+        vk_posts = create_vk_posts(4)
+        self.fake_vk.posts = vk_posts[1:]
+        with patch('app.services.sync_service.DOWNLOAD_POST_COUNT', 1), \
+                patch('vk_api.vk_api.VkApi.method', side_effect=self.fake_vk.method):
+            sync_service._sync_block_posts(3, 1)
+        TempData.objects.update(next_sync_date=None)
+
+        self.publish(vk_posts[0])
+        self.assertEqual(list(Post.objects.values_list('id', flat=True)), [1])
+        self.assertIsNotNone(TempData.objects.get().next_sync_date)
+
+        with patch('vk_api.vk_api.VkApi.method', side_effect=self.fake_vk.method):
+            sync_service.sync_posts()
+        self.assertEqual(self.get_runnings(), [(1, 1, 2, 2, Post.Status.SUCCESS), (2, 2, 3, 5, Post.Status.SUCCESS),
+                                               (3, 3, 4, 9, Post.Status.SUCCESS), (4, 4, 5, 14, Post.Status.SUCCESS)])
+
+    def test_malformed_event(self, mgs):
+        """Test that event without post is confirmed, so VK doesn't send it again"""
+        for obj in [None, {}, {'id': 1}, 'post']:
+            res = self.send_event('wall_post_new', obj)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, b'ok')
+
+        self.assertEqual(self.send_event('wall_post_delete', {}).content, b'ok')
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_post_in_the_middle(self, mgs):
+        """Test that runnings after the post which is published with earlier date are recomputed"""
+        vk_posts = create_vk_posts(3)
+        self.publish(vk_posts[2])
+        self.publish(vk_posts[0])
+        self.assertEqual(Post.objects.get(id=3).status, Post.Status.ERROR_START_SUM)
+
+        self.publish(vk_posts[1])
+        self.assertEqual(self.get_runnings(), [(1, 1, 2, 2, Post.Status.SUCCESS), (2, 2, 3, 5, Post.Status.SUCCESS),
+                                               (3, 3, 4, 9, Post.Status.SUCCESS)])
+
+    def test_edited_and_deleted_post(self, mgs):
+        for vk_post in reversed(create_vk_posts(3)):
+            self.publish(vk_post)
+        self.fake_vk.edit_post(1, '0 + 3 = 3')
+        self.fake_vk.delete_post(2)
+
+        self.replay(self.fake_vk.callback_events[-2:])
+        self.assertEqual(self.get_runnings(), [(1, 1, 3, 3, Post.Status.SUCCESS),
+                                               (3, 2, 4, 7, Post.Status.ERROR_START_SUM)])
+
+        self.send_event('wall_post_delete', {'id': 2})
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_hand_modified_post(self, mgs):
+        vk_post = create_vk_posts(1)[0]
+        self.publish(vk_post)
+        Post.objects.filter(id=1).update(distance=5, sum_distance=5, last_update=timezone.now())
+
+        self.fake_vk.edit_post(1, '0 + 3 = 3')
+        self.replay(self.fake_vk.callback_events[-1:])
+        self.assertEqual(Post.objects.get(id=1).distance, 5)
+
+    def test_recorded_events(self, mgs):
+        """Test that recorded events give the same posts as sync of the resulting wall"""
+        with open(EVENTS_PATH) as f:
+            events = json.load(f)
+
+        # The wall is changed by every event before it is sent, suggested posts aren't on the wall
+        for event in events:
+            vk_post = event['object']
+            self.fake_vk.posts = [post for post in self.fake_vk.posts if post['id'] != vk_post['id']]
+            if event['type'] != 'wall_post_delete' and vk_post['post_type'] == 'post':
+                self.fake_vk.posts.insert(0, vk_post)
+                self.fake_vk.posts.sort(key=lambda post: post['id'], reverse=True)
+            self.replay([event])
+        runnings = self.get_runnings()
+        self.assertEqual(runnings, [(10, 1, 6, 6, Post.Status.SUCCESS), (13, 2, 1, 7, Post.Status.ERROR_START_SUM)])
+        self.assertEqual(Profile.objects.count(), 3)
+
+        wall = {}
+        for event in events:
+            wall[event['object']['id']] = event['object']
+        self.fake_vk.posts = [wall[13], wall[10]]
+        Post.objects.all().delete()
+        with patch('vk_api.vk_api.VkApi.method', side_effect=self.fake_vk.method):
+            sync_service.sync_posts()
+        self.assertEqual(self.get_runnings(), runnings)
+
+    def test_ignored_events(self, mgs):
+        vk_post = create_vk_posts(1)[0]
+        self.send_event('wall_post_new', {**vk_post, 'post_type': 'suggest'})
+        self.send_event('wall_reply_new', {**vk_post, 'post_id': 1})
+        self.assertEqual(Post.objects.count(), 0)
+
+        self.config.sync_posts = False
+        self.config.save()
+        res = self.send_event('wall_post_new', {**vk_post, 'post_type': 'post'})
+        self.assertEqual(res.content, b'ok')
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_sync_is_running(self, mgs):
+        """Test that the event isn't applied while sync is running, the next sync is requested instead"""
+        vk_post = create_vk_posts(1)[0]
+        TempData.objects.update(next_sync_date=None)
+        with patch('app.services.sync_service.sync_lock.acquire', return_value=False):
+            res = self.send_event('wall_post_new', {**vk_post, 'post_type': 'post'})
+
+        self.assertEqual(res.content, b'ok')
+        self.assertEqual(Post.objects.count(), 0)
+        self.assertIsNotNone(TempData.objects.get().next_sync_date)
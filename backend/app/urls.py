@@ -26,6 +26,7 @@ router.register('config', views.ConfigViewSet)
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('api/vk-callback/', views.vk_callback, name='vk-callback'),
     path('api/', include(router.urls)),
     path('api/auth/', include('rest_framework.urls')),
     path('admin/', admin.site.urls),
@@ -1,4 +1,9 @@
+import json
+
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,7 +12,8 @@ from app.forms import StatForm, PostForm
 from app.models import Post, Config
 from app.permissions import IsAdminUserOrReadOnly
 from app.serializers import PostSerializer, StatSerializer, ConfigSerializer
-from app.services import stat_service, index_page_service, sync_service
+from app.services import stat_service, index_page_service, sync_service, vk_callback_service, runner_totals_service, \
+    stat_cache
 from ws import ws_service
 from ws.ws_service import ObjectType, EventType
 
@@ -17,6 +23,21 @@ def index(request):
     return render(request, 'app/index.html', data)
 
 
+@csrf_exempt
+@require_POST
+def vk_callback(request):
+    """Receiving events of VK Callback API"""
+    try:
+        event = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    if not vk_callback_service.is_valid_event(event):
+        return HttpResponseForbidden()
+
+    return HttpResponse(vk_callback_service.handle_event(event), content_type='text/plain')
+
+
 class PostViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin,
                   viewsets.GenericViewSet):
     permission_classes = [IsAdminUserOrReadOnly]
@@ -24,7 +45,10 @@ class PostViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Updat
 
     @action(detail=False, methods=['put'])
     def sync(self, request):
-        sync_service.sync_posts()
+        if not sync_service.sync_posts_exclusively():
+            # Sync is already running, clients get its changes through websocket
+            return Response(status=status.HTTP_202_ACCEPTED)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
@@ -54,14 +78,16 @@ class PostViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.Updat
         super().perform_destroy(instance)
         ws_service.main_group_send(object_id, ObjectType.POST, EventType.REMOVE)
         instance.number = None
-        self._update_data(instance)
+        self._update_data(instance, post_count_delta=-1)
 
     def _update_next_posts(self):
         return self.request.query_params.get('update_next_posts') == 'true'
 
-    def _update_data(self, post: Post):
+    def _update_data(self, post: Post, post_count_delta: int = 0):
+        runner_totals_service.update_totals([(post.author_id, post.date)])
         if self._update_next_posts():
             sync_service.update_next_posts(post)
+        stat_service.update_counters(post_count_delta)
 
         stat_service.update_stat()
 
@@ -73,13 +99,12 @@ class StatViewSet(viewsets.GenericViewSet):
     def list(self, request):
         form = StatForm(request.query_params)
         if form.is_valid():
-            stat = stat_service.calc_stat(
+            stat_data = stat_cache.get_stat_data(
                 stat_type=form.stat_type,
                 start_range=form.cleaned_data['start_range'],
                 end_range=form.cleaned_data['end_range']
             )
-            serializer = self.get_serializer(stat)
-            return Response(serializer.data)
+            return Response(stat_data)
         else:
             return Response(form.errors)
 
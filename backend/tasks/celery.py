@@ -11,9 +11,14 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
+    # The task checks every minute whether the sync is due, the interval is adapted to the rate of new posts
     'sync-posts-task': {
         'task': 'tasks.tasks.sync_posts_task',
-        'schedule': crontab(minute='*/5')
+        'schedule': crontab(minute='*')
+    },
+    'deliver-comments-task': {
+        'task': 'tasks.tasks.deliver_comments_task',
+        'schedule': crontab(minute='*')
     },
     'publish-stat-task': {
         'task': 'tasks.tasks.publish_stat_task',
@@ -1,7 +1,6 @@
 import logging
 
-from app.models import Config
-from app.services import sync_service, stat_service, backup_service
+from app.services import singleton_cache, sync_scheduler, sync_service, stat_service, backup_service, comment_service
 from .celery import app
 
 logger = logging.getLogger(__name__)
@@ -11,23 +10,50 @@ logger = logging.getLogger(__name__)
 def sync_posts_task():
     logger.info('--- Sync posts task started ---')
 
-    if not Config.objects.get().sync_posts:
+    if not singleton_cache.get_config().sync_posts:
         msg = 'Sync posts task is disabled'
         logger.info(f'>> {msg}')
         return msg
 
-    sync_service.sync_posts()
+    if not sync_scheduler.is_sync_due():
+        msg = 'Sync posts task is skipped, sync is not due yet'
+        logger.info(f'>> {msg}')
+        return msg
+
+    try:
+        if not sync_scheduler.need_sync():
+            msg = 'Sync posts task is skipped, wall is not changed'
+            logger.info(f'>> {msg}')
+            return msg
+
+        if not sync_service.sync_posts_exclusively():
+            msg = 'Sync posts task is skipped, sync is already running'
+            logger.info(f'>> {msg}')
+            return msg
+    finally:
+        sync_scheduler.schedule_next_sync()
 
     msg = 'Sync posts task successfully finished'
     logger.info(f'--- {msg} ---')
     return msg
 
 
+@app.task
+def deliver_comments_task():
+    logger.info('--- Deliver comments task started ---')
+
+    delivered_count = comment_service.deliver_comments()
+
+    msg = f'Deliver comments task successfully finished, delivered: {delivered_count}'
+    logger.info(f'--- {msg} ---')
+    return msg
+
+
 @app.task
 def publish_stat_task():
     logger.info('--- Publish stat task started ---')
 
-    if not Config.objects.get().publish_stat:
+    if not singleton_cache.get_config().publish_stat:
         msg = 'Publish stat task is disabled'
         logger.info(f'>> {msg}')
         return msg
@@ -1,7 +1,10 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.test import TestCase
+from django.utils import timezone
 
+from app.models import TempData
 from app.tests import create_config
 from tasks import tasks
 
@@ -18,10 +21,47 @@ class TaskTests(TestCase):
     def test_sync_posts_task_is_worked(self):
         self.config.sync_posts = True
         self.config.save()
-        with patch('app.services.sync_service.sync_posts') as sp:
+        with patch('app.services.sync_service.sync_posts') as sp, \
+                patch('app.services.sync_scheduler.need_sync', return_value=True):
             res = tasks.sync_posts_task()
             self.assertEqual(sp.call_count, 1)
             self.assertEqual(res, 'Sync posts task successfully finished')
+        self.assertGreater(TempData.objects.get().next_sync_date, timezone.now())
+
+    def test_sync_posts_task_is_not_due(self):
+        self.config.sync_posts = True
+        self.config.save()
+        TempData.objects.update(next_sync_date=timezone.now() + timedelta(minutes=1))
+        with patch('app.services.sync_service.sync_posts') as sp:
+            res = tasks.sync_posts_task()
+            self.assertEqual(sp.call_count, 0)
+            self.assertEqual(res, 'Sync posts task is skipped, sync is not due yet')
+
+    def test_sync_posts_task_wall_is_not_changed(self):
+        self.config.sync_posts = True
+        self.config.save()
+        with patch('app.services.sync_service.sync_posts') as sp, \
+                patch('app.services.sync_scheduler.need_sync', return_value=False):
+            res = tasks.sync_posts_task()
+            self.assertEqual(sp.call_count, 0)
+            self.assertEqual(res, 'Sync posts task is skipped, wall is not changed')
+        self.assertIsNotNone(TempData.objects.get().next_sync_date)
+
+    def test_sync_posts_task_is_skipped(self):
+        self.config.sync_posts = True
+        self.config.save()
+        with patch('app.services.sync_service.sync_posts_exclusively') as spe, \
+                patch('app.services.sync_scheduler.need_sync', return_value=True):
+            spe.return_value = False
+            res = tasks.sync_posts_task()
+            self.assertEqual(res, 'Sync posts task is skipped, sync is already running')
+
+    def test_deliver_comments_task(self):
+        with patch('app.services.comment_service.deliver_comments') as dc:
+            dc.return_value = 2
+            res = tasks.deliver_comments_task()
+            self.assertEqual(dc.call_count, 1)
+            self.assertEqual(res, 'Deliver comments task successfully finished, delivered: 2')
 
     def test_publish_stat_task_is_disabled(self):
         res = tasks.publish_stat_task()
@@ -14,7 +14,9 @@ class ObjectType(Enum):
 class EventType(Enum):
     CREATE = 'Create'
     UPDATE = 'Update'
+    UPDATE_LIST = 'UpdateList'
     REMOVE = 'Remove'
+    REMOVE_LIST = 'RemoveList'
 
 
 def main_group_send(data: any, object_type: ObjectType, event_type: EventType = EventType.UPDATE):
@@ -18,9 +18,15 @@ export function appActivityHandler(component) {
                 case "Update":
                     component.updatePostMutation(body)
                     break
+                case "UpdateList":
+                    body.forEach(post => component.updatePostMutation(post))
+                    break
                 case "Remove":
                     component.removePostMutation(body)
                     break
+                case "RemoveList":
+                    body.forEach(postId => component.removePostMutation(postId))
+                    break
                 default:
                     throw new Error(`Looks like the event type is unknown: "${data.eventType}"`)
             }
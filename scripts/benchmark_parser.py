@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+RUNNINGS_PATH = os.path.join(os.path.dirname(__file__), '..', 'backend', 'app', 'tests', 'data', 'runnings.txt')
+
+TEXTS = [
+    '{start} + {distance} = {end}',
+    '{start}+{distance}={end}\n#дикийзабег',
+    '{start} + {distance} = {end} км\nСегодня отлично пробежались! 👍 Темп 5:30, пульс 150\n#клуббегаСпарта',
+    'Друзья, кто с Уфы заходите на огонёк! 😉 {start} + {distance} = {end}',
+]
+
+
+def create_messages(count):
+    """Creating messages of runnings from runnings.txt (by repeating them) with correct sums"""
+    distances = []
+    with open(RUNNINGS_PATH) as f:
+        for line in f:
+            distance = line.split('|')[4].strip()
+            distances.append(int(distance) if distance else None)
+
+    messages = []
+    sum_distance = 0
+    for i in range(count):
+        distance = distances[i % len(distances)]
+        if distance is None:
+            messages.append('Статистика: 5000 км позади, 149 дней бега, 727 тренировок, 59 бегунов')
+            continue
+
+        text = TEXTS[i % len(TEXTS)]
+        messages.append(text.format(start=sum_distance, distance=distance, end=sum_distance + distance))
+        sum_distance += distance
+
+    return messages
+
+
+def run(name, parse, messages):
+    start = time.perf_counter()
+    for message in messages:
+        parse(message)
+    elapsed = time.perf_counter() - start
+    print(f' - {name}: {elapsed:.2f} s ({len(messages) / elapsed:.1f} messages/s)')
+
+
+if __name__ == '__main__':
+    from app.services.message_parser import parse, parse_regex  # noqa: E402
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f'Parser benchmark, messages: {count}')
+
+    messages = create_messages(count)
+    run('regex', parse_regex, messages)
+    run('scanner', parse, messages)
+
+    chains = ['1 + ' * 2000] * 10
+    print(f'Chains of 2000 additions without result: {len(chains)}')
+    run('regex', parse_regex, chains)
+    run('scanner', parse, chains)
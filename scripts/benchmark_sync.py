@@ -0,0 +1,116 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import django
+
+VK_LATENCY = 0.05
+"""Seconds of a simulated VK request (the second argument), they are really slept, unlike rate limiter waits"""
+
+real_sleep = time.sleep
+
+
+class SleepCounter:
+    """Replaces time.sleep, slept seconds are added to time.monotonic"""
+
+    def __init__(self):
+        self.seconds = 0
+        self._monotonic = time.monotonic
+
+    def __call__(self, seconds):
+        self.seconds += seconds
+
+    def monotonic(self):
+        return self._monotonic() + self.seconds
+
+
+def run(name, post_count, bulk, backfill, prefetch=False):
+    sync_service.BULK_SYNC = bulk
+    sync_service.BACKFILL_SYNC = backfill
+    sync_service.PREFETCH_SYNC = prefetch
+    models.Post.objects.all().delete()
+    models.Profile.objects.all().delete()
+
+    fake_vk = FakeVk(create_vk_posts(post_count, profile_count=50))
+    sleep = SleepCounter()
+    # Seconds which the writing thread waits for VK, requests of the prefetcher overlap with writing
+    writer_wait = [0.0]
+
+    def method(*args, **kwargs):
+        real_sleep(VK_LATENCY)
+        if threading.current_thread() is threading.main_thread():
+            writer_wait[0] += VK_LATENCY
+        return fake_vk.method(*args, **kwargs)
+
+    prefetcher_get = sync_service.BlockPrefetcher.get
+
+    def get_prefetched(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return prefetcher_get(*args, **kwargs)
+        finally:
+            writer_wait[0] += time.perf_counter() - start
+
+    rate_limiter = TokenBucket(settings.VK_API_REQUESTS_PER_SECOND, settings.VK_API_REQUESTS_PER_SECOND)
+    with patch('vk_api.vk_api.VkApi.method', side_effect=method), \
+            patch('app.services.vk_api_service.rate_limiter', rate_limiter), \
+            patch('ws.ws_service.main_group_send'), \
+            patch('app.services.sync_service.BlockPrefetcher.get', get_prefetched), \
+            patch('time.sleep', side_effect=sleep), \
+            patch('time.monotonic', side_effect=sleep.monotonic):
+        start = time.perf_counter()
+        sync_service.sync_posts()
+        elapsed = time.perf_counter() - start
+
+    rows = models.Post.objects.count() + models.Profile.objects.count()
+    print(f' - {name}: {rows} rows in {elapsed:.2f} s ({rows / elapsed:.0f} rows/s), '
+          f'VK requests: {len(fake_vk.requests)}, waiting for VK: {writer_wait[0]:.2f} s, '
+          f'sleeping: {sleep.seconds:.1f} s')
+
+
+def replay(name, journal_path):
+    models.Post.objects.all().delete()
+    models.Profile.objects.all().delete()
+
+    with patch('ws.ws_service.main_group_send'):
+        start = time.perf_counter()
+        block_count = sync_service.replay_journal(journal_path)
+        elapsed = time.perf_counter() - start
+
+    rows = models.Post.objects.count() + models.Profile.objects.count()
+    print(f' - {name}: {rows} rows in {elapsed:.2f} s ({rows / elapsed:.0f} rows/s), blocks: {block_count}')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+    from django.conf import settings  # noqa: E402
+    from django.db import connection  # noqa: E402
+    from django.test import override_settings  # noqa: E402
+    from app import models  # noqa: E402
+    from app.services import sync_service  # noqa: E402
+    from app.services.rate_limiter import TokenBucket  # noqa: E402
+    from app.tests.fake_vk import FakeVk, create_vk_posts  # noqa: E402
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    VK_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else VK_LATENCY
+    print(f'Sync benchmark, posts: {count}, VK latency: {VK_LATENCY} s')
+
+    old_db_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        run('row by row', count, bulk=False, backfill=False)
+        run('bulk', count, bulk=True, backfill=False)
+        run('bulk + backfill', count, bulk=True, backfill=True)
+        run('bulk + backfill + prefetch', count, bulk=True, backfill=True, prefetch=True)
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            journal_path = os.path.join(dir_name, 'journal.jsonl.gz')
+            with override_settings(SYNC_JOURNAL_PATH=journal_path):
+                run('bulk + backfill with journal', count, bulk=True, backfill=True)
+            replay('replay of journal', journal_path)
+    finally:
+        connection.creation.destroy_test_db(old_db_name, verbosity=0)